@@ -222,7 +222,7 @@ static urpc_status_t urpc_invoke_callback(
     for (uint16_t i=0;i<self->_cb_size;i++) {
         urpc_cb_pair_t* pair = self->_cb_list+i;
 
-        if (pair->msg_id==msg_id) {
+        if (pair->cb&&pair->msg_id==msg_id) {
             pair->cb(pair->cb_data, status, result);
             //Remove callback after invocation
             pair->cb = NULL;
@@ -366,8 +366,8 @@ urpc_status_t urpc_init(
     self->_send_func = send_func;
 
     self->_cb_size = cb_size;
-    //Callback pairs
-    self->_cb_list = malloc(cb_size*sizeof(__urpc_cb_pair_t));
+    //Callback pairs (Zeroed so that all pairs start out unused)
+    self->_cb_list = calloc(cb_size, sizeof(__urpc_cb_pair_t));
     if (!self->_cb_list)
         return WIO_ERR_NO_MEMORY;
 
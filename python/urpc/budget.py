@@ -0,0 +1,177 @@
+from __future__ import absolute_import, unicode_literals
+import threading
+
+from urpc.util import clock
+
+## Account of calls waiting for dispatch
+BUDGET_INBOUND = "inbound"
+## Account of requests waiting for responses
+BUDGET_PENDING = "pending"
+
+class MemoryBudget(object):
+    """!
+    @brief Byte and count budget of work held by an endpoint.
+
+    Usage is tracked per account (Inbound calls waiting for dispatch and
+    pending requests). Once inbound usage reaches a limit the budget pauses
+    reading, and it resumes reading when inbound usage falls to the
+    low-water mark. Pending requests never pause reading, since their
+    responses must still be read to release them; new requests are only
+    admitted while total usage fits into the budget.
+    """
+    def __init__(self, max_bytes=None, max_count=None, low_water=0.75, wait_timeout=0):
+        """!
+        @brief Memory budget constructor.
+
+        @param max_bytes Maximum number of held bytes (None for no limit).
+        @param max_count Maximum number of held messages (None for no limit).
+        @param low_water Fraction of the limits below which reading resumes.
+        @param wait_timeout Time new requests wait for budget in seconds (0 to fail fast, None to wait forever).
+        """
+        ## Maximum number of held bytes
+        self.max_bytes = max_bytes
+        ## Maximum number of held messages
+        self.max_count = max_count
+        ## Low-water fraction of the limits
+        self.low_water = low_water
+        ## Time new requests wait for budget
+        self.wait_timeout = wait_timeout
+        ## Reading paused or not
+        self.paused = False
+        ## Number of times reading was paused
+        self.pauses = 0
+        ## Number of rejected requests
+        self.rejected = 0
+        ## Peak number of held bytes
+        self.peak_bytes = 0
+        ## Peak number of held messages
+        self.peak_count = 0
+        ## Usage of accounts (Account name to bytes and count mapping)
+        self._accounts = {BUDGET_INBOUND: (0, 0), BUDGET_PENDING: (0, 0)}
+        ## Total held bytes
+        self._bytes = 0
+        ## Total held messages
+        self._count = 0
+        ## Pause and resume listeners
+        self._listeners = []
+        ## Condition signalled when usage falls
+        self._cond = threading.Condition()
+    def add_listener(self, on_pause, on_resume):
+        """!
+        @brief Register reading pause and resume callbacks.
+
+        (e.g. asyncio transport pause_reading and resume_reading methods)
+
+        @param on_pause Called without arguments when reading should pause.
+        @param on_resume Called without arguments when reading may resume.
+        """
+        self._listeners.append((on_pause, on_resume))
+    def _fits(self, nbytes, count):
+        """!
+        @brief Check whether extra usage fits into the limits.
+
+        @param nbytes Extra bytes.
+        @param count Extra messages.
+        @return Whether the usage fits.
+        """
+        return (self.max_bytes is None or self._bytes+nbytes<=self.max_bytes) and \
+            (self.max_count is None or self._count+count<=self.max_count)
+    def _update(self, account, nbytes, count):
+        """!
+        @brief Set usage of an account and pause or resume reading.
+
+        (Must be called with the condition lock held)
+
+        @param account Account name.
+        @param nbytes Held bytes of the account.
+        @param count Held messages of the account.
+        """
+        old_bytes, old_count = self._accounts[account]
+        self._accounts[account] = (nbytes, count)
+        self._bytes += nbytes-old_bytes
+        self._count += count-old_count
+        self.peak_bytes = max(self.peak_bytes, self._bytes)
+        self.peak_count = max(self.peak_count, self._count)
+        # Usage fell; wake up waiting requests
+        if self._bytes<old_bytes or self._count<old_count:
+            self._cond.notify_all()
+        # Inbound calls over budget; pause reading
+        inbound_bytes, inbound_count = self._accounts[BUDGET_INBOUND]
+        if not self.paused:
+            if (self.max_bytes is not None and inbound_bytes>=self.max_bytes) or \
+                (self.max_count is not None and inbound_count>=self.max_count):
+                self.paused = True
+                self.pauses += 1
+                for on_pause, _ in self._listeners:
+                    on_pause()
+        # Inbound calls below low-water mark; resume reading
+        elif (self.max_bytes is None or inbound_bytes<=self.max_bytes*self.low_water) and \
+            (self.max_count is None or inbound_count<=self.max_count*self.low_water):
+            self.paused = False
+            for _, on_resume in self._listeners:
+                on_resume()
+    def set_usage(self, account, nbytes, count):
+        """!
+        @brief Set usage of an account.
+
+        @param account Account name.
+        @param nbytes Held bytes of the account.
+        @param count Held messages of the account.
+        """
+        with self._cond:
+            self._update(account, nbytes, count)
+    def reserve(self, account, nbytes):
+        """!
+        @brief Reserve budget for a new message.
+
+        (Waits for budget up to the wait timeout)
+
+        @param account Account name.
+        @param nbytes Size of the message.
+        @return Whether the message is admitted.
+        """
+        with self._cond:
+            if not self._fits(nbytes, 1):
+                timeout = self.wait_timeout
+                deadline = None if timeout is None else clock()+timeout
+                while not self._fits(nbytes, 1):
+                    remaining = None if deadline is None else deadline-clock()
+                    if remaining is not None and remaining<=0:
+                        self.rejected += 1
+                        return False
+                    self._cond.wait(remaining)
+            account_bytes, account_count = self._accounts[account]
+            self._update(account, account_bytes+nbytes, account_count+1)
+            return True
+    def release(self, account, nbytes):
+        """!
+        @brief Release budget of a message.
+
+        @param account Account name.
+        @param nbytes Size of the message.
+        """
+        with self._cond:
+            account_bytes, account_count = self._accounts[account]
+            self._update(account, account_bytes-nbytes, account_count-1)
+    def usage(self):
+        """!
+        @brief Get current and peak usage.
+
+        @return Usage in a dictionary.
+        """
+        with self._cond:
+            return {
+                "bytes": self._bytes,
+                "count": self._count,
+                "max_bytes": self.max_bytes,
+                "max_count": self.max_count,
+                "peak_bytes": self.peak_bytes,
+                "peak_count": self.peak_count,
+                "accounts": dict(
+                    (name, {"bytes": nbytes, "count": count})
+                    for name, (nbytes, count) in self._accounts.items()
+                ),
+                "paused": self.paused,
+                "pauses": self.pauses,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,91 @@
+from __future__ import absolute_import, unicode_literals
+from collections import OrderedDict
+
+from urpc.util import clock
+
+class LRUCache(object):
+    """!
+    @brief Bounded least-recently-used cache with optional expiry.
+    """
+    def __init__(self, size=128, ttl=None):
+        """!
+        @brief LRU cache constructor.
+
+        @param size Maximum number of entries.
+        @param ttl Time to live of entries in seconds (None for no expiry).
+        """
+        ## Maximum number of entries
+        self.size = size
+        ## Time to live of entries
+        self.ttl = ttl
+        ## Number of cache hits
+        self.hits = 0
+        ## Number of cache misses
+        self.misses = 0
+        ## Number of entries evicted to make room for new entries
+        self.evictions = 0
+        ## Entries (Key to value and expiry time mapping, least recently used first)
+        self._entries = OrderedDict()
+    def __len__(self):
+        """!
+        @brief Get number of entries in the cache.
+
+        @return Number of entries.
+        """
+        return len(self._entries)
+    def get(self, key):
+        """!
+        @brief Get cached value and mark it as recently used.
+
+        @param key Cache key.
+        @return Cached value, or None if not cached or expired.
+        """
+        entry = self._entries.pop(key, None)
+        # Not cached or expired
+        if entry is None or (entry[1] is not None and entry[1]<=clock()):
+            self.misses += 1
+            return None
+        # Move entry to most recently used end
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[0]
+    def put(self, key, value):
+        """!
+        @brief Add or replace cached value.
+
+        @param key Cache key.
+        @param value Value to cache.
+        """
+        entries = self._entries
+        entries.pop(key, None)
+        # Evict least recently used entry
+        if len(entries)>=self.size:
+            entries.popitem(last=False)
+            self.evictions += 1
+        expiry = clock()+self.ttl if self.ttl is not None else None
+        entries[key] = (value, expiry)
+    def invalidate(self, key):
+        """!
+        @brief Remove cached value.
+
+        @param key Cache key.
+        @return Whether the key was cached.
+        """
+        return self._entries.pop(key, None) is not None
+    def clear(self):
+        """!
+        @brief Remove all cached values.
+        """
+        self._entries.clear()
+    def stats(self):
+        """!
+        @brief Get cache statistics.
+
+        @return Cache statistics in a dictionary.
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,51 @@
+from __future__ import absolute_import, unicode_literals
+
+from urpc.constants import URPC_ERR_CANCELLED
+from urpc.misc import URPCError
+
+class CancelToken(object):
+    """!
+    @brief Cancellation token of a running call.
+
+    Long-running functions can poll the token of the current call (See
+    URPC.cancel_token), or register callbacks on it, e.g. to cancel an
+    asyncio task started on behalf of the call.
+    """
+    def __init__(self):
+        """!
+        @brief Cancellation token constructor.
+        """
+        ## Call is cancelled or not
+        self.cancelled = False
+        ## Cancellation callbacks
+        self._callbacks = []
+    def add_callback(self, callback):
+        """!
+        @brief Register a callback invoked when the call is cancelled.
+
+        (The callback is invoked at once if the call is already cancelled)
+
+        @param callback Callback without arguments.
+        """
+        if self.cancelled:
+            callback()
+        else:
+            self._callbacks.append(callback)
+    def cancel(self):
+        """!
+        @brief Cancel the call and invoke cancellation callbacks.
+        """
+        if self.cancelled:
+            return
+        self.cancelled = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+    def raise_if_cancelled(self):
+        """!
+        @brief Abort the running function if the call is cancelled.
+
+        @throws URPCError If the call is cancelled.
+        """
+        if self.cancelled:
+            raise URPCError(URPC_ERR_CANCELLED)
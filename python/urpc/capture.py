@@ -0,0 +1,147 @@
+from __future__ import absolute_import, unicode_literals
+import io, os, mmap, struct, time
+
+from urpc.trace import URPCHook, FrameRecord
+
+## Capture file magic
+CAPTURE_MAGIC = b"URPCCAP1"
+## Frame record header (Timestamp, direction and frame length)
+_FRAME_HEADER = struct.Struct("<dBI")
+
+## Received frame direction
+DIR_RECV = 0
+## Sent frame direction
+DIR_SEND = 1
+## Direction code to name mapping
+_DIR_NAMES = ("recv", "send")
+
+## Invalid capture file error prompt
+PROMPT_ERR_BAD_CAPTURE = "Not a u-RPC capture file."
+## Truncated capture file error prompt
+PROMPT_ERR_TRUNCATED = "Capture file is truncated."
+## Invalid frame direction error prompt
+PROMPT_ERR_BAD_DIRECTION = "Capture file has a frame of unknown direction."
+
+class WireRecorder(URPCHook):
+    """!
+    @brief Tracing hook that records all messages to a capture file.
+
+    Each frame is appended as a little-endian record of an 8-byte timestamp,
+    a 1-byte direction, a 4-byte frame length and the frame data.
+    """
+    def __init__(self, path, buffer_size=1<<16):
+        """!
+        @brief Wire recorder constructor.
+
+        (Frames are appended if the capture file already exists)
+
+        @param path Path of the capture file.
+        @param buffer_size Size of the write buffer in bytes.
+        """
+        ## Capture file
+        self._file = io.open(path, "ab", buffering=buffer_size)
+        # Write magic for new capture file
+        if self._file.tell()==0:
+            self._file.write(CAPTURE_MAGIC)
+    def _record(self, direction, data):
+        """!
+        @brief Append a frame to the capture file.
+
+        @param direction Frame direction code.
+        @param data Frame data.
+        """
+        self._file.write(_FRAME_HEADER.pack(time.time(), direction, len(data)))
+        self._file.write(data)
+    def on_send(self, data):
+        """!
+        @brief Record sent message.
+
+        @param data u-RPC message data.
+        """
+        self._record(DIR_SEND, data)
+    def on_recv(self, data):
+        """!
+        @brief Record received message.
+
+        @param data u-RPC message data.
+        """
+        self._record(DIR_RECV, data)
+    def flush(self):
+        """!
+        @brief Flush buffered frames to the capture file.
+        """
+        self._file.flush()
+    def close(self):
+        """!
+        @brief Flush and close the capture file.
+        """
+        self._file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
+
+class WireCapture(object):
+    """!
+    @brief Memory-mapped reader of capture files.
+
+    Frames are read lazily from the mapping, so captures larger than memory
+    can be iterated.
+    """
+    def __init__(self, path):
+        """!
+        @brief Wire capture reader constructor.
+
+        @param path Path of the capture file.
+        @throws ValueError If the file is not a capture file.
+        """
+        with io.open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size<len(CAPTURE_MAGIC):
+                raise ValueError(PROMPT_ERR_BAD_CAPTURE)
+            ## Mapped capture file
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(CAPTURE_MAGIC)]!=CAPTURE_MAGIC:
+            self.close()
+            raise ValueError(PROMPT_ERR_BAD_CAPTURE)
+    def __iter__(self):
+        """!
+        @brief Iterate over frames in the capture.
+
+        @return Iterator of frame records.
+        @throws ValueError If the capture file is truncated or corrupt.
+        """
+        buf = self._map
+        size = len(buf)
+        offset = len(CAPTURE_MAGIC)
+        header_size = _FRAME_HEADER.size
+        while offset<size:
+            if offset+header_size>size:
+                raise ValueError(PROMPT_ERR_TRUNCATED)
+            timestamp, direction, length = _FRAME_HEADER.unpack_from(buf, offset)
+            offset += header_size
+            if direction>=len(_DIR_NAMES):
+                raise ValueError(PROMPT_ERR_BAD_DIRECTION)
+            if offset+length>size:
+                raise ValueError(PROMPT_ERR_TRUNCATED)
+            yield FrameRecord(timestamp, _DIR_NAMES[direction], buf[offset:offset+length])
+            offset += length
+    def frames(self, direction):
+        """!
+        @brief Iterate over frames of given direction.
+
+        @param direction Frame direction ("send" or "recv").
+        @return Iterator of frame records.
+        """
+        for record in self:
+            if record.direction==direction:
+                yield record
+    def close(self):
+        """!
+        @brief Unmap the capture file.
+        """
+        self._map.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc_info):
+        self.close()
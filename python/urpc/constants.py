@@ -2,8 +2,14 @@ from __future__ import absolute_import, unicode_literals
 
 ## u-RPC protocol magic
 URPC_MAGIC = 10
-## u-RPC protocol version
+## u-RPC protocol version (Default version with fixed width integers)
 URPC_VERSION = 1
+## u-RPC protocol version with varint encoded integers and lengths
+URPC_VERSION_VARINT = 2
+## Supported u-RPC protocol versions
+URPC_VERSIONS = (URPC_VERSION, URPC_VERSION_VARINT)
+## Channel multiplexing header magic (Replaces u-RPC magic in first byte)
+URPC_MUX_MAGIC = 11
 
 ## Error message
 URPC_MSG_ERROR = 0
@@ -15,6 +21,25 @@ URPC_MSG_FUNC_RESP = 2
 URPC_MSG_CALL = 3
 ## Function call result message
 URPC_MSG_CALL_RESULT = 4
+## Function call with priority class message
+URPC_MSG_PRIO_CALL = 5
+## Call cancellation message
+URPC_MSG_CANCEL = 6
+## Protocol version negotiation message
+URPC_MSG_HELLO = 7
+## Protocol version negotiation response message
+URPC_MSG_HELLO_RESP = 8
+
+## Critical priority class
+URPC_PRIO_CRITICAL = 0
+## High priority class
+URPC_PRIO_HIGH = 1
+## Normal priority class (Default)
+URPC_PRIO_NORMAL = 2
+## Low priority class
+URPC_PRIO_LOW = 3
+## Number of priority classes
+URPC_N_PRIOS = 4
 
 ## Signed 8-bit data
 I8 = URPC_TYPE_I8 = 0x00
@@ -51,6 +76,27 @@ URPC_ERR_BROKEN_MSG = 0x24
 URPC_ERR_EXCEPTION = 0x25
 ## Data too long
 URPC_ERR_TOO_LONG = 0x26
+## Request timed out (Reported locally, never sent)
+URPC_ERR_TIMEOUT = 0x27
+## Callee is overloaded and shed the call
+URPC_ERR_BUSY = 0x28
+## Call was cancelled by the caller
+URPC_ERR_CANCELLED = 0x29
+
+## u-RPC status code to name mapping
+urpc_status_names = {
+    URPC_OK: "URPC_OK",
+    URPC_ERR_SIG_INCORRECT: "URPC_ERR_SIG_INCORRECT",
+    URPC_ERR_NONEXIST: "URPC_ERR_NONEXIST",
+    URPC_ERR_NO_SUPPORT: "URPC_ERR_NO_SUPPORT",
+    URPC_ERR_NO_MEMORY: "URPC_ERR_NO_MEMORY",
+    URPC_ERR_BROKEN_MSG: "URPC_ERR_BROKEN_MSG",
+    URPC_ERR_EXCEPTION: "URPC_ERR_EXCEPTION",
+    URPC_ERR_TOO_LONG: "URPC_ERR_TOO_LONG",
+    URPC_ERR_TIMEOUT: "URPC_ERR_TIMEOUT",
+    URPC_ERR_BUSY: "URPC_ERR_BUSY",
+    URPC_ERR_CANCELLED: "URPC_ERR_CANCELLED",
+}
 
 ## u-RPC type representation for struct module
 urpc_type_repr = [
@@ -0,0 +1,150 @@
+from __future__ import absolute_import, unicode_literals
+from collections import deque
+from six.moves import range
+
+from urpc.constants import *
+
+class DispatchQueue(object):
+    """!
+    @brief Bounded priority queue of calls waiting for dispatch.
+
+    Each priority class is admitted only while the queue is shallower than
+    the threshold of the class, so less important calls are shed first as
+    load grows. When the queue is full, the newest call of the least
+    important class below the incoming call is evicted to make room.
+    """
+    def __init__(self, capacity=1024, thresholds=None):
+        """!
+        @brief Dispatch queue constructor.
+
+        @param capacity Maximum number of queued calls.
+        @param thresholds Queue depth limits of each priority class (Defaults to
+                          full capacity for critical and high, 3/4 for normal
+                          and 1/2 for low priority calls).
+        """
+        ## Maximum number of queued calls
+        self.capacity = capacity
+        ## Admission thresholds of each priority class
+        self.thresholds = thresholds or [
+            capacity, # URPC_PRIO_CRITICAL
+            capacity, # URPC_PRIO_HIGH
+            capacity*3//4, # URPC_PRIO_NORMAL
+            capacity//2, # URPC_PRIO_LOW
+        ]
+        ## Number of queued calls
+        self.depth = 0
+        ## Total size of queued calls
+        self.bytes = 0
+        ## Maximum number of queued calls seen
+        self.max_depth = 0
+        ## Number of shed calls of each priority class
+        self.shed = [0]*URPC_N_PRIOS
+        ## Number of evicted calls of each priority class
+        self.evicted = [0]*URPC_N_PRIOS
+        ## Number of dispatched calls of each priority class
+        self.dispatched = [0]*URPC_N_PRIOS
+        ## Number of calls removed before dispatch
+        self.removed = 0
+        ## Number of dropped duplicate calls
+        self.duplicates = 0
+        ## Queued calls of each priority class (Oldest first)
+        self._queues = [deque() for _ in range(URPC_N_PRIOS)]
+        ## Keys of queued calls
+        self._keys = set()
+    def __len__(self):
+        """!
+        @brief Get number of queued calls.
+
+        @return Number of queued calls.
+        """
+        return self.depth
+    def push(self, priority, key, item, size=0):
+        """!
+        @brief Try to add a call to the queue.
+
+        (Calls whose key is already queued are dropped as duplicates)
+
+        @param priority Priority class of the call.
+        @param key Unique key of the call.
+        @param item Call to queue.
+        @param size Size of the call message.
+        @return Whether the call was admitted, and the evicted call or None.
+        """
+        if key in self._keys:
+            self.duplicates += 1
+            return True, None
+        evicted = None
+        if self.depth>=self.thresholds[priority]:
+            # Evict newest call of the least important class below the call
+            if self.depth>=self.capacity:
+                for lower in range(URPC_N_PRIOS-1, priority, -1):
+                    if self._queues[lower]:
+                        evicted_key, evicted, evicted_size = self._queues[lower].pop()
+                        self._keys.discard(evicted_key)
+                        self.evicted[lower] += 1
+                        self.depth -= 1
+                        self.bytes -= evicted_size
+                        break
+            # Shed the call
+            if evicted is None:
+                self.shed[priority] += 1
+                return False, None
+        self._queues[priority].append((key, item, size))
+        self._keys.add(key)
+        self.depth += 1
+        self.bytes += size
+        if self.depth>self.max_depth:
+            self.max_depth = self.depth
+        return True, evicted
+    def pop(self):
+        """!
+        @brief Remove the oldest call of the most important non-empty class.
+
+        @return Queued call, or None if the queue is empty.
+        """
+        for priority in range(URPC_N_PRIOS):
+            queue = self._queues[priority]
+            if queue:
+                key, item, size = queue.popleft()
+                self._keys.discard(key)
+                self.dispatched[priority] += 1
+                self.depth -= 1
+                self.bytes -= size
+                return item
+        return None
+    def remove(self, key):
+        """!
+        @brief Remove a queued call before it is dispatched.
+
+        @param key Unique key of the call.
+        @return Removed call, or None if the call is not queued.
+        """
+        if key not in self._keys:
+            return None
+        for queue in self._queues:
+            for entry in queue:
+                if entry[0]==key:
+                    queue.remove(entry)
+                    self._keys.discard(key)
+                    self.removed += 1
+                    self.depth -= 1
+                    self.bytes -= entry[2]
+                    return entry[1]
+        return None
+    def stats(self):
+        """!
+        @brief Get queue statistics.
+
+        @return Queue statistics in a dictionary.
+        """
+        return {
+            "depth": self.depth,
+            "bytes": self.bytes,
+            "max_depth": self.max_depth,
+            "depth_by_priority": [len(queue) for queue in self._queues],
+            "shed": list(self.shed),
+            "evicted": list(self.evicted),
+            "dispatched": list(self.dispatched),
+            "removed": self.removed,
+            "duplicates": self.duplicates
+        }
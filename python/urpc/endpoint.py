@@ -1,39 +1,178 @@
 from __future__ import absolute_import, unicode_literals
-import struct, logging
+import copy, struct, threading, fnmatch, hashlib
 from io import BytesIO
+from itertools import count
 from bidict import bidict
+from six import PY2
 
 from urpc.constants import *
-from urpc.util import AllocTable, seq_get, read_data, read_vary, write_data, write_vary
+from urpc.util import AllocTable, clock, seq_get, read_data, read_vary, write_data, write_vary, \
+    encode_varint, pack_varints, unpack_varints
 from urpc.misc import URPCError, URPCType, urpc_wrap
+from urpc.metrics import URPCMetrics, CallTimer
+from urpc.cache import LRUCache
+from urpc.reliable import ReliabilityPolicy, PendingRequest
+from urpc.dispatch import DispatchQueue
+from urpc.cancel import CancelToken
+from urpc.budget import BUDGET_INBOUND, BUDGET_PENDING
+from urpc.fileregion import MAX_REGION_SIZE, FileRegion, Frame
 
-# Module logger
-_logger = logging.getLogger(__name__)
-# Logger level
-_logger.setLevel(logging.DEBUG)
+## Default clock of endpoints
+_default_clock = clock
+## Number of lock shards of the callback table in thread-safe mode
+_N_CALLBACK_SHARDS = 16
+## Number of peers whose negotiated protocol version is remembered
+_N_PEER_VERSIONS = 1024
+
+class _NullLock(object):
+    """!
+    @brief No-op lock used when thread-safe mode is off.
+    """
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+## Shared no-op lock
+_null_lock = _NullLock()
+
+def _copy_result(result):
+    """!
+    @brief Copy a cached call result for a callback.
+
+    (Mutable values such as variable length data are copied, so callbacks
+    never modify the cached result)
+
+    @param result Cached call result.
+    @return Copy of the result.
+    """
+    return [copy.copy(value) for value in result]
+
+def _request_digest(req):
+    """!
+    @brief Get digest of a request message for the reply cache.
+
+    @param req Request message stream.
+    @return Digest of the whole message.
+    """
+    return hashlib.sha1(req.getvalue()).digest()
 
 class URPC(object):
     """!
     @brief u-RPC endpoint class.
     """
-    def __init__(self, send_callback, n_funcs=256):
+    def __init__(self, send_callback, n_funcs=256, metrics=False, reliable=None,
+        dispatch_queue=None, max_version=URPC_VERSION_VARINT, thread_safe=False, budget=None,
+        clock=None, send_frame_callback=None):
         """!
         @brief u-RPC endpoint class constructor.
 
         @param send_callback Function for sending data
         @param n_funcs Maximum number of functions in store
+        @param metrics Whether to collect per-function call metrics
+        @param reliable Reliability policy for lossy datagram links (True for defaults)
+        @param dispatch_queue Queue for deferred prioritized dispatch of calls (True for defaults)
+        @param max_version Highest protocol version accepted and offered in negotiation
+        @param thread_safe Whether requests may be issued from several threads at once
+        @param budget Memory budget of queued calls and pending requests (A MemoryBudget instance)
+        @param clock Clock of retransmission timers (Defaults to a monotonic wall clock)
+        @param send_frame_callback Function for sending parts of messages with file regions
+                                   (Such messages are flattened for send_callback if not given)
         """
         ## Functions store (Handle to function mapping)
         self._funcs_store = AllocTable(n_funcs)
         ## Function name to handle mapping
         self._func_name_lookup = bidict()
-        ## Message ID counter
-        self._counters = {"send": 0, "recv": 0}
+        ## Function result caches (Handle to cache mapping)
+        self._func_caches = {}
+        ## Function priority classes (Handle to priority class mapping)
+        self._func_priorities = {}
+        ## Message ID counters (Atomic under the GIL)
+        self._counters = {"send": count(), "recv": count()}
         ## Send data callback
         self._send_callback = send_callback
+        ## Send message parts callback (None if file regions are flattened)
+        self._send_frame_callback = send_frame_callback
+        ## Highest supported protocol version
+        self._max_version = max_version
+        ## Protocol version of requests (Upgraded by negotiation)
+        self.version = URPC_VERSION
+        ## Protocol version of the message being handled
+        self._frame_version = URPC_VERSION
+        ## Protocol versions negotiated by addressed peers (Peer address to version mapping)
+        self._peer_versions = LRUCache(_N_PEER_VERSIONS)
         ## Operation callbacks
         self._oper_callbacks = {}
-    def _build_header(self, msg_type, counter):
+        # Thread-safe mode
+        ## Send serialization lock (Reentrant for synchronous loopback links)
+        self._send_lock = threading.RLock() if thread_safe else _null_lock
+        ## Callback table locks sharded by message ID
+        self._callback_locks = [threading.Lock() for _ in range(_N_CALLBACK_SHARDS)] \
+            if thread_safe else None
+        ## Call metrics (None if disabled)
+        self.metrics = URPCMetrics() if metrics else None
+        ## Call timer of the message being handled
+        self._frame_timer = None
+        ## Peer address of the message being handled
+        self._frame_peer = None
+        ## Destination peer of the response being sent (None while sending requests)
+        self.response_peer = None
+        ## Installed tracing hooks
+        self._hooks = ()
+        # Reliable datagram mode
+        if reliable is True:
+            reliable = ReliabilityPolicy()
+        ## Reliability policy (None if disabled)
+        self._reliable = reliable
+        ## Clock of retransmission timers
+        self._clock = clock if clock is not None else _default_clock
+        ## Unanswered requests (Message ID to retransmission state mapping)
+        self._retransmits = {}
+        ## Responses to recent calls (Peer and message ID to request digest and response mapping)
+        self._reply_cache = LRUCache(reliable.reply_cache_size) if reliable else None
+        # Deferred call dispatch
+        if dispatch_queue is True:
+            dispatch_queue = DispatchQueue()
+        ## Queue of calls waiting for dispatch (None for immediate dispatch)
+        self._dispatch_queue = dispatch_queue
+        ## Cancellation tokens of running calls (Peer and message ID to token mapping)
+        self._running_calls = {}
+        ## Cancellation token of the call being dispatched (None outside of calls)
+        self.cancel_token = None
+        ## Memory budget (None if unbounded)
+        self.budget = budget
+        ## Sizes of pending requests charged to the budget (Message ID to size mapping)
+        self._request_sizes = {}
+        ## Size of the message being handled
+        self._frame_size = 0
+        ## Caller-side result caches (Remote handle to cache mapping)
+        self._remote_caches = {}
+        ## Caller-side result caches enabled by name (Remote function name to cache mapping)
+        self._remote_cache_names = {}
+        ## Resolved remote function names (Name to remote handle mapping)
+        self._remote_names = {}
+        ## In-flight cached calls (Remote handle, cache key and generation to callbacks mapping)
+        self._inflight = {}
+        ## Invalidation generations of caller-side caches (Remote handle to counter mapping)
+        self._remote_generations = {}
+    def _next_msg_id(self, counter):
+        """!
+        @brief Allocate a message ID.
+
+        @param counter Name of the message counter to use.
+        @return Message ID.
+        """
+        return next(self._counters[counter])&0xffff
+    def _callback_lock(self, msg_id):
+        """!
+        @brief Get lock guarding the callback of a request.
+
+        @param msg_id Request message ID.
+        @return Lock of the callback table shard (A no-op lock if thread-safe mode is off).
+        """
+        locks = self._callback_locks
+        return locks[msg_id%_N_CALLBACK_SHARDS] if locks else _null_lock
+    def _build_header(self, msg_type, counter, version=URPC_VERSION, msg_id=None):
         """!
         @brief Build u-RPC message header.
 
@@ -41,31 +180,36 @@ class URPC(object):
 
         @param msg_type Message type.
         @param counter Name of the message counter to use.
+        @param version Protocol version of the message.
+        @param msg_id Message ID already allocated from the counter.
         @return Response stream with message header written.
         """
+        if msg_id is None:
+            msg_id = self._next_msg_id(counter)
         res = BytesIO()
         # Magic and protocol version
-        magic_ver_byte = (URPC_MAGIC<<4)|URPC_VERSION
+        magic_ver_byte = (URPC_MAGIC<<4)|version
         write_data(res, magic_ver_byte, URPC_TYPE_U8)
         # Message ID and type
-        write_data(res, self._counters[counter], URPC_TYPE_U16)
+        write_data(res, msg_id, URPC_TYPE_U16)
         write_data(res, msg_type, URPC_TYPE_U8)
-        # Update counter
-        self._counters[counter] += 1
-        if self._counters[counter]>=2**16:
-            self._counters[counter] = 0
         return res
-    def _marshall(self, stream, sig, objects):
+    def _marshall(self, stream, sig, objects, version=URPC_VERSION):
         """!
         @brief Marshall objects into data stream.
 
         @param stream Data stream.
         @param sig Signature of objects.
         @param objects Objects to be marshalled.
+        @param version Protocol version of the message.
         """
         # Check signature
         if len(sig)!=len(objects):
             raise URPCError(URPC_ERR_SIG_INCORRECT)
+        # Varint encoding
+        if version==URPC_VERSION_VARINT:
+            stream.write(pack_varints(sig, objects))
+            return
         # Marshall arguments
         for obj, obj_type in zip(objects, sig):
             # Variable length data
@@ -74,14 +218,52 @@ class URPC(object):
             # Value types
             else:
                 write_data(stream, obj, obj_type)
-    def _unmarshall(self, stream, sig):
+    def _marshall_frame(self, frame, sig, objects, version=URPC_VERSION):
+        """!
+        @brief Marshall objects with file regions into message frame.
+
+        @param frame Message frame.
+        @param sig Signature of objects.
+        @param objects Objects to be marshalled.
+        @param version Protocol version of the message.
+        """
+        # Check signature
+        if len(sig)!=len(objects):
+            raise URPCError(URPC_ERR_SIG_INCORRECT)
+        for obj, obj_type in zip(objects, sig):
+            # File region; written by reference
+            if isinstance(obj, FileRegion):
+                if obj_type!=URPC_TYPE_VARY:
+                    raise URPCError(URPC_ERR_SIG_INCORRECT)
+                size = len(obj)
+                if size>MAX_REGION_SIZE:
+                    raise URPCError(URPC_ERR_TOO_LONG)
+                if version==URPC_VERSION_VARINT:
+                    frame.write(encode_varint(size))
+                else:
+                    frame.write(struct.pack("H", size))
+                frame.write_region(obj)
+            # Other objects
+            else:
+                self._marshall(frame, [obj_type], [obj], version)
+    def _unmarshall(self, stream, sig, version=URPC_VERSION):
         """!
         @brief Unmarshall objects from data stream.
 
         @param stream Data stream.
         @param sig Signature of objects.
+        @param version Protocol version of the message.
         @return Objects in an array.
         """
+        # Varint encoding; decode all objects in one pass
+        if version==URPC_VERSION_VARINT:
+            # Streams of received messages share their bytes instead of copying them
+            buf = stream.getvalue()
+            if PY2:
+                buf = bytearray(buf)
+            objects, pos = unpack_varints(buf, stream.tell(), sig)
+            stream.seek(pos)
+            return objects
         objects = []
         # Unmarshall arguments
         for obj_type in sig:
@@ -93,6 +275,115 @@ class URPC(object):
                 obj = read_data(stream, obj_type)
             objects.append(obj)
         return objects
+    def _send(self, data):
+        """!
+        @brief Send u-RPC message through send callback.
+
+        @param data u-RPC message data (A frame for messages with file regions).
+        """
+        hooks = self._hooks
+        # Message with file regions
+        if isinstance(data, Frame):
+            # Send parts without reading file regions
+            if self._send_frame_callback and not hooks:
+                with self._send_lock:
+                    self._send_frame_callback(data.parts)
+                return
+            data = data.tobytes()
+        # Serialize sends from concurrent threads
+        with self._send_lock:
+            if hooks:
+                for hook in hooks:
+                    hook.on_send(data)
+            self._send_callback(data)
+    def _dispatch_traced(self, func, handle, msg_id, sig_args, args):
+        """!
+        @brief Invoke local function with dispatch hooks.
+
+        @param func Local function.
+        @param handle Function handle.
+        @param msg_id Call message ID.
+        @param sig_args Signature of arguments.
+        @param args Arguments.
+        @return Signature of results and results.
+        """
+        hooks = self._hooks
+        for hook in hooks:
+            hook.on_dispatch_start(handle, msg_id)
+        error = None
+        try:
+            return func(sig_args, args)
+        # Record error code for dispatch end hooks
+        except URPCError as e:
+            error = e.reason
+            raise
+        finally:
+            for hook in hooks:
+                hook.on_dispatch_end(handle, msg_id, error)
+    def _add_request(self, msg_id, data, callback):
+        """!
+        @brief Register callback of a request and send the request.
+
+        @param msg_id Request message ID.
+        @param data Request message data.
+        @param callback Operation callback.
+        """
+        with self._callback_lock(msg_id):
+            # Operation callback
+            self._oper_callbacks[msg_id] = callback
+            # Retransmission state
+            policy = self._reliable
+            if policy:
+                self._retransmits[msg_id] = PendingRequest(data, policy.initial_timeout, self._clock())
+        # Send request message; forget the request if it never left
+        try:
+            self._send(data)
+        except Exception:
+            self._pop_callback(msg_id)
+            raise
+    def _pop_callback(self, msg_id):
+        """!
+        @brief Remove callback for given message ID.
+
+        (Responses to unknown or already answered requests are ignored;
+        unrecorded call metrics of the request are dropped)
+
+        @param msg_id Request message ID.
+        @return Operation callback, or None if there is no such request.
+        """
+        with self._callback_lock(msg_id):
+            if self._retransmits:
+                self._retransmits.pop(msg_id, None)
+            # Release request budget
+            if self._request_sizes:
+                size = self._request_sizes.pop(msg_id, None)
+                if size is not None:
+                    self.budget.release(BUDGET_PENDING, size)
+            if self.metrics:
+                self.metrics.drop_request(msg_id)
+            return self._oper_callbacks.pop(msg_id, None)
+    def _reserve_request(self, msg_id, size):
+        """!
+        @brief Charge a new request to the memory budget.
+
+        @param msg_id Request message ID.
+        @param size Size of the request message.
+        @throws URPCError If the request does not fit into the budget.
+        """
+        budget = self.budget
+        if budget is None:
+            return
+        if not budget.reserve(BUDGET_PENDING, size):
+            raise URPCError(URPC_ERR_NO_MEMORY)
+        with self._callback_lock(msg_id):
+            self._request_sizes[msg_id] = size
+    def _sync_queue_budget(self):
+        """!
+        @brief Update memory budget with size of the dispatch queue.
+        """
+        if self.budget is not None:
+            queue = self._dispatch_queue
+            self.budget.set_usage(BUDGET_INBOUND, queue.bytes, queue.depth)
     def _invoke_callback(self, msg_id, result):
         """!
         @brief Invoke and remove callback for given message ID.
@@ -100,17 +391,67 @@ class URPC(object):
         @param msg_id Request message ID.
         @param result Callback result.
         """
+        callback = self._pop_callback(msg_id)
         # Invoke callback
-        self._oper_callbacks[msg_id](None, result)
-        # Remove callback
-        del self._oper_callbacks[msg_id]
-    def _handle_msg(self, req):
+        if callback:
+            callback(None, result)
+    def _build_error(self, msg_id, error_num):
+        """!
+        @brief Build u-RPC error response message.
+
+        @param msg_id Request message ID.
+        @param error_num u-RPC error code.
+        @return Response message stream.
+        """
+        res = self._build_header(URPC_MSG_ERROR, "recv")
+        # Write request message ID and error code
+        write_data(res, msg_id, URPC_TYPE_U16)
+        write_data(res, error_num, URPC_TYPE_U8)
+        return res
+    def _send_response(self, res, timer, peer):
+        """!
+        @brief Send response message and record callee-side call metrics.
+
+        (Send callbacks of unconnected datagram transports read the
+        destination of the response from response_peer)
+
+        @param res Response message stream.
+        @param timer Call timer of the request.
+        @param peer Address of the caller.
+        """
+        send_data = res.getvalue()
+        # Invoke send callback
+        with self._send_lock:
+            self.response_peer = peer
+            try:
+                self._send(send_data)
+            finally:
+                self.response_peer = None
+        # Record callee-side call metrics
+        if timer and timer.handle is not None:
+            timer.mark("send")
+            self.metrics.finish_call(timer, len(send_data))
+    def _remember_reply(self, peer, msg_id, digest, res):
+        """!
+        @brief Remember call response for duplicate requests.
+
+        @param peer Address of the caller.
+        @param msg_id Request message ID.
+        @param digest Digest of the request message.
+        @param res Response message stream.
+        """
+        if self._reply_cache is not None:
+            self._reply_cache.put((peer, msg_id), (digest, res.getvalue()))
+    def _handle_msg(self, req, peer=None):
         """!
         @brief Handle received u-RPC message.
 
         @param req Request message stream.
+        @param peer Address of the peer that sent the message.
         @return Response message stream.
         """
+        # Request digest of call message (Set if the response is cached)
+        digest = None
         # Message ID defaults to 0 (Unknown)
         msg_id = 0
         try:
@@ -120,24 +461,32 @@ class URPC(object):
             magic_ver_byte = read_data(req, URPC_TYPE_U8)
             if (magic_ver_byte>>4)!=URPC_MAGIC:
                 raise URPCError(URPC_ERR_BROKEN_MSG)
-            if (magic_ver_byte&0xf)!=URPC_VERSION:
-                raise URPCError(URPC_ERR_NO_SUPPORT)
-            # Parse message ID and type
+            # Parse message ID (Header layout is the same in all versions)
             msg_id = read_data(req, URPC_TYPE_U16)
+            version = magic_ver_byte&0xf
+            if version not in URPC_VERSIONS or version>self._max_version:
+                raise URPCError(URPC_ERR_NO_SUPPORT)
+            self._frame_version = version
+            # Parse message type
             msg_type = read_data(req, URPC_TYPE_U8)
             # Call message handler
             msg_handler = _urpc_msg_handlers[msg_type]
             if not msg_handler:
                 raise URPCError(URPC_ERR_NO_SUPPORT)
-            return msg_handler(self, req, msg_id)
+            # Replay response of duplicate call
+            # (Only for identical requests; restarted callers on peerless links reuse message IDs)
+            if msg_type in _CALL_MSG_TYPES and self._reply_cache is not None:
+                digest = _request_digest(req)
+                reply = self._reply_cache.get((peer, msg_id))
+                if reply is not None and reply[0]==digest:
+                    return BytesIO(reply[1])
+            res = msg_handler(self, req, msg_id)
         # URPC error occured
         except URPCError as e:
-            res = self._build_header(URPC_MSG_ERROR, "recv")
-            # Write request message ID and error code
-            write_data(res, msg_id, URPC_TYPE_U16)
-            write_data(res, e.reason, URPC_TYPE_U8)
-            # Return stream
-            return res
+            res = self._build_error(msg_id, e.reason)
+        if digest is not None and res is not None:
+            self._remember_reply(peer, msg_id, digest, res)
+        return res
     def _handle_error(self, res, msg_id):
         """!
         @brief u-RPC error result handler.
@@ -148,11 +497,13 @@ class URPC(object):
         # Request message ID and error number
         req_msg_id = read_data(res, URPC_TYPE_U16)
         error_num = read_data(res, URPC_TYPE_U8)
+        # Record call metrics
+        if self.metrics:
+            self.metrics.end_request(req_msg_id, self._frame_timer.bytes_in, error_num)
         # Invoke callback with error object
-        callback = self._oper_callbacks[req_msg_id]
-        callback(URPCError(error_num), None)
-        # Remove callback function
-        del self._oper_callbacks[req_msg_id]
+        callback = self._pop_callback(req_msg_id)
+        if callback:
+            callback(URPCError(error_num), None)
     def _handle_func_query(self, req, msg_id):
         """!
         u-RPC function query handler.
@@ -185,34 +536,231 @@ class URPC(object):
         handle = read_data(res, URPC_TYPE_U16)
         # Invoke callback
         self._invoke_callback(req_msg_id, handle)
-    def _handle_call(self, req, msg_id):
+    def _handle_hello(self, req, msg_id):
         """!
-        @brief u-RPC function call handler.
+        @brief u-RPC protocol version negotiation handler.
+
+        HELLO messages received with a peer address (e.g. on a datagram
+        endpoint serving many peers) only record the version negotiated by
+        that peer, and leave the version of requests of this endpoint alone.
 
         @param req Request message stream.
         @param msg_id Request message ID.
         @return A u-RPC response message.
         """
-        # Function handle
-        handle = read_data(req, URPC_TYPE_U16)
-        # Arguments and signature
-        sig_args = read_vary(req)
-        args = self._unmarshall(req, sig_args)
-        # Lookup for function in store
-        func = seq_get(self._funcs_store, handle)
-        if not func:
-            raise URPCError(URPC_ERR_NONEXIST)
-        # Call function
-        sig_rets, result = func(sig_args, args)
-        if len(result)!=len(sig_rets):
-            raise URPCError(URPC_ERR_SIG_INCORRECT)
+        # Highest protocol version of the peer
+        peer_version = read_data(req, URPC_TYPE_U8)
+        # Highest protocol version supported by both sides
+        max_version = min(peer_version, self._max_version)
+        versions = [v for v in URPC_VERSIONS if v<=max_version]
+        if not versions:
+            raise URPCError(URPC_ERR_NO_SUPPORT)
+        version = max(versions)
+        # Negotiated by an addressed peer
+        peer = self._frame_peer
+        if peer is None:
+            self.version = version
+        else:
+            self._peer_versions.put(peer, version)
         # Response message
-        res = self._build_header(URPC_MSG_CALL_RESULT, "recv")
+        res = self._build_header(URPC_MSG_HELLO_RESP, "recv")
         write_data(res, msg_id, URPC_TYPE_U16)
-        # Return values and signature
-        write_vary(res, sig_rets)
-        self._marshall(res, sig_rets, result)
+        write_data(res, version, URPC_TYPE_U8)
         return res
+    def _handle_hello_resp(self, res, msg_id):
+        """!
+        @brief u-RPC protocol version negotiation response handler.
+
+        @param res Response message stream.
+        @param msg_id Response message ID.
+        """
+        # Request message ID
+        req_msg_id = read_data(res, URPC_TYPE_U16)
+        # Negotiated protocol version
+        version = read_data(res, URPC_TYPE_U8)
+        if version not in URPC_VERSIONS or version>self._max_version:
+            raise URPCError(URPC_ERR_NO_SUPPORT)
+        self.version = version
+        if self._frame_peer is not None:
+            self._peer_versions.put(self._frame_peer, version)
+        # Invoke callback
+        self._invoke_callback(req_msg_id, version)
+    def _handle_call(self, req, msg_id, priority=None):
+        """!
+        @brief u-RPC function call handler.
+
+        @param req Request message stream.
+        @param msg_id Request message ID.
+        @param priority Priority class requested by the caller.
+        @return A u-RPC response message, or None if the call is queued.
+        """
+        # Call timer
+        timer = self._frame_timer
+        # Function handle
+        handle = read_data(req, URPC_TYPE_U16)
+        if timer:
+            timer.handle = handle
+        # Immediate dispatch
+        queue = self._dispatch_queue
+        peer = self._frame_peer
+        version = self._frame_version
+        if queue is None:
+            return self._process_call(req, msg_id, handle, timer, peer, version)
+        # Priority class of the call
+        if priority is None:
+            priority = self._func_priorities.get(handle, URPC_PRIO_NORMAL)
+        priority = min(priority, URPC_N_PRIOS-1)
+        # Queue call for dispatch
+        admitted, evicted = queue.push(
+            priority,
+            (peer, msg_id),
+            (req, msg_id, handle, timer, peer, version),
+            self._frame_size
+        )
+        self._sync_queue_budget()
+        # Overloaded; shed the call
+        if not admitted:
+            if timer:
+                timer.error = URPC_ERR_BUSY
+            raise URPCError(URPC_ERR_BUSY)
+        # Reject call evicted by a more important call
+        if evicted:
+            self._reject_queued_call(evicted, URPC_ERR_BUSY)
+        return None
+    def _handle_prio_call(self, req, msg_id):
+        """!
+        @brief u-RPC function call with priority class handler.
+
+        @param req Request message stream.
+        @param msg_id Request message ID.
+        @return A u-RPC response message, or None if the call is queued.
+        """
+        # Priority class
+        priority = read_data(req, URPC_TYPE_U8)
+        return self._handle_call(req, msg_id, priority)
+    def _handle_cancel(self, req, msg_id):
+        """!
+        @brief u-RPC call cancellation handler.
+
+        Queued calls are dropped, while running calls get their cancellation
+        token signalled. No response is sent for cancelled calls.
+
+        @param req Request message stream.
+        @param msg_id Request message ID.
+        """
+        # Message ID of the cancelled call
+        call_key = (self._frame_peer, read_data(req, URPC_TYPE_U16))
+        # Drop queued call
+        queue = self._dispatch_queue
+        if queue is not None:
+            call = queue.remove(call_key)
+            self._sync_queue_budget()
+            if call is not None:
+                timer = call[3]
+                if timer:
+                    timer.error = URPC_ERR_CANCELLED
+                    self.metrics.finish_call(timer)
+                return
+        # Signal running call
+        token = self._running_calls.get(call_key)
+        if token is not None:
+            token.cancel()
+    def _reject_queued_call(self, call, error_num):
+        """!
+        @brief Answer a queued call with an error without dispatching it.
+
+        @param call Queued call.
+        @param error_num u-RPC error code.
+        """
+        req, msg_id, _, timer, peer, _ = call
+        if timer:
+            timer.error = error_num
+        res = self._build_error(msg_id, error_num)
+        if self._reply_cache is not None:
+            self._remember_reply(peer, msg_id, _request_digest(req), res)
+        self._send_response(res, timer, peer)
+    def _process_call(self, req, msg_id, handle, timer, peer, version):
+        """!
+        @brief Invoke local function of a call and build its result message.
+
+        @param req Request message stream (Positioned after function handle).
+        @param msg_id Request message ID.
+        @param handle Function handle.
+        @param timer Call timer.
+        @param peer Address of the caller.
+        @param version Protocol version of the call (Also used for the result).
+        @return A u-RPC response message, or None if the call is cancelled.
+        """
+        # Cancellation token of the call
+        token = None
+        try:
+            # Arguments signature
+            sig_args = read_vary(req)
+            # Lookup for function in store
+            func = seq_get(self._funcs_store, handle)
+            if not func:
+                raise URPCError(URPC_ERR_NONEXIST)
+            # Lookup for marshalled result in function result cache
+            cache = self._func_caches.get(handle)
+            if cache is not None:
+                args_pos = req.tell()
+                cache_key = (version, bytes(sig_args), req.read())
+                cached = cache.get(cache_key)
+                # Cache hit; reply with marshalled result
+                if cached is not None:
+                    if timer:
+                        timer.mark("decode")
+                    res = self._build_header(URPC_MSG_CALL_RESULT, "recv", version)
+                    write_data(res, msg_id, URPC_TYPE_U16)
+                    res.write(cached)
+                    if timer:
+                        timer.mark("encode")
+                    return res
+                req.seek(args_pos)
+            # Arguments
+            args = self._unmarshall(req, sig_args, version)
+            if timer:
+                timer.mark("decode")
+            # Call function
+            call_key = (peer, msg_id)
+            token = self._running_calls[call_key] = CancelToken()
+            outer_token, self.cancel_token = self.cancel_token, token
+            try:
+                if self._hooks:
+                    sig_rets, result = self._dispatch_traced(func, handle, msg_id, sig_args, args)
+                else:
+                    sig_rets, result = func(sig_args, args)
+            finally:
+                self.cancel_token = outer_token
+                del self._running_calls[call_key]
+            # Call cancelled while running; drop result
+            if token.cancelled:
+                return None
+            if len(result)!=len(sig_rets):
+                raise URPCError(URPC_ERR_SIG_INCORRECT)
+            if timer:
+                timer.mark("dispatch")
+            # Response message
+            res = self._build_header(URPC_MSG_CALL_RESULT, "recv", version)
+            write_data(res, msg_id, URPC_TYPE_U16)
+            result_pos = res.tell()
+            # Return values and signature
+            write_vary(res, sig_rets)
+            self._marshall(res, sig_rets, result, version)
+            # Cache marshalled result
+            if cache is not None:
+                cache.put(cache_key, res.getvalue()[result_pos:])
+            if timer:
+                timer.mark("encode")
+            return res
+        # Record error code of failed call
+        except URPCError as e:
+            # Call cancelled while running; drop error
+            if token is not None and token.cancelled:
+                return None
+            if timer:
+                timer.error = e.reason
+            raise
     def _handle_call_result(self, res, msg_id):
         """!
         @brief u-RPC error result handler.
@@ -224,17 +772,36 @@ class URPC(object):
         req_msg_id = read_data(res, URPC_TYPE_U16)
         # Result and signature
         sig_rets = read_vary(res)
-        result = self._unmarshall(res, sig_rets)
+        try:
+            result = self._unmarshall(res, sig_rets, self._frame_version)
+        # Fail call with broken result
+        except URPCError as e:
+            if self.metrics:
+                self.metrics.end_request(req_msg_id, self._frame_timer.bytes_in, e.reason)
+            callback = self._pop_callback(req_msg_id)
+            if callback:
+                callback(e, None)
+            raise
+        # Record call metrics
+        if self.metrics:
+            self.metrics.end_request(req_msg_id, self._frame_timer.bytes_in)
         # Invoke callback
         self._invoke_callback(req_msg_id, result)
-    def add_func(self, func, arg_types=None, ret_types=None, name=None):
+    def add_func(self, func, arg_types=None, ret_types=None, name=None, cache=None,
+        priority=None):
         """!
         @brief Add a function to u-RPC instance.
 
+        Results of pure functions can be cached by passing an LRUCache instance
+        (or True for a default cache) as cache. Cached results are keyed by the
+        raw arguments and replayed without calling the function.
+
         @param func Function to be added.
         @param arg_types Signature of arguments.
         @param ret_types Signature of return values.
         @param name Name of the function.
+        @param cache Result cache of the function.
+        @param priority Priority class of calls to the function (URPC_PRIO_NORMAL by default).
         @return Handle for the object.
         @throws URPCError If there is no more space for the function.
         """
@@ -251,6 +818,14 @@ class URPC(object):
         # Add function to name lookup
         if name:
             self._func_name_lookup[name] = handle
+        # Function result cache
+        if cache is True:
+            cache = LRUCache()
+        if cache is not None and cache is not False:
+            self._func_caches[handle] = cache
+        # Function priority class
+        if priority is not None:
+            self._func_priorities[handle] = priority
         # Return handle
         return handle
     def remove_func(self, handle):
@@ -265,26 +840,94 @@ class URPC(object):
         # Remove function from name lookup
         if handle in self._func_name_lookup.inv:
             del self._func_name_lookup.inv[handle]
+        # Remove function result cache and priority class
+        self._func_caches.pop(handle, None)
+        self._func_priorities.pop(handle, None)
+    def invalidate_cache(self, handle):
+        """!
+        @brief Remove all cached results of a function.
+
+        @param handle Handle for the function.
+        """
+        cache = self._func_caches.get(handle)
+        if cache is not None:
+            cache.clear()
+    def cache_stats(self, handle):
+        """!
+        @brief Get result cache statistics of a function.
+
+        @param handle Handle for the function.
+        @return Cache statistics in a dictionary, or None if the function is not cached.
+        """
+        cache = self._func_caches.get(handle)
+        return cache.stats() if cache is not None else None
     def query(self, func_name, callback=None):
         """!
         @brief Query u-RPC function handle.
 
         @param func_name Function name.
         @param callback Called when query completed.
+        @return Request message ID.
         """
         # Decorator style
         if not callback:
             return lambda _callback: self.query(func_name, _callback)
+        # Remember resolved handle for caller-side caching
+        def resolved(error, handle):
+            if not error:
+                self._remote_names[func_name] = handle
+                cache = self._remote_cache_names.get(func_name)
+                if cache is not None:
+                    self._remote_caches[handle] = cache
+            callback(error, handle)
         # Build u-RPC message
-        msg_id = self._counters["send"]
-        req = self._build_header(URPC_MSG_FUNC_QUERY, "send")
+        msg_id = self._next_msg_id("send")
+        req = self._build_header(URPC_MSG_FUNC_QUERY, "send", self.version, msg_id)
         # Function name length and function name
         write_vary(req, func_name.encode("utf-8"))
-        # Operation callback
-        self._oper_callbacks[msg_id] = callback
+        req_data = req.getvalue()
+        self._reserve_request(msg_id, len(req_data))
         # Send request message
-        self._send_callback(req.getvalue())
-    def call(self, handle, sig_args, args, callback=None):
+        self._add_request(msg_id, req_data, resolved)
+        return msg_id
+    def peer_version(self, peer=None):
+        """!
+        @brief Get protocol version negotiated with a peer.
+
+        @param peer Peer address (None for the version of requests of this endpoint).
+        @return Negotiated protocol version, or the version of requests if the peer never negotiated.
+        """
+        if peer is None:
+            return self.version
+        version = self._peer_versions.get(peer)
+        return self.version if version is None else version
+    def negotiate(self, callback=None):
+        """!
+        @brief Negotiate protocol version with the peer.
+
+        The highest version supported by both sides is used for later requests
+        of both endpoints. Negotiation messages always use version 1, so peers
+        that fail or never answer keep using version 1. Endpoints receiving the
+        HELLO message with a peer address only record the version for that
+        peer (See peer_version).
+
+        @param callback Called with the negotiated version when negotiation completed.
+        @return Request message ID.
+        """
+        # Decorator style
+        if not callback:
+            return lambda _callback: self.negotiate(_callback)
+        # Build u-RPC message
+        msg_id = self._next_msg_id("send")
+        req = self._build_header(URPC_MSG_HELLO, "send", URPC_VERSION, msg_id)
+        # Highest supported protocol version
+        write_data(req, self._max_version, URPC_TYPE_U8)
+        req_data = req.getvalue()
+        self._reserve_request(msg_id, len(req_data))
+        # Send request message
+        self._add_request(msg_id, req_data, callback)
+        return msg_id
+    def call(self, handle, sig_args, args, callback=None, priority=None):
         """!
         @brief Do u-RPC call.
 
@@ -292,15 +935,14 @@ class URPC(object):
         @param sig_args Signature of arguments.
         @param args Arguments.
         @param callback Called when u-RPC call completed.
+        @param priority Priority class of the call (Defaults to the priority class of the remote function).
+        @return Request message ID, or None if the call is answered from the caller-side cache
+                or merged into an identical in-flight call.
+        @throws URPCError If the request exceeds the memory budget (URPC_ERR_NO_MEMORY).
         """
         # Decorator style
         if not callback:
-            return lambda _callback: self.call(handle, sig_args, args, _callback)
-        # Build u-RPC message
-        msg_id = self._counters["send"]
-        req = self._build_header(URPC_MSG_CALL, "send")
-        # Function handle
-        write_data(req, handle, URPC_TYPE_U16)
+            return lambda _callback: self.call(handle, sig_args, args, _callback, priority)
         # Arguments and types transform
         for i in range(len(sig_args)):
             t = sig_args[i]
@@ -311,30 +953,392 @@ class URPC(object):
             if isinstance(t, URPCType):
                 args[i] = t.dumps(args[i])
                 sig_args[i] = t.underlying_type
+        # Arguments with file regions; marshalled by reference without caching
+        if any(isinstance(arg, FileRegion) for arg in args):
+            body = Frame()
+            write_vary(body, sig_args)
+            self._marshall_frame(body, sig_args, args, self.version)
+            cache = None
         # Arguments signature and arguments
-        write_vary(req, sig_args)
-        self._marshall(req, sig_args, args)
-        # Operation callback
-        self._oper_callbacks[msg_id] = callback
+        else:
+            body = BytesIO()
+            write_vary(body, sig_args)
+            self._marshall(body, sig_args, args, self.version)
+            body = body.getvalue()
+            cache = self._remote_caches.get(handle)
+        # Caller-side result cache
+        if cache is not None:
+            callback = self._cached_call(handle, cache, (self.version, body), callback)
+            if not callback:
+                return None
+        # Build u-RPC message
+        msg_id = self._next_msg_id("send")
+        if priority is None:
+            req = self._build_header(URPC_MSG_CALL, "send", self.version, msg_id)
+        # Call with priority class
+        else:
+            req = self._build_header(URPC_MSG_PRIO_CALL, "send", self.version, msg_id)
+            write_data(req, priority, URPC_TYPE_U8)
+        # Function handle, arguments signature and arguments
+        write_data(req, handle, URPC_TYPE_U16)
+        if isinstance(body, Frame):
+            body.prepend(req.getvalue())
+            req_data = body
+        else:
+            req.write(body)
+            req_data = req.getvalue()
+        try:
+            self._reserve_request(msg_id, len(req_data))
+        except URPCError as e:
+            if cache is not None:
+                callback.abort(e)
+            raise
+        # Record call metrics
+        if self.metrics:
+            with self._send_lock:
+                self.metrics.begin_request(msg_id, handle, len(req_data))
         # Send request message
-        self._send_callback(req.getvalue())
-    def recv_callback(self, data):
+        self._add_request(msg_id, req_data, callback)
+        return msg_id
+    def _cached_call(self, handle, cache, key, callback):
+        """!
+        @brief Look up a call in the caller-side cache.
+
+        @param handle Remote function handle.
+        @param cache Result cache of the remote function.
+        @param key Cache key (Protocol version and encoded arguments).
+        @param callback Call callback.
+        @return Callback for the request to send, or None if the call needs no request.
+        """
+        with self._send_lock:
+            result = cache.get(key)
+            # Merge into identical in-flight call issued since the last invalidation
+            if result is None:
+                generation = self._remote_generations.get(handle, 0)
+                inflight_key = (handle, key, generation)
+                callbacks = self._inflight.get(inflight_key)
+                if callbacks is not None:
+                    callbacks.append(callback)
+                    return None
+                self._inflight[inflight_key] = [callback]
+        # Cache hit; complete call without touching the transport
+        if result is not None:
+            callback(None, _copy_result(result))
+            return None
+        # Complete all merged calls with the result
+        def complete(error, result):
+            with self._send_lock:
+                callbacks = self._inflight.pop(inflight_key)
+                # Results of calls issued before an invalidation may be stale
+                if not error and self._remote_generations.get(handle, 0)==generation:
+                    cache.put(key, result)
+            for merged_callback in callbacks:
+                merged_callback(error, _copy_result(result) if result is not None else None)
+        # Fail merged calls when the request is cancelled or rejected
+        def abort(error):
+            with self._send_lock:
+                callbacks = self._inflight.pop(inflight_key)
+            for merged_callback in callbacks[1:]:
+                merged_callback(error, None)
+        complete.abort = abort
+        return complete
+    def _drop_merged_call(self, callback):
+        """!
+        @brief Remove a call merged into an in-flight call.
+
+        @param callback Callback of the merged call.
+        @return Whether the merged call was still waiting.
+        """
+        with self._send_lock:
+            for callbacks in self._inflight.values():
+                # First callback belongs to the call owning the request
+                if callback in callbacks[1:]:
+                    callbacks.remove(callback)
+                    return True
+        return False
+    def cache_remote(self, handle=None, name=None, cache=True):
+        """!
+        @brief Enable caller-side result cache of an idempotent remote function.
+
+        Results are cached by encoded arguments, and identical calls issued
+        while a call is in flight are merged into it.
+
+        @param handle Remote function handle.
+        @param name Remote function name (Applied once a query resolves the name).
+        @param cache Result cache (An LRUCache instance, or True for a default cache).
+        @return Result cache.
+        """
+        if cache is True:
+            cache = LRUCache()
+        if name is not None:
+            self._remote_cache_names[name] = cache
+            if handle is None:
+                handle = self._remote_names.get(name)
+            # Known handle; make the name usable for pattern invalidation
+            else:
+                self._remote_names[name] = handle
+        if handle is not None:
+            self._remote_caches[handle] = cache
+        return cache
+    def invalidate_remote(self, handle, sig_args=None, args=None):
+        """!
+        @brief Remove cached results of a remote function.
+
+        @param handle Remote function handle.
+        @param sig_args Signature of arguments (With args, removes only the result of these arguments).
+        @param args Arguments.
+        @return Whether any result was removed.
+        """
+        cache = self._remote_caches.get(handle)
+        if cache is None:
+            return False
+        # Encode arguments of the result to remove
+        if args is not None:
+            body = BytesIO()
+            write_vary(body, sig_args)
+            self._marshall(body, sig_args, args, self.version)
+        with self._send_lock:
+            # Keep results of calls in flight out of the cache
+            self._remote_generations[handle] = self._remote_generations.get(handle, 0)+1
+            # Remove all results
+            if args is None:
+                removed = len(cache)>0
+                cache.clear()
+                return removed
+            # Remove result of given arguments
+            return cache.invalidate((self.version, body.getvalue()))
+    def invalidate_remote_pattern(self, pattern):
+        """!
+        @brief Remove cached results of remote functions whose names match a pattern.
+
+        @param pattern Shell-style function name pattern (e.g. "user.*").
+        @return Names of the invalidated functions.
+        """
+        names = fnmatch.filter(self._remote_names, pattern)
+        for name in names:
+            self.invalidate_remote(self._remote_names[name])
+        return names
+    def remote_cache_stats(self, handle):
+        """!
+        @brief Get caller-side result cache statistics of a remote function.
+
+        @param handle Remote function handle.
+        @return Cache statistics in a dictionary, or None if the function is not cached.
+        """
+        cache = self._remote_caches.get(handle)
+        return cache.stats() if cache is not None else None
+    def call_sync(self, handle, sig_args, args, timeout=None, priority=None):
+        """!
+        @brief Do u-RPC call and wait for its result.
+
+        (Responses must be fed into the endpoint by another thread, unless the
+        link answers synchronously)
+
+        @param handle Remote function handle.
+        @param sig_args Signature of arguments.
+        @param args Arguments.
+        @param timeout Maximum time to wait in seconds (None to wait forever).
+        @param priority Priority class of the call.
+        @return Call results.
+        @throws URPCError If the call failed or timed out.
+        """
+        done = threading.Event()
+        outcome = []
+        def callback(error, result):
+            outcome.append((error, result))
+            done.set()
+        msg_id = self.call(handle, sig_args, args, callback, priority)
+        # Cancel unanswered call, or leave the in-flight call it was merged into
+        if not done.wait(timeout):
+            if msg_id is None:
+                unanswered = self._drop_merged_call(callback)
+            else:
+                unanswered = self.cancel(msg_id)
+            if unanswered:
+                raise URPCError(URPC_ERR_TIMEOUT)
+        # Call answered just before it was cancelled
+        done.wait()
+        error, result = outcome[0]
+        if error:
+            raise error
+        return result
+    def _send_cancel(self, req_msg_id):
+        """!
+        @brief Send call cancellation message.
+
+        @param req_msg_id Message ID of the cancelled request.
+        """
+        req = self._build_header(URPC_MSG_CANCEL, "send", self.version)
+        write_data(req, req_msg_id, URPC_TYPE_U16)
+        self._send(req.getvalue())
+    def cancel(self, msg_id):
+        """!
+        @brief Cancel an unanswered request.
+
+        The request callback is removed without being invoked, and the callee
+        is asked to drop the call. Cancellation is best effort; the callee may
+        have already run the function.
+        Calls merged into the request by the caller-side cache fail with
+        URPC_ERR_CANCELLED.
+
+        @param msg_id Request message ID returned by call or query.
+        @return Whether the request was unanswered.
+        """
+        # Record call metrics (Answered requests are already recorded)
+        if self.metrics:
+            self.metrics.end_request(msg_id, 0, URPC_ERR_CANCELLED)
+        callback = self._pop_callback(msg_id)
+        if callback is None:
+            return False
+        # Fail calls merged into the cancelled call
+        abort = getattr(callback, "abort", None)
+        if abort:
+            abort(URPCError(URPC_ERR_CANCELLED))
+        self._send_cancel(msg_id)
+        return True
+    def recv_callback(self, data, peer=None):
         """!
         @brief Callback function for incoming u-RPC messages.
 
         @param data u-RPC message data (in bytes)
+        @param peer Address of the sender (Distinguishes duplicate requests of different peers,
+                    and is the response_peer of responses to the message)
         """
-        _logger.debug("Received u-RPC message: %s", data)
+        hooks = self._hooks
+        if hooks:
+            for hook in hooks:
+                hook.on_recv(data)
+        # Call timer for the message
+        timer = self._frame_timer = CallTimer(len(data)) if self.metrics else None
+        self._frame_peer = peer
+        self._frame_size = len(data)
         # Request message stream
         req = BytesIO(data)
         # Handle message
-        res = self._handle_msg(req)
+        res = self._handle_msg(req, peer)
         # Send response message
         if res:
-            send_data = res.getvalue()
-            # Invoke send callback
-            _logger.debug("Send u-RPC message: %s", send_data)
-            self._send_callback(send_data)
+            self._send_response(res, timer, peer)
+    def dispatch(self, max_calls=None):
+        """!
+        @brief Dispatch queued calls in priority order.
+
+        (Only needed when the endpoint is created with a dispatch queue)
+
+        @param max_calls Maximum number of calls to dispatch (None for all queued calls).
+        @return Number of dispatched calls.
+        """
+        queue = self._dispatch_queue
+        n_calls = 0
+        while queue and (max_calls is None or n_calls<max_calls):
+            req, msg_id, handle, timer, peer, version = queue.pop()
+            self._sync_queue_budget()
+            if timer:
+                timer.mark("queue")
+            n_calls += 1
+            try:
+                res = self._process_call(req, msg_id, handle, timer, peer, version)
+            except URPCError as e:
+                res = self._build_error(msg_id, e.reason)
+            # Call cancelled while running
+            if res is None:
+                continue
+            if self._reply_cache is not None:
+                self._remember_reply(peer, msg_id, _request_digest(req), res)
+            self._send_response(res, timer, peer)
+        return n_calls
+    @property
+    def reading_paused(self):
+        """!
+        @brief Whether transports should stop reading for this endpoint.
+
+        (Set while the memory budget is exhausted, until usage falls to its low-water mark)
+        """
+        return self.budget is not None and self.budget.paused
+    def budget_usage(self):
+        """!
+        @brief Get memory budget usage.
+
+        @return Usage in a dictionary, or None if the endpoint has no budget.
+        """
+        return self.budget.usage() if self.budget is not None else None
+    def queue_stats(self):
+        """!
+        @brief Get dispatch queue statistics.
+
+        @return Queue statistics in a dictionary, or None if calls are dispatched immediately.
+        """
+        queue = self._dispatch_queue
+        return queue.stats() if queue is not None else None
+    def tick(self):
+        """!
+        @brief Retransmit unanswered requests in reliable mode.
+
+        Should be called periodically by the transport; requests out of
+        attempts fail with URPC_ERR_TIMEOUT and are cancelled at the callee.
+
+        @return Seconds until the next retransmission, or None if nothing is pending.
+        """
+        policy = self._reliable
+        if not self._retransmits:
+            return None
+        now = self._clock()
+        next_deadline = None
+        for msg_id, pending in list(self._retransmits.items()):
+            # Request may be answered by a callback invoked in this loop
+            if msg_id not in self._retransmits:
+                continue
+            if pending.deadline<=now:
+                # Out of attempts
+                if pending.attempts>=policy.max_attempts:
+                    if self.metrics:
+                        self.metrics.end_request(msg_id, 0, URPC_ERR_TIMEOUT)
+                    callback = self._pop_callback(msg_id)
+                    # Answered by another thread meanwhile
+                    if not callback:
+                        continue
+                    callback(URPCError(URPC_ERR_TIMEOUT), None)
+                    # Ask callee to drop the call
+                    self._send_cancel(msg_id)
+                    continue
+                # Retransmit with backoff
+                pending.attempts += 1
+                pending.timeout = min(pending.timeout*policy.backoff, policy.max_timeout)
+                pending.deadline = now+pending.timeout
+                self._send(pending.data)
+                if msg_id not in self._retransmits:
+                    continue
+            if next_deadline is None or pending.deadline<next_deadline:
+                next_deadline = pending.deadline
+        if next_deadline is None:
+            return None
+        return max(0.0, next_deadline-self._clock())
+    def add_hook(self, hook):
+        """!
+        @brief Install a tracing hook on the endpoint.
+
+        @param hook Tracing hook (An URPCHook instance).
+        """
+        self._hooks += (hook,)
+    def remove_hook(self, hook):
+        """!
+        @brief Remove an installed tracing hook.
+
+        @param hook Tracing hook.
+        @throws ValueError If the hook is not installed.
+        """
+        hooks = list(self._hooks)
+        hooks.remove(hook)
+        self._hooks = tuple(hooks)
+    def metrics_snapshot(self):
+        """!
+        @brief Get call metrics of the endpoint.
+
+        @return Call metrics in a dictionary, or None if metrics are disabled.
+        """
+        if not self.metrics:
+            return None
+        return self.metrics.snapshot(self._func_name_lookup.inv)
 
 # u-RPC message handlers
 _urpc_msg_handlers = [
@@ -343,4 +1347,10 @@ _urpc_msg_handlers = [
     URPC._handle_func_resp, # URPC_MSG_FUNC_RESP
     URPC._handle_call, # URPC_MSG_CALL
     URPC._handle_call_result, # URPC_MSG_CALL_RESULT
+    URPC._handle_prio_call, # URPC_MSG_PRIO_CALL
+    URPC._handle_cancel, # URPC_MSG_CANCEL
+    URPC._handle_hello, # URPC_MSG_HELLO
+    URPC._handle_hello_resp, # URPC_MSG_HELLO_RESP
 ]
+# Call message types
+_CALL_MSG_TYPES = (URPC_MSG_CALL, URPC_MSG_PRIO_CALL)
@@ -0,0 +1,246 @@
+from __future__ import absolute_import, unicode_literals
+import os, mmap
+from io import BytesIO
+from six.moves import range
+
+from urpc.constants import *
+from urpc.misc import URPCType
+
+## Maximum size of a file region sent as one variable length argument
+MAX_REGION_SIZE = 2**16-1
+
+## Invalid file region prompt
+PROMPT_ERR_BAD_REGION = "File region out of file bounds."
+## File region truncated prompt
+PROMPT_ERR_REGION_TRUNCATED = "File ended before the end of the region."
+## Missing destination file prompt
+PROMPT_ERR_NO_DEST_FILE = "File type has no destination file."
+
+def _fileno(file):
+    """!
+    @brief Get file descriptor of a file.
+
+    @param file File object or file descriptor.
+    @return File descriptor.
+    """
+    return file if isinstance(file, int) else file.fileno()
+
+class FileRegion(object):
+    """!
+    @brief Region of a file usable as variable length argument.
+
+    File regions are marshalled by reference: transports supporting message
+    frames send them with sendfile, so the file contents never pass through
+    Python memory on the sending side.
+    """
+    def __init__(self, file, offset=0, length=None):
+        """!
+        @brief File region constructor.
+
+        @param file File object or file descriptor (Must stay open while the region is used).
+        @param offset Offset of the region in bytes.
+        @param length Length of the region in bytes (Defaults to the rest of the file).
+        @throws ValueError If the region is out of file bounds.
+        """
+        ## File object or file descriptor
+        self.file = file
+        ## Offset of the region
+        self.offset = offset
+        file_size = os.fstat(_fileno(file)).st_size
+        # Rest of the file
+        if length is None:
+            length = file_size-offset
+        if offset<0 or length<0 or offset+length>file_size:
+            raise ValueError(PROMPT_ERR_BAD_REGION)
+        ## Length of the region
+        self.length = length
+    def fileno(self):
+        """!
+        @brief Get file descriptor of the region.
+
+        @return File descriptor.
+        """
+        return _fileno(self.file)
+    def __len__(self):
+        """!
+        @brief Get length of the region.
+
+        @return Length in bytes.
+        """
+        return self.length
+    def chunks(self, size=MAX_REGION_SIZE):
+        """!
+        @brief Split the region into consecutive sub-regions.
+
+        (Regions larger than MAX_REGION_SIZE must be sent in chunks)
+
+        @param size Maximum size of a chunk.
+        @return Iterator of sub-regions.
+        """
+        end = self.offset+self.length
+        for offset in range(self.offset, end, size):
+            yield FileRegion(self.file, offset, min(size, end-offset))
+    def read(self):
+        """!
+        @brief Read contents of the region.
+
+        @return Region contents in bytes.
+        @throws ValueError If the file ends before the end of the region.
+        """
+        fd = self.fileno()
+        parts = []
+        offset = self.offset
+        remaining = self.length
+        while remaining:
+            # Positional read leaves the file offset alone
+            if hasattr(os, "pread"):
+                data = os.pread(fd, remaining, offset)
+            else:
+                os.lseek(fd, offset, os.SEEK_SET)
+                data = os.read(fd, remaining)
+            if not data:
+                raise ValueError(PROMPT_ERR_REGION_TRUNCATED)
+            parts.append(data)
+            offset += len(data)
+            remaining -= len(data)
+        return b"".join(parts)
+    def view(self):
+        """!
+        @brief Map the region into memory.
+
+        @return Read-only memory view of the region.
+        """
+        if not self.length:
+            return memoryview(b"")
+        # Mapping offset must be aligned to the allocation granularity
+        start = self.offset-self.offset%mmap.ALLOCATIONGRANULARITY
+        mm = mmap.mmap(
+            self.fileno(), self.offset+self.length-start,
+            access=mmap.ACCESS_READ, offset=start
+        )
+        return memoryview(mm)[self.offset-start:]
+
+class Frame(object):
+    """!
+    @brief u-RPC message made of byte strings and file regions.
+
+    Usable as a write-only stream while the message is marshalled; bytes
+    between file regions are coalesced into single parts.
+    """
+    def __init__(self):
+        """!
+        @brief Message frame constructor.
+        """
+        ## Message parts (Byte strings and file regions)
+        self._parts = []
+        ## Bytes written after the last part
+        self._buf = BytesIO()
+        ## Total length of the message
+        self._length = 0
+    def _flush(self):
+        """!
+        @brief Move buffered bytes into a part.
+        """
+        data = self._buf.getvalue()
+        if data:
+            self._parts.append(data)
+            self._buf = BytesIO()
+    def write(self, data):
+        """!
+        @brief Append bytes to the message.
+
+        @param data Data to append.
+        """
+        self._buf.write(data)
+        self._length += len(data)
+    def write_region(self, region):
+        """!
+        @brief Append a file region to the message.
+
+        @param region File region.
+        """
+        self._flush()
+        self._parts.append(region)
+        self._length += len(region)
+    def prepend(self, data):
+        """!
+        @brief Insert bytes at the start of the message.
+
+        @param data Data to insert (e.g. message header).
+        """
+        self._flush()
+        if self._parts and not isinstance(self._parts[0], FileRegion):
+            self._parts[0] = data+self._parts[0]
+        else:
+            self._parts.insert(0, data)
+        self._length += len(data)
+    @property
+    def parts(self):
+        """!
+        @brief Parts of the message (Byte strings and file regions).
+        """
+        self._flush()
+        return self._parts
+    def __len__(self):
+        """!
+        @brief Get total length of the message.
+
+        @return Length in bytes.
+        """
+        return self._length
+    def tobytes(self):
+        """!
+        @brief Flatten the message into a byte string.
+
+        @return Message data.
+        """
+        return b"".join(
+            part.read() if isinstance(part, FileRegion) else part
+            for part in self.parts
+        )
+
+class FileType(URPCType):
+    """!
+    @brief u-RPC file type and (de)serializer.
+
+    File regions are dumped as they are and sent by reference. Received
+    data is appended to the destination file and loaded as a file region
+    of that file, which the function can map with FileRegion.view instead
+    of keeping the data in memory.
+    """
+    def __init__(self, file=None):
+        """!
+        @brief u-RPC file type constructor.
+
+        @param file Destination file object or file descriptor (Only needed for loading; should be unbuffered).
+        """
+        ## Destination file
+        self.file = file
+    def loads(self, data):
+        """!
+        @brief Append received data to the destination file.
+
+        @param data Raw bytes to write.
+        @return File region holding the data.
+        @throws ValueError If the type has no destination file.
+        """
+        if self.file is None:
+            raise ValueError(PROMPT_ERR_NO_DEST_FILE)
+        fd = _fileno(self.file)
+        offset = os.lseek(fd, 0, os.SEEK_END)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        return FileRegion(self.file, offset, len(data))
+    def dumps(self, value):
+        """!
+        @brief Convert file region or bytes to u-RPC variable length data.
+
+        @param value File region or bytes.
+        @return File region or byte array.
+        """
+        if isinstance(value, FileRegion):
+            return value
+        return bytearray(value)
+    ## u-RPC underlying type
+    underlying_type = URPC_TYPE_VARY
@@ -0,0 +1,375 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import socket, random, argparse, threading
+from collections import namedtuple
+
+from urpc.constants import *
+from urpc.util import clock, import_spec
+from urpc.endpoint import URPC
+from urpc.metrics import LatencyHistogram
+from urpc.transport import SocketTransport, poll_transports
+
+## Type name to u-RPC type mapping
+_TYPE_NAMES = {
+    "I8": URPC_TYPE_I8,
+    "U8": URPC_TYPE_U8,
+    "I16": URPC_TYPE_I16,
+    "U16": URPC_TYPE_U16,
+    "I32": URPC_TYPE_I32,
+    "U32": URPC_TYPE_U32,
+    "I64": URPC_TYPE_I64,
+    "U64": URPC_TYPE_U64
+}
+## Default size of variable length arguments
+DEFAULT_VARY_SIZE = 16
+
+## Invalid call specification error prompt
+PROMPT_ERR_BAD_CALL_SPEC = "Invalid call specification: %s"
+## Function query timeout error prompt
+PROMPT_ERR_QUERY_TIMEOUT = "Function query timed out."
+
+## Load generator call specification class
+CallSpec = namedtuple("CallSpec", ["name", "sig", "args", "weight"])
+
+def parse_call_spec(spec):
+    """!
+    @brief Parse call specification.
+
+    Specifications take the form "NAME[:TYPES][@WEIGHT]", where TYPES is a
+    comma-separated list of integer type names (I8 to U64) or "VARY<n>" for
+    an n-byte variable length argument. Integer arguments are sent as 1.
+
+    @param spec Call specification string.
+    @return Call specification.
+    @throws ValueError If the specification is invalid.
+    """
+    spec, _, weight = spec.partition("@")
+    name, _, types = spec.partition(":")
+    if not name:
+        raise ValueError(PROMPT_ERR_BAD_CALL_SPEC % spec)
+    sig = []
+    args = []
+    for type_name in filter(None, types.split(",")):
+        type_name = type_name.strip().upper()
+        # Variable length argument
+        if type_name.startswith("VARY"):
+            size = type_name[4:]
+            sig.append(URPC_TYPE_VARY)
+            args.append(b"x"*(int(size) if size else DEFAULT_VARY_SIZE))
+        # Integer argument
+        elif type_name in _TYPE_NAMES:
+            sig.append(_TYPE_NAMES[type_name])
+            args.append(1)
+        else:
+            raise ValueError(PROMPT_ERR_BAD_CALL_SPEC % spec)
+    return CallSpec(name, bytearray(sig), args, float(weight) if weight else 1.0)
+
+class _IntervalStats(object):
+    """!
+    @brief Load generator statistics of a reporting interval.
+    """
+    def __init__(self):
+        ## Number of sent requests
+        self.sent = 0
+        ## Number of completed requests
+        self.completed = 0
+        ## Number of requests not sent due to the pending limit
+        self.dropped = 0
+        ## Number of failed requests per error code
+        self.errors = {}
+        ## Latency histogram
+        self.latency = LatencyHistogram()
+    def merge(self, other):
+        """!
+        @brief Merge statistics of another interval.
+
+        @param other Interval statistics.
+        """
+        self.sent += other.sent
+        self.completed += other.completed
+        self.dropped += other.dropped
+        for status, count in other.errors.items():
+            self.errors[status] = self.errors.get(status, 0)+count
+        self.latency.merge(other.latency)
+
+class LoadGenerator(object):
+    """!
+    @brief Open-loop u-RPC load generator.
+
+    Requests are issued on a fixed schedule regardless of outstanding
+    responses, and latencies are measured from the scheduled send time, so
+    queueing delay caused by a saturated target is not hidden (No coordinated
+    omission).
+    """
+    def __init__(self, endpoint, poll, calls, rate, max_pending=10000, seed=None):
+        """!
+        @brief Load generator constructor.
+
+        @param endpoint Caller u-RPC endpoint.
+        @param poll Function that handles incoming messages, waiting at most given seconds.
+        @param calls Call specifications.
+        @param rate Request rate in requests per second.
+        @param max_pending Maximum number of outstanding requests.
+        @param seed Random seed of call selection.
+        """
+        ## Caller endpoint
+        self.endpoint = endpoint
+        ## Poll function
+        self.poll = poll
+        ## Call specifications
+        self.calls = calls
+        ## Request rate
+        self.rate = rate
+        ## Maximum number of outstanding requests
+        self.max_pending = max_pending
+        ## Remote function handles
+        self.handles = {}
+        ## Number of outstanding requests
+        self._pending = 0
+        ## Statistics of current interval
+        self._stats = _IntervalStats()
+        ## Random number generator
+        self._random = random.Random(seed)
+        ## Cumulative call weights
+        self._weights = []
+        total = 0
+        for call in calls:
+            total += call.weight
+            self._weights.append(total)
+    def resolve(self, timeout=5.0):
+        """!
+        @brief Resolve remote function handles through function query.
+
+        @param timeout Maximum time to wait for query responses.
+        @throws URPCError If a function query fails.
+        @throws RuntimeError If queries time out.
+        """
+        names = set(call.name for call in self.calls)
+        results = {}
+        for name in names:
+            def callback(error, handle, name=name):
+                results[name] = (error, handle)
+            self.endpoint.query(name, callback)
+        deadline = clock()+timeout
+        while len(results)<len(names):
+            remaining = deadline-clock()
+            if remaining<=0:
+                raise RuntimeError(PROMPT_ERR_QUERY_TIMEOUT)
+            self.poll(remaining)
+        for name, (error, handle) in results.items():
+            if error:
+                raise error
+            self.handles[name] = handle
+    def _pick_call(self):
+        """!
+        @brief Pick a call specification by weight.
+
+        @return Call specification.
+        """
+        point = self._random.random()*self._weights[-1]
+        for call, weight in zip(self.calls, self._weights):
+            if point<weight:
+                return call
+        return self.calls[-1]
+    def _issue(self, intended):
+        """!
+        @brief Issue a request scheduled at given time.
+
+        @param intended Scheduled send time.
+        """
+        stats = self._stats
+        # Too many outstanding requests
+        if self._pending>=self.max_pending:
+            stats.dropped += 1
+            return
+        call = self._pick_call()
+        def callback(error, _):
+            self._pending -= 1
+            # Responses are accounted to the interval they arrive in
+            stats = self._stats
+            stats.completed += 1
+            stats.latency.record(clock()-intended)
+            if error:
+                stats.errors[error.reason] = stats.errors.get(error.reason, 0)+1
+        self._pending += 1
+        stats.sent += 1
+        self.endpoint.call(self.handles[call.name], bytearray(call.sig), list(call.args), callback)
+    def run(self, duration, interval=1.0, drain=1.0, report=None):
+        """!
+        @brief Run the load generator.
+
+        @param duration Duration of the run in seconds.
+        @param interval Reporting interval in seconds.
+        @param drain Maximum time to wait for outstanding responses after the run.
+        @param report Function called with elapsed time and statistics of each interval.
+        @return Summary of the run in a dictionary.
+        """
+        total = _IntervalStats()
+        period = 1.0/self.rate
+        start = clock()
+        end = start+duration
+        next_report = start+interval
+        n_issued = 0
+        while True:
+            now = clock()
+            # Issue all due requests
+            next_send = start+n_issued*period
+            while next_send<=now and next_send<end:
+                self._issue(next_send)
+                n_issued += 1
+                next_send = start+n_issued*period
+            # Report interval statistics
+            if now>=next_report:
+                if report:
+                    report(now-start, self._stats)
+                total.merge(self._stats)
+                self._stats = _IntervalStats()
+                next_report += interval
+            # Run finished
+            if next_send>=end and (not self._pending or now>=end+drain):
+                break
+            # Wait for responses until next event
+            wake = min(next_send if next_send<end else end+drain, next_report)
+            self.poll(max(0.0, wake-clock()))
+        elapsed = clock()-start
+        # Report last partial interval
+        if report and (self._stats.sent or self._stats.completed or self._stats.dropped):
+            report(elapsed, self._stats)
+        total.merge(self._stats)
+        return {
+            "elapsed": elapsed,
+            "sent": total.sent,
+            "completed": total.completed,
+            "dropped": total.dropped,
+            "timeouts": self._pending,
+            "throughput": total.completed/elapsed,
+            "errors": dict(
+                (urpc_status_names.get(status, status), count)
+                for status, count in total.errors.items()
+            ),
+            "latency": total.latency.snapshot()
+        }
+
+def _format_us(value):
+    """!
+    @brief Format latency in microseconds as milliseconds.
+
+    @param value Latency in microseconds.
+    @return Formatted latency.
+    """
+    return "-" if value is None else "%.3f" % (value/1000.0)
+
+def _print_interval(elapsed, stats):
+    """!
+    @brief Print statistics of a reporting interval.
+
+    @param elapsed Elapsed time since start.
+    @param stats Interval statistics.
+    """
+    print("%8.1f s  sent %7d  done %7d  err %5d  drop %5d  p50 %9s  p99 %9s  max %9s ms" % (
+        elapsed,
+        stats.sent,
+        stats.completed,
+        sum(stats.errors.values()),
+        stats.dropped,
+        _format_us(stats.latency.percentile(50)),
+        _format_us(stats.latency.percentile(99)),
+        _format_us(stats.latency.max)
+    ))
+
+def _parse_address(address):
+    """!
+    @brief Parse "host:port" address.
+
+    @param address Address string.
+    @return Host and port.
+    """
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+def main(argv=None):
+    """!
+    @brief Load generator command entry.
+
+    @param argv Command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m urpc.loadgen",
+        description="Open-loop load generator for u-RPC endpoints."
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--tcp", metavar="HOST:PORT", help="Target endpoint over TCP")
+    target.add_argument("--udp", metavar="HOST:PORT", help="Target endpoint over UDP")
+    target.add_argument(
+        "--socketpair",
+        metavar="MODULE:FUNC",
+        help="Local target endpoint over a socket pair, set up by given function"
+    )
+    parser.add_argument(
+        "--call",
+        action="append",
+        required=True,
+        metavar="NAME[:TYPES][@WEIGHT]",
+        help="Call in the request mix, e.g. func_2:VARY64@3 (Repeatable)"
+    )
+    parser.add_argument("--rate", type=float, default=1000.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Run duration in seconds")
+    parser.add_argument("--interval", type=float, default=1.0, help="Reporting interval in seconds")
+    parser.add_argument("--drain", type=float, default=1.0, help="Time to wait for late responses")
+    parser.add_argument("--max-pending", type=int, default=10000, help="Outstanding request limit")
+    parser.add_argument("--seed", type=int, help="Random seed of the request mix")
+    args = parser.parse_args(argv)
+    calls = [parse_call_spec(spec) for spec in args.call]
+    # Target connection
+    stop = threading.Event()
+    if args.tcp:
+        sock = socket.create_connection(_parse_address(args.tcp))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    elif args.udp:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect(_parse_address(args.udp))
+    else:
+        sock, target_sock = socket.socketpair()
+        target = SocketTransport(target_sock)
+        target.endpoint = URPC(send_callback=target.send)
+        import_spec(args.socketpair)(target.endpoint)
+        # Serve target endpoint in background thread
+        def serve_target():
+            transports = [target]
+            while transports and not stop.is_set():
+                poll_transports(transports, 0.1)
+        thread = threading.Thread(target=serve_target)
+        thread.daemon = True
+        thread.start()
+    transport = SocketTransport(sock)
+    transport.endpoint = endpoint = URPC(send_callback=transport.send)
+    transports = [transport]
+    generator = LoadGenerator(
+        endpoint=endpoint,
+        poll=lambda timeout: poll_transports(transports, timeout),
+        calls=calls,
+        rate=args.rate,
+        max_pending=args.max_pending,
+        seed=args.seed
+    )
+    try:
+        generator.resolve()
+        summary = generator.run(args.duration, args.interval, args.drain, _print_interval)
+    finally:
+        stop.set()
+        transport.close()
+    # Print summary
+    latency = summary["latency"]
+    print("")
+    print("Sent:        %d" % summary["sent"])
+    print("Completed:   %d" % summary["completed"])
+    print("Dropped:     %d" % summary["dropped"])
+    print("Timeouts:    %d" % summary["timeouts"])
+    print("Throughput:  %.1f calls/s" % summary["throughput"])
+    for name, count in sorted(summary["errors"].items()):
+        print("%-12s %d (%.2f%%)" % (name+":", count, 100.0*count/max(summary["sent"], 1)))
+    print("Latency:     p50 %s  p90 %s  p99 %s  p99.9 %s  max %s ms" % tuple(
+        _format_us(latency[key]) for key in ("p50", "p90", "p99", "p999", "max")
+    ))
+
+if __name__=="__main__":
+    main()
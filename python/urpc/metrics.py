@@ -0,0 +1,342 @@
+from __future__ import absolute_import, unicode_literals
+from six.moves import range
+
+from urpc.constants import urpc_status_names
+from urpc.util import clock
+
+## Number of sub-bucket bits of the latency histogram
+_HIST_SUB_BITS = 3
+## Number of sub-buckets per power of two
+_HIST_SUB_COUNT = 1<<_HIST_SUB_BITS
+
+## Callee-side call phases
+CALLEE_PHASES = ("queue", "decode", "dispatch", "encode", "send")
+## Percentiles reported in histogram snapshot
+SNAPSHOT_PERCENTILES = (50, 90, 99, 99.9)
+
+def _bucket_index(value):
+    """!
+    @brief Get histogram bucket index of a value.
+
+    @param value Non-negative integer value.
+    @return Bucket index.
+    """
+    # Small values map to themselves
+    if value<_HIST_SUB_COUNT:
+        return value
+    # Exponent and most significant bits
+    shift = value.bit_length()-_HIST_SUB_BITS-1
+    return ((shift+1)<<_HIST_SUB_BITS)+(value>>shift)-_HIST_SUB_COUNT
+
+def _bucket_bounds(index):
+    """!
+    @brief Get lower bound and width of a histogram bucket.
+
+    @param index Bucket index.
+    @return Lower bound and width of the bucket.
+    """
+    # Exact buckets for small values
+    if index<2*_HIST_SUB_COUNT:
+        return index, 1
+    # Logarithmic buckets
+    shift = (index>>_HIST_SUB_BITS)-1
+    lower = ((index&(_HIST_SUB_COUNT-1))+_HIST_SUB_COUNT)<<shift
+    return lower, 1<<shift
+
+class LatencyHistogram(object):
+    """!
+    @brief Log-bucketed latency histogram.
+
+    Latencies are recorded in microseconds into buckets with 8 sub-buckets per
+    power of two, giving a relative error below 12.5% with constant memory and
+    constant time per recorded value.
+    """
+    def __init__(self, max_value=2**36):
+        """!
+        @brief Latency histogram constructor.
+
+        @param max_value Maximum trackable latency in microseconds; larger values are clamped.
+        """
+        ## Maximum trackable value
+        self._max_value = max_value
+        ## Bucket counters
+        self._counts = [0]*(_bucket_index(max_value)+1)
+        ## Number of recorded values
+        self.count = 0
+        ## Sum of recorded values
+        self.total = 0
+        ## Minimum recorded value
+        self.min = None
+        ## Maximum recorded value
+        self.max = None
+    def record(self, seconds):
+        """!
+        @brief Record a latency.
+
+        @param seconds Latency in seconds.
+        """
+        value = int(seconds*1000000)
+        # Clamp value into trackable range
+        if value<0:
+            value = 0
+        elif value>self._max_value:
+            value = self._max_value
+        self._counts[_bucket_index(value)] += 1
+        # Update summary statistics
+        self.count += 1
+        self.total += value
+        if self.min is None or value<self.min:
+            self.min = value
+        if self.max is None or value>self.max:
+            self.max = value
+    def percentile(self, percent):
+        """!
+        @brief Get approximate percentile of recorded latencies.
+
+        @param percent Percentile in range [0, 100].
+        @return Latency in microseconds, or None if nothing is recorded.
+        """
+        if not self.count:
+            return None
+        # Rank of the percentile
+        rank = max(1, int(self.count*percent/100.0+0.5))
+        seen = 0
+        for i in range(len(self._counts)):
+            seen += self._counts[i]
+            if seen>=rank:
+                # Report the upper bound of the bucket
+                lower, width = _bucket_bounds(i)
+                return min(lower+width-1, self.max)
+        return self.max
+    def merge(self, other):
+        """!
+        @brief Merge another histogram into this histogram.
+
+        @param other Histogram to merge.
+        """
+        for i in range(min(len(self._counts), len(other._counts))):
+            self._counts[i] += other._counts[i]
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min<self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max>self.max):
+            self.max = other.max
+    def snapshot(self):
+        """!
+        @brief Get histogram summary as a dictionary.
+
+        @return Histogram summary (Values in microseconds).
+        """
+        summary = {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": float(self.total)/self.count if self.count else None
+        }
+        # Percentiles
+        for percent in SNAPSHOT_PERCENTILES:
+            summary["p%s" % ("%g" % percent).replace(".", "")] = self.percentile(percent)
+        return summary
+
+class CallStats(object):
+    """!
+    @brief Statistics of calls to a single function.
+    """
+    def __init__(self, phases=()):
+        """!
+        @brief Call statistics constructor.
+
+        @param phases Names of separately timed call phases.
+        """
+        ## Number of calls
+        self.calls = 0
+        ## Number of calls per status code
+        self.errors = {}
+        ## Request bytes
+        self.bytes_in = 0
+        ## Response bytes
+        self.bytes_out = 0
+        ## End-to-end latency histogram
+        self.latency = LatencyHistogram()
+        ## Per-phase latency histograms
+        self.phases = dict((phase, LatencyHistogram()) for phase in phases)
+    def record_error(self, status):
+        """!
+        @brief Record a call error.
+
+        @param status u-RPC error code.
+        """
+        self.errors[status] = self.errors.get(status, 0)+1
+    def snapshot(self):
+        """!
+        @brief Get call statistics as a dictionary.
+
+        @return Call statistics.
+        """
+        return {
+            "calls": self.calls,
+            "errors": dict(
+                (urpc_status_names.get(status, status), count)
+                for status, count in self.errors.items()
+            ),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "latency": self.latency.snapshot(),
+            "phases": dict(
+                (phase, hist.snapshot()) for phase, hist in self.phases.items()
+            )
+        }
+
+class CallTimer(object):
+    """!
+    @brief Phase timer of a single callee-side call.
+    """
+    def __init__(self, bytes_in):
+        """!
+        @brief Call timer constructor.
+
+        @param bytes_in Size of request message.
+        """
+        ## Size of request message
+        self.bytes_in = bytes_in
+        ## Function handle (Set once the call message is decoded)
+        self.handle = None
+        ## u-RPC error code of failed call
+        self.error = None
+        ## Call start time
+        self._start = self._last = clock()
+        ## Phase durations
+        self._phases = []
+    def mark(self, phase):
+        """!
+        @brief Mark the end of a call phase.
+
+        @param phase Name of the phase.
+        """
+        now = clock()
+        self._phases.append((phase, now-self._last))
+        self._last = now
+
+class URPCMetrics(object):
+    """!
+    @brief u-RPC endpoint metrics.
+
+    Callee-side statistics are keyed by local function handle, while caller-side
+    statistics are keyed by remote function handle.
+    """
+    def __init__(self):
+        """!
+        @brief u-RPC endpoint metrics constructor.
+        """
+        ## Callee-side statistics
+        self.callee = {}
+        ## Caller-side statistics
+        self.caller = {}
+        ## Caller-side in-flight calls (Message ID to handle and start time mapping)
+        self._pending = {}
+    def callee_stats(self, handle):
+        """!
+        @brief Get callee-side statistics of a local function.
+
+        @param handle Local function handle.
+        @return Call statistics.
+        """
+        stats = self.callee.get(handle)
+        if stats is None:
+            stats = self.callee[handle] = CallStats(CALLEE_PHASES)
+        return stats
+    def caller_stats(self, handle):
+        """!
+        @brief Get caller-side statistics of a remote function.
+
+        @param handle Remote function handle.
+        @return Call statistics.
+        """
+        stats = self.caller.get(handle)
+        if stats is None:
+            stats = self.caller[handle] = CallStats()
+        return stats
+    def finish_call(self, timer, bytes_out=0):
+        """!
+        @brief Record a finished callee-side call.
+
+        @param timer Call timer.
+        @param bytes_out Size of response message.
+        """
+        stats = self.callee_stats(timer.handle)
+        stats.calls += 1
+        stats.bytes_in += timer.bytes_in
+        stats.bytes_out += bytes_out
+        # Call failed
+        if timer.error is not None:
+            stats.record_error(timer.error)
+        # Latencies
+        stats.latency.record(timer._last-timer._start)
+        for phase, duration in timer._phases:
+            stats.phases[phase].record(duration)
+    def begin_request(self, msg_id, handle, bytes_out):
+        """!
+        @brief Record a caller-side call request.
+
+        @param msg_id Request message ID.
+        @param handle Remote function handle.
+        @param bytes_out Size of request message.
+        """
+        stats = self.caller_stats(handle)
+        stats.calls += 1
+        stats.bytes_out += bytes_out
+        self._pending[msg_id] = (handle, clock())
+    def end_request(self, msg_id, bytes_in, error=None):
+        """!
+        @brief Record a caller-side call response.
+
+        (Responses to requests other than calls are ignored)
+
+        @param msg_id Request message ID.
+        @param bytes_in Size of response message.
+        @param error u-RPC error code if the call failed.
+        """
+        pending = self._pending.pop(msg_id, None)
+        if pending is None:
+            return
+        handle, start = pending
+        stats = self.caller_stats(handle)
+        stats.bytes_in += bytes_in
+        # Call failed
+        if error is not None:
+            stats.record_error(error)
+        stats.latency.record(clock()-start)
+    def drop_request(self, msg_id):
+        """!
+        @brief Forget a caller-side call request without recording a response.
+
+        @param msg_id Request message ID.
+        """
+        self._pending.pop(msg_id, None)
+    def snapshot(self, func_names=None):
+        """!
+        @brief Get metrics as a dictionary.
+
+        @param func_names Local function handle to name mapping.
+        @return Metrics data.
+        """
+        func_names = func_names or {}
+        # Callee-side statistics
+        callee = {}
+        for handle, stats in self.callee.items():
+            snapshot = callee[handle] = stats.snapshot()
+            snapshot["name"] = func_names.get(handle)
+        return {
+            "callee": callee,
+            "caller": dict(
+                (handle, stats.snapshot()) for handle, stats in self.caller.items()
+            )
+        }
+    def reset(self):
+        """!
+        @brief Clear all collected statistics.
+        """
+        self.callee.clear()
+        self.caller.clear()
+        self._pending.clear()
@@ -1,6 +1,5 @@
 from __future__ import absolute_import, unicode_literals
 import functools
-from collections import Container
 from abc import ABCMeta, abstractmethod
 from six import text_type, with_metaclass
 from six.moves import range
@@ -0,0 +1,198 @@
+from __future__ import absolute_import, unicode_literals
+import struct
+from collections import deque
+
+from urpc.constants import *
+from urpc.endpoint import URPC
+
+## Channel header (Magic byte and channel ID)
+_CHANNEL_HEADER = struct.Struct("=BH")
+## Channel header magic byte
+_CHANNEL_MAGIC_BYTE = URPC_MUX_MAGIC<<4
+
+## Duplicate channel prompt
+PROMPT_ERR_CHANNEL_EXISTS = "Channel already exists."
+
+class _Channel(object):
+    """!
+    @brief Logical channel state.
+    """
+    def __init__(self, endpoint, weight):
+        """!
+        @brief Logical channel constructor.
+
+        @param endpoint u-RPC endpoint of the channel.
+        @param weight Scheduling weight of the channel.
+        """
+        ## u-RPC endpoint
+        self.endpoint = endpoint
+        ## Scheduling weight
+        self.weight = weight
+        ## Outgoing frames
+        self.queue = deque()
+        ## Number of bytes the channel may still send in this round
+        self.deficit = 0
+        ## Number of sent frames
+        self.frames = 0
+        ## Number of sent bytes
+        self.bytes = 0
+
+class ChannelMux(object):
+    """!
+    @brief Multiplexer of logical u-RPC channels over a single transport.
+
+    Every channel has its own endpoint with its own function registry and
+    message counters. Messages of channels other than 0 are prefixed with a
+    channel header (A byte with the multiplexing magic and a 2-byte channel
+    ID); channel 0 messages are sent as is, so a peer without multiplexing
+    talks to channel 0.
+
+    Outgoing messages are queued per channel and sent with deficit round
+    robin, so each channel gets a share of the link proportional to its
+    weight regardless of message sizes. Queued messages are sent by flush,
+    which poll_transports and serve call for multiplexers used in place of
+    an endpoint; other links must call flush themselves, or enable
+    automatic flushing at the cost of sending in plain FIFO order.
+    """
+    def __init__(self, send_callback, quantum=1500, auto_flush=False):
+        """!
+        @brief Channel multiplexer constructor.
+
+        @param send_callback Function for sending data.
+        @param quantum Bytes a channel of weight 1 may send per round.
+        @param auto_flush Send messages as soon as they are queued, bypassing scheduling
+                          (For synchronous links without a transport loop).
+        """
+        ## Send data callback
+        self._send_callback = send_callback
+        ## Bytes per round of weight 1
+        self.quantum = quantum
+        ## Automatic flushing
+        self.auto_flush = auto_flush
+        ## Channels (Channel ID to channel mapping)
+        self._channels = {}
+        ## IDs of channels with queued messages in round robin order
+        self._active = deque()
+        ## Flushing in progress or not
+        self._flushing = False
+        ## Number of dropped messages of unknown channels
+        self.unknown = 0
+    def channel(self, channel_id, weight=1, **kwargs):
+        """!
+        @brief Create a logical channel.
+
+        @param channel_id Channel ID.
+        @param weight Scheduling weight of the channel.
+        @param kwargs Extra arguments of the channel endpoint.
+        @return u-RPC endpoint of the channel.
+        @throws ValueError If the channel already exists.
+        """
+        if channel_id in self._channels:
+            raise ValueError(PROMPT_ERR_CHANNEL_EXISTS)
+        endpoint = URPC(send_callback=lambda data: self._enqueue(channel_id, data), **kwargs)
+        self._channels[channel_id] = _Channel(endpoint, weight)
+        return endpoint
+    def _enqueue(self, channel_id, data):
+        """!
+        @brief Queue an outgoing message of a channel.
+
+        @param channel_id Channel ID.
+        @param data u-RPC message data.
+        """
+        channel = self._channels[channel_id]
+        if channel_id:
+            data = _CHANNEL_HEADER.pack(_CHANNEL_MAGIC_BYTE, channel_id)+data
+        if not channel.queue:
+            self._active.append(channel_id)
+        channel.queue.append(data)
+        if self.auto_flush:
+            self.flush()
+    def flush(self, max_bytes=None):
+        """!
+        @brief Send queued messages in deficit round robin order.
+
+        @param max_bytes Stop after sending this many bytes (None to send all queued messages).
+        @return Number of sent bytes.
+        """
+        # Messages queued while flushing are sent by the outer flush
+        if self._flushing:
+            return 0
+        self._flushing = True
+        sent = 0
+        try:
+            active = self._active
+            while active and (max_bytes is None or sent<max_bytes):
+                channel_id = active.popleft()
+                channel = self._channels[channel_id]
+                channel.deficit += self.quantum*channel.weight
+                queue = channel.queue
+                while queue and len(queue[0])<=channel.deficit:
+                    data = queue.popleft()
+                    channel.deficit -= len(data)
+                    channel.frames += 1
+                    channel.bytes += len(data)
+                    sent += len(data)
+                    self._send_callback(data)
+                    if max_bytes is not None and sent>=max_bytes:
+                        break
+                # Channel keeps its turn in the next round
+                if queue:
+                    active.append(channel_id)
+                else:
+                    channel.deficit = 0
+        finally:
+            self._flushing = False
+        return sent
+    @property
+    def pending_bytes(self):
+        """!
+        @brief Number of queued outgoing bytes of all channels.
+        """
+        return sum(sum(len(data) for data in c.queue) for c in self._channels.values())
+    @property
+    def reading_paused(self):
+        """!
+        @brief Whether any channel endpoint paused reading.
+        """
+        return any(c.endpoint.reading_paused for c in self._channels.values())
+    def recv_callback(self, data, peer=None):
+        """!
+        @brief Callback function for incoming messages of all channels.
+
+        @param data Message data (in bytes)
+        @param peer Address of the sender.
+        """
+        channel_id = 0
+        # Channel header
+        if data and bytearray(data[:1])[0]==_CHANNEL_MAGIC_BYTE:
+            _, channel_id = _CHANNEL_HEADER.unpack_from(data)
+            data = data[_CHANNEL_HEADER.size:]
+        channel = self._channels.get(channel_id)
+        # Unknown channel
+        if channel is None:
+            self.unknown += 1
+            return
+        channel.endpoint.recv_callback(data, peer)
+    def dispatch(self, max_calls=None):
+        """!
+        @brief Dispatch queued calls of all channels.
+
+        @param max_calls Maximum number of calls to dispatch per channel (None for all queued calls).
+        @return Number of dispatched calls.
+        """
+        return sum(c.endpoint.dispatch(max_calls) for c in self._channels.values())
+    def stats(self):
+        """!
+        @brief Get per-channel send statistics.
+
+        @return Channel ID to statistics mapping.
+        """
+        return dict(
+            (channel_id, {
+                "frames": c.frames,
+                "bytes": c.bytes,
+                "queued": len(c.queue),
+                "weight": c.weight
+            })
+            for channel_id, c in self._channels.items()
+        )
@@ -0,0 +1,53 @@
+from __future__ import absolute_import, unicode_literals
+
+class ReliabilityPolicy(object):
+    """!
+    @brief Reliable datagram mode configuration.
+
+    The caller retransmits unanswered requests with the same message ID and
+    exponential backoff, while the callee replays cached responses to
+    duplicate call requests instead of calling the function again, giving
+    at-most-once execution.
+    """
+    def __init__(self, initial_timeout=0.2, backoff=2.0, max_timeout=5.0, max_attempts=5,
+        reply_cache_size=256):
+        """!
+        @brief Reliability policy constructor.
+
+        @param initial_timeout Time to wait before the first retransmission in seconds.
+        @param backoff Multiplier of the retransmission timeout after each attempt.
+        @param max_timeout Upper bound of the retransmission timeout in seconds.
+        @param max_attempts Number of transmissions before a request times out.
+        @param reply_cache_size Number of call responses kept for duplicate requests.
+        """
+        ## Initial retransmission timeout
+        self.initial_timeout = initial_timeout
+        ## Retransmission timeout multiplier
+        self.backoff = backoff
+        ## Maximum retransmission timeout
+        self.max_timeout = max_timeout
+        ## Maximum number of transmissions
+        self.max_attempts = max_attempts
+        ## Size of the callee reply cache
+        self.reply_cache_size = reply_cache_size
+
+class PendingRequest(object):
+    """!
+    @brief Retransmission state of an unanswered request.
+    """
+    def __init__(self, data, timeout, now):
+        """!
+        @brief Pending request constructor.
+
+        @param data Request message data.
+        @param timeout Current retransmission timeout.
+        @param now Time of the first transmission.
+        """
+        ## Request message data
+        self.data = data
+        ## Number of transmissions
+        self.attempts = 1
+        ## Current retransmission timeout
+        self.timeout = timeout
+        ## Time of next retransmission
+        self.deadline = now+timeout
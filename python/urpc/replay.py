@@ -0,0 +1,111 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import time, struct, argparse
+
+from urpc.constants import *
+from urpc.util import clock, import_spec
+from urpc.endpoint import URPC
+from urpc.capture import WireCapture
+
+## Request message types replayed into the endpoint
+REPLAY_MSG_TYPES = (
+    URPC_MSG_FUNC_QUERY,
+    URPC_MSG_CALL,
+    URPC_MSG_PRIO_CALL,
+    URPC_MSG_CANCEL,
+    URPC_MSG_HELLO
+)
+
+def _frame_msg_type(data):
+    """!
+    @brief Get message type of a u-RPC frame.
+
+    @param data u-RPC message data.
+    @return Message type, or None if the frame is too short.
+    """
+    if len(data)<4:
+        return None
+    return struct.unpack_from("B", data, 3)[0]
+
+def replay(capture, endpoint, realtime=False):
+    """!
+    @brief Replay recorded inbound requests into an endpoint.
+
+    (Only request messages in REPLAY_MSG_TYPES are replayed: queries, calls,
+    calls with priority class, cancellations and version negotiations.
+    Responses refer to requests the fresh endpoint never sent)
+
+    @param capture Capture reader (A WireCapture instance).
+    @param endpoint u-RPC endpoint to feed frames into.
+    @param realtime Replay at recorded speed instead of as fast as possible.
+    @return Replay statistics in a dictionary.
+    """
+    n_frames = 0
+    n_bytes = 0
+    first_timestamp = None
+    start = clock()
+    for record in capture.frames("recv"):
+        if _frame_msg_type(record.data) not in REPLAY_MSG_TYPES:
+            continue
+        # Wait until the frame is due
+        if realtime:
+            if first_timestamp is None:
+                first_timestamp = record.timestamp
+            delay = (record.timestamp-first_timestamp)-(clock()-start)
+            if delay>0:
+                time.sleep(delay)
+        endpoint.recv_callback(record.data)
+        n_frames += 1
+        n_bytes += len(record.data)
+    elapsed = clock()-start
+    return {
+        "frames": n_frames,
+        "bytes": n_bytes,
+        "elapsed": elapsed,
+        "frames_per_sec": n_frames/elapsed if elapsed else None,
+        "bytes_per_sec": n_bytes/elapsed if elapsed else None
+    }
+
+def main(argv=None):
+    """!
+    @brief Replay command entry.
+
+    @param argv Command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m urpc.replay",
+        description="Replay recorded u-RPC requests into a fresh endpoint."
+    )
+    parser.add_argument("capture", help="Capture file recorded with WireRecorder")
+    parser.add_argument(
+        "--setup",
+        required=True,
+        help="Endpoint setup function as module:function, called with the endpoint"
+    )
+    parser.add_argument("--n-funcs", type=int, default=256, help="Function store size")
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="Replay at recorded speed instead of as fast as possible"
+    )
+    args = parser.parse_args(argv)
+    # Responses are counted and discarded
+    responses = [0]
+    def send_callback(data):
+        responses[0] += 1
+    endpoint = URPC(send_callback=send_callback, n_funcs=args.n_funcs)
+    import_spec(args.setup)(endpoint)
+    # Replay capture
+    with WireCapture(args.capture) as capture:
+        stats = replay(capture, endpoint, args.realtime)
+    print("Frames:      %d" % stats["frames"])
+    print("Responses:   %d" % responses[0])
+    print("Bytes:       %d" % stats["bytes"])
+    print("Elapsed:     %.3f s" % stats["elapsed"])
+    if stats["elapsed"]:
+        print("Throughput:  %.1f frames/s, %.1f bytes/s" % (
+            stats["frames_per_sec"],
+            stats["bytes_per_sec"]
+        ))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,357 @@
+from __future__ import absolute_import, unicode_literals
+import os, mmap, time, errno, struct
+
+## Shared memory file magic
+SHM_MAGIC = b"URPCSHM1"
+## Frame length marking the end of the ring data before wrap around
+_WRAP_MARK = 0xffffffff
+## Frame length prefix
+_FRAME_PREFIX = struct.Struct("I")
+## Ring counter (Head and tail byte counters)
+_COUNTER = struct.Struct("Q")
+## File header (Magic, ring capacity and closed flags of both sides)
+_FILE_HEADER = struct.Struct("8sI4x")
+## Closed flag
+_FLAG = struct.Struct("I")
+## Offset of the closed flags in file header
+_CLOSED_OFFSET = 16
+## Size of file header
+_FILE_HEADER_SIZE = 64
+## Offsets of ring control fields (Kept on separate cache lines)
+_HEAD_OFFSET = 0
+_TAIL_OFFSET = 64
+_BUSY_POLL_OFFSET = 128
+## Size of ring control block
+_RING_HEADER_SIZE = 192
+## Maximum number of wake up bytes drained at once
+_WAKE_DRAIN_SIZE = 4096
+
+## Yield processor while busy-polling (Keeps single-core hosts responsive)
+_yield = getattr(os, "sched_yield", lambda: time.sleep(0))
+
+## Invalid shared memory file prompt
+PROMPT_ERR_BAD_SHM_FILE = "Not a u-RPC shared memory file."
+## Invalid ring capacity prompt
+PROMPT_ERR_RING_CAPACITY = "Ring capacity must be a power of two."
+## Frame too long prompt
+PROMPT_ERR_FRAME_TOO_LONG = "Frame does not fit into the ring."
+## Peer closed prompt
+PROMPT_ERR_PEER_CLOSED = "Peer closed the shared memory transport."
+## Send timeout prompt
+PROMPT_ERR_SEND_TIMEOUT = "Peer did not free ring space in time."
+
+def _align(size):
+    """!
+    @brief Round size up to frame alignment.
+
+    @param size Size in bytes.
+    @return Aligned size.
+    """
+    return (size+3)&~3
+
+def _wake(fd):
+    """!
+    @brief Write a wake up byte into a pipe.
+
+    (A full pipe already holds pending wake ups, so the byte is dropped)
+
+    @param fd Write end of the wake up pipe.
+    """
+    try:
+        os.write(fd, b"\0")
+    except OSError as e:
+        if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+            raise
+
+class ShmRing(object):
+    """!
+    @brief Single-producer/single-consumer ring buffer of frames in shared memory.
+
+    Frames are a 4-byte length followed by the frame data, aligned to 4 bytes.
+    Head and tail are monotonic byte counters owned by the producer and the
+    consumer respectively; the head is only published after the frame is
+    written, so the consumer never sees partial frames.
+    """
+    def __init__(self, buf, offset, capacity):
+        """!
+        @brief Ring buffer constructor.
+
+        @param buf Shared memory buffer (A mmap object).
+        @param offset Offset of the ring control block in the buffer.
+        @param capacity Size of ring data area (A power of two).
+        """
+        ## Shared memory buffer
+        self._buf = buf
+        ## Offset of ring control block
+        self._offset = offset
+        ## Offset of ring data area
+        self._data = offset+_RING_HEADER_SIZE
+        ## Size of ring data area
+        self.capacity = capacity
+    def _load(self, field):
+        """!
+        @brief Load a ring counter.
+
+        @param field Offset of the counter in the control block.
+        @return Counter value.
+        """
+        return _COUNTER.unpack_from(self._buf, self._offset+field)[0]
+    def _store(self, field, value):
+        """!
+        @brief Store a ring counter.
+
+        @param field Offset of the counter in the control block.
+        @param value Counter value.
+        """
+        _COUNTER.pack_into(self._buf, self._offset+field, value)
+    @property
+    def busy_poll(self):
+        """!
+        @brief Whether the consumer busy-polls instead of waiting for wake ups.
+        """
+        return bool(self._load(_BUSY_POLL_OFFSET))
+    @busy_poll.setter
+    def busy_poll(self, value):
+        self._store(_BUSY_POLL_OFFSET, 1 if value else 0)
+    def __len__(self):
+        """!
+        @brief Get number of used bytes in the ring.
+
+        @return Number of used bytes.
+        """
+        return self._load(_HEAD_OFFSET)-self._load(_TAIL_OFFSET)
+    def write(self, data):
+        """!
+        @brief Write a frame into the ring (Producer side).
+
+        @param data Frame data.
+        @return Whether the frame is written; False if the ring is full.
+        @throws ValueError If the frame can never fit into the ring.
+        """
+        size = _align(_FRAME_PREFIX.size+len(data))
+        capacity = self.capacity
+        if size>capacity:
+            raise ValueError(PROMPT_ERR_FRAME_TOO_LONG)
+        head = self._load(_HEAD_OFFSET)
+        pos = head&(capacity-1)
+        # Frame does not fit at the end; wrap around
+        pad = capacity-pos if size>capacity-pos else 0
+        if head+pad+size-self._load(_TAIL_OFFSET)>capacity:
+            return False
+        buf = self._buf
+        if pad:
+            _FRAME_PREFIX.pack_into(buf, self._data+pos, _WRAP_MARK)
+            pos = 0
+        # Write frame in place
+        start = self._data+pos+_FRAME_PREFIX.size
+        _FRAME_PREFIX.pack_into(buf, self._data+pos, len(data))
+        buf[start:start+len(data)] = data
+        # Publish frame
+        self._store(_HEAD_OFFSET, head+pad+size)
+        return True
+    def read(self):
+        """!
+        @brief Read a frame from the ring (Consumer side).
+
+        @return Frame data, or None if the ring is empty.
+        """
+        tail = self._load(_TAIL_OFFSET)
+        if tail==self._load(_HEAD_OFFSET):
+            return None
+        capacity = self.capacity
+        pos = tail&(capacity-1)
+        length = _FRAME_PREFIX.unpack_from(self._buf, self._data+pos)[0]
+        # Wrap around
+        if length==_WRAP_MARK:
+            tail += capacity-pos
+            pos = 0
+            length = _FRAME_PREFIX.unpack_from(self._buf, self._data)[0]
+        start = self._data+pos+_FRAME_PREFIX.size
+        data = self._buf[start:start+length]
+        # Release frame
+        self._store(_TAIL_OFFSET, tail+_align(_FRAME_PREFIX.size+length))
+        return data
+
+class ShmTransport(object):
+    """!
+    @brief Same-host shared memory transport for u-RPC endpoints.
+
+    Two endpoints share a memory-mapped file holding one ring per direction.
+    The side creating the file is the server. Wake ups go through a named
+    pipe per direction, so the transport can be polled with select like a
+    socket transport; a consumer that busy-polls (See spin) tells the
+    producer to skip wake ups, which removes all system calls from the
+    message path.
+    """
+    def __init__(self, path, create=False, capacity=1<<16, endpoint=None, send_timeout=None):
+        """!
+        @brief Shared memory transport constructor.
+
+        @param path Path of the shared memory file (e.g. under /dev/shm).
+        @param create Create the file as server, or attach to it as client.
+        @param capacity Size of each ring in bytes (A power of two).
+        @param endpoint u-RPC endpoint fed with received messages.
+        @param send_timeout Maximum time in seconds to wait for ring space (None to wait forever).
+        """
+        ## Shared memory file path
+        self.path = path
+        ## u-RPC endpoint
+        self.endpoint = endpoint
+        ## Maximum time to wait for ring space
+        self.send_timeout = send_timeout
+        ## Whether this side created the shared memory file
+        self._owner = create
+        ## Whether the transport is closed
+        self._closed = False
+        # Create shared memory file and wake up pipes
+        if create:
+            if capacity&(capacity-1):
+                raise ValueError(PROMPT_ERR_RING_CAPACITY)
+            size = _FILE_HEADER_SIZE+2*(_RING_HEADER_SIZE+capacity)
+            fd = os.open(path, os.O_RDWR|os.O_CREAT|os.O_TRUNC, 0o600)
+            try:
+                os.ftruncate(fd, size)
+                self._mm = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            for suffix in (".wake0", ".wake1"):
+                if os.path.exists(path+suffix):
+                    os.unlink(path+suffix)
+                os.mkfifo(path+suffix, 0o600)
+            # Write header last so clients never see a partial file
+            _FILE_HEADER.pack_into(self._mm, 0, SHM_MAGIC, capacity)
+        # Attach to existing shared memory file
+        else:
+            fd = os.open(path, os.O_RDWR)
+            try:
+                self._mm = mmap.mmap(fd, 0)
+            finally:
+                os.close(fd)
+            magic, capacity = _FILE_HEADER.unpack_from(self._mm, 0)
+            if magic!=SHM_MAGIC:
+                self._mm.close()
+                raise ValueError(PROMPT_ERR_BAD_SHM_FILE)
+        # Server receives on ring 0 and sends on ring 1; client the other way around
+        side = 0 if create else 1
+        rings = [
+            ShmRing(self._mm, _FILE_HEADER_SIZE+i*(_RING_HEADER_SIZE+capacity), capacity)
+            for i in (0, 1)
+        ]
+        ## Index of this side
+        self._side = side
+        ## Receiving ring
+        self._recv_ring = rings[side]
+        ## Sending ring
+        self._send_ring = rings[1-side]
+        # Both ends are opened read-write, so opening never blocks on the peer
+        flags = os.O_RDWR|os.O_NONBLOCK
+        ## Wake up pipe of the receiving ring
+        self._wake_recv = os.open("%s.wake%d" % (path, side), flags)
+        ## Wake up pipe of the sending ring
+        self._wake_send = os.open("%s.wake%d" % (path, 1-side), flags)
+    def fileno(self):
+        """!
+        @brief Get file descriptor that becomes readable on incoming messages.
+
+        @return File descriptor.
+        """
+        return self._wake_recv
+    def send(self, data):
+        """!
+        @brief Send a u-RPC message (Usable as endpoint send callback).
+
+        (Waits for the peer to free ring space if the sending ring is full)
+
+        @param data u-RPC message data.
+        @throws OSError If the peer closed the transport or the send timeout expired while waiting.
+        """
+        ring = self._send_ring
+        timeout = self.send_timeout
+        deadline = None if timeout is None else time.time()+timeout
+        while not ring.write(data):
+            if self.closed_by_peer:
+                raise OSError(errno.EPIPE, PROMPT_ERR_PEER_CLOSED)
+            if deadline is not None and time.time()>=deadline:
+                raise OSError(errno.ETIMEDOUT, PROMPT_ERR_SEND_TIMEOUT)
+            _yield()
+        # Wake up consumer unless it is busy-polling
+        if not ring.busy_poll:
+            _wake(self._wake_send)
+    def _drain(self):
+        """!
+        @brief Feed all received messages into the endpoint.
+
+        @return Number of received messages.
+        """
+        ring = self._recv_ring
+        n_msgs = 0
+        while True:
+            data = ring.read()
+            if data is None:
+                return n_msgs
+            self.endpoint.recv_callback(data)
+            n_msgs += 1
+    @property
+    def closed_by_peer(self):
+        """!
+        @brief Whether the peer has closed the transport.
+        """
+        offset = _CLOSED_OFFSET+(1-self._side)*_FLAG.size
+        return bool(_FLAG.unpack_from(self._mm, offset)[0])
+    def on_readable(self):
+        """!
+        @brief Receive available messages and feed them into the endpoint.
+
+        @return False if the peer closed the transport, otherwise True.
+        """
+        # Consume wake ups
+        try:
+            os.read(self._wake_recv, _WAKE_DRAIN_SIZE)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+        self._drain()
+        return not self.closed_by_peer
+    def spin(self, timeout=None):
+        """!
+        @brief Busy-poll for incoming messages.
+
+        While spinning the peer skips wake ups, so latency is bounded by the
+        polling loop instead of the scheduler.
+
+        @param timeout Maximum time to spin in seconds (None to spin until a message arrives).
+        @return Number of received messages.
+        """
+        ring = self._recv_ring
+        ring.busy_poll = True
+        try:
+            deadline = None if timeout is None else time.time()+timeout
+            while True:
+                n_msgs = self._drain()
+                if n_msgs or (deadline is not None and time.time()>=deadline):
+                    return n_msgs
+                _yield()
+        finally:
+            ring.busy_poll = False
+            # Messages sent after the last drain may have skipped the wake up
+            if len(ring):
+                _wake(self._wake_recv)
+    def close(self):
+        """!
+        @brief Close the transport and wake up the peer.
+
+        (The server also removes the shared memory file and pipes)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        _FLAG.pack_into(self._mm, _CLOSED_OFFSET+self._side*_FLAG.size, 1)
+        _wake(self._wake_send)
+        os.close(self._wake_recv)
+        os.close(self._wake_send)
+        self._mm.close()
+        # Remove files
+        if self._owner:
+            for path in (self.path, self.path+".wake0", self.path+".wake1"):
+                if os.path.exists(path):
+                    os.unlink(path)
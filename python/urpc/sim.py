@@ -0,0 +1,353 @@
+from __future__ import absolute_import, unicode_literals
+import heapq, random
+
+from urpc.endpoint import URPC
+from urpc.metrics import LatencyHistogram
+
+## Invalid link profile prompt
+PROMPT_ERR_BAD_PROFILE = "Invalid link profile: %s."
+## Unknown link profile prompt
+PROMPT_ERR_UNKNOWN_PROFILE = "Unknown link profile: %s."
+
+class LinkProfile(object):
+    """!
+    @brief Characteristics of a simulated one-way link.
+    """
+    def __init__(self, latency=0.0, bandwidth=None, mtu=None, jitter=0.0, reorder=0.0,
+        loss=0.0, reorder_delay=None):
+        """!
+        @brief Link profile constructor.
+
+        @param latency One-way propagation delay in seconds.
+        @param bandwidth Link rate in bytes per second (None for unlimited).
+        @param mtu Maximum fragment size in bytes (None for no fragmentation).
+        @param jitter Maximum extra random delay of each frame in seconds.
+        @param reorder Probability of a frame being held back and overtaken by later frames.
+        @param loss Probability of losing each fragment; a frame is lost with any of its fragments.
+        @param reorder_delay Hold back time of reordered frames in seconds (Defaults to the latency).
+        @throws ValueError If a parameter is out of range.
+        """
+        if latency<0 or jitter<0:
+            raise ValueError(PROMPT_ERR_BAD_PROFILE % "negative delay")
+        if bandwidth is not None and bandwidth<=0:
+            raise ValueError(PROMPT_ERR_BAD_PROFILE % "bandwidth")
+        if mtu is not None and mtu<=0:
+            raise ValueError(PROMPT_ERR_BAD_PROFILE % "mtu")
+        if not (0<=reorder<=1 and 0<=loss<=1):
+            raise ValueError(PROMPT_ERR_BAD_PROFILE % "probability")
+        ## One-way propagation delay
+        self.latency = latency
+        ## Link rate in bytes per second
+        self.bandwidth = bandwidth
+        ## Maximum fragment size
+        self.mtu = mtu
+        ## Maximum extra random delay
+        self.jitter = jitter
+        ## Reordering probability
+        self.reorder = reorder
+        ## Fragment loss probability
+        self.loss = loss
+        ## Hold back time of reordered frames
+        self.reorder_delay = latency if reorder_delay is None else reorder_delay
+
+## Built-in link profiles
+PROFILES = {
+    # 115200 baud serial line with 10 bits per byte
+    "serial": LinkProfile(latency=0.0005, bandwidth=11520),
+    # Gigabit LAN datagrams
+    "udp": LinkProfile(latency=0.0002, bandwidth=125000000, mtu=1472, jitter=0.00005, loss=0.001),
+    # 10 Mbit/s wide area network
+    "wan": LinkProfile(latency=0.04, bandwidth=1250000, mtu=1472, jitter=0.005, reorder=0.01,
+        loss=0.01)
+}
+
+def get_profile(profile):
+    """!
+    @brief Get a link profile by name.
+
+    @param profile Link profile, or name of a built-in profile.
+    @return Link profile.
+    @throws ValueError If the profile name is unknown.
+    """
+    if isinstance(profile, LinkProfile):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(PROMPT_ERR_UNKNOWN_PROFILE % profile)
+    return PROFILES[profile]
+
+class SimLink(object):
+    """!
+    @brief Simulated one-way link between two endpoints.
+
+    Frames are serialized at the link rate one after another, split into
+    MTU-sized fragments, and delivered through the simulator event queue
+    after the propagation delay and jitter. Frames arrive in order unless
+    held back for reordering.
+    """
+    def __init__(self, sim, profile, receiver=None):
+        """!
+        @brief Simulated link constructor.
+
+        @param sim Simulator.
+        @param profile Link profile or name of a built-in profile.
+        @param receiver Called with each delivered frame (e.g. endpoint receive callback).
+        """
+        ## Simulator
+        self.sim = sim
+        ## Link profile
+        self.profile = get_profile(profile)
+        ## Receive callback
+        self.receiver = receiver
+        ## Time the link finishes serializing queued frames
+        self._busy_until = 0.0
+        ## Delivery time of the last in-order frame
+        self._last_delivery = 0.0
+        ## Number of sent frames
+        self.sent = 0
+        ## Number of delivered frames
+        self.delivered = 0
+        ## Number of lost frames
+        self.lost = 0
+        ## Number of reordered frames
+        self.reordered = 0
+        ## Number of sent bytes
+        self.bytes = 0
+    def send(self, data):
+        """!
+        @brief Send a frame over the link (Usable as endpoint send callback).
+
+        @param data Frame data.
+        """
+        profile = self.profile
+        sim = self.sim
+        rng = sim.random
+        self.sent += 1
+        self.bytes += len(data)
+        # Serialization delay behind queued frames
+        start = max(sim.now, self._busy_until)
+        if profile.bandwidth is not None:
+            self._busy_until = start+float(len(data))/profile.bandwidth
+        else:
+            self._busy_until = start
+        # Frame is lost with any of its fragments
+        n_fragments = 1 if profile.mtu is None else max(1, -(-len(data)//profile.mtu))
+        if profile.loss and any(rng.random()<profile.loss for _ in range(n_fragments)):
+            self.lost += 1
+            return
+        arrival = self._busy_until+profile.latency
+        if profile.jitter:
+            arrival += rng.uniform(0, profile.jitter)
+        # Hold frame back so later frames overtake it
+        if profile.reorder and rng.random()<profile.reorder:
+            self.reordered += 1
+            arrival += profile.reorder_delay
+        # Keep frames in order
+        else:
+            arrival = self._last_delivery = max(arrival, self._last_delivery)
+        sim.schedule(arrival-sim.now, self._deliver, data)
+    def _deliver(self, data):
+        """!
+        @brief Deliver a frame to the receiver.
+
+        @param data Frame data.
+        """
+        self.delivered += 1
+        self.receiver(data)
+    def stats(self):
+        """!
+        @brief Get link statistics.
+
+        @return Link statistics in a dictionary.
+        """
+        return {
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "bytes": self.bytes
+        }
+
+class Simulator(object):
+    """!
+    @brief Deterministic discrete event simulator of u-RPC links.
+
+    Time is virtual and only advances between events, so simulations run as
+    fast as the endpoints process messages and give identical results for
+    the same seed. Frames are delivered from the event queue rather than
+    from within the send callback, so request and response chains never
+    recurse.
+    """
+    def __init__(self, seed=0):
+        """!
+        @brief Simulator constructor.
+
+        @param seed Random seed of jitter, reordering and loss.
+        """
+        ## Current virtual time in seconds
+        self.now = 0.0
+        ## Random number generator
+        self.random = random.Random(seed)
+        ## Number of processed events
+        self.events = 0
+        ## Event queue (Heap of time, sequence number, function and arguments)
+        self._queue = []
+        ## Event sequence number (Orders events scheduled for the same time)
+        self._seq = 0
+        ## Watched endpoints (Endpoint to scheduled tick time mapping)
+        self._watched = {}
+    def clock(self):
+        """!
+        @brief Get current virtual time (Usable as endpoint clock).
+
+        @return Virtual time in seconds.
+        """
+        return self.now
+    def schedule(self, delay, func, *args):
+        """!
+        @brief Schedule a function call.
+
+        @param delay Delay from current virtual time in seconds.
+        @param func Function to call.
+        @param args Arguments of the function.
+        """
+        heapq.heappush(self._queue, (self.now+max(0.0, delay), self._seq, func, args))
+        self._seq += 1
+    def watch(self, endpoint):
+        """!
+        @brief Drive retransmission timers of a reliable endpoint.
+
+        (The endpoint must use the simulator clock)
+
+        @param endpoint u-RPC endpoint.
+        """
+        self._watched[endpoint] = None
+    def _arm_ticks(self):
+        """!
+        @brief Run timers of watched endpoints and schedule their next ticks.
+        """
+        for endpoint, tick_at in self._watched.items():
+            delay = endpoint.tick()
+            if delay is None:
+                continue
+            deadline = self.now+delay
+            # Earlier tick already scheduled
+            if tick_at is not None and self.now<tick_at<=deadline:
+                continue
+            self._watched[endpoint] = deadline
+            self.schedule(delay, self._noop)
+    def _noop(self):
+        """!
+        @brief Event waking up the simulator for endpoint timers.
+        """
+        pass
+    def step(self):
+        """!
+        @brief Process the next event.
+
+        @return False if the event queue is empty, otherwise True.
+        """
+        if not self._queue:
+            return False
+        self.now, _, func, args = heapq.heappop(self._queue)
+        self.events += 1
+        func(*args)
+        if self._watched:
+            self._arm_ticks()
+        return True
+    def run(self, until=None):
+        """!
+        @brief Process events until the queue is empty.
+
+        @param until Virtual time to stop at (None to run until idle).
+        @return Current virtual time.
+        """
+        if self._watched:
+            self._arm_ticks()
+        queue = self._queue
+        while queue and (until is None or queue[0][0]<=until):
+            self.step()
+        if until is not None and self.now<until:
+            self.now = until
+        return self.now
+    def run_until(self, predicate, timeout=None):
+        """!
+        @brief Process events until a condition holds.
+
+        @param predicate Function returning True once done.
+        @param timeout Maximum virtual time to run in seconds.
+        @return Whether the condition holds.
+        """
+        deadline = None if timeout is None else self.now+timeout
+        if self._watched:
+            self._arm_ticks()
+        while not predicate():
+            if not self._queue or (deadline is not None and self._queue[0][0]>deadline):
+                return False
+            self.step()
+        return True
+    def pair(self, profile, reverse=None, **kwargs):
+        """!
+        @brief Create two endpoints connected by simulated links.
+
+        Both endpoints use the simulator clock, and reliable endpoints are
+        watched for retransmissions.
+
+        @param profile Link profile from the first to the second endpoint.
+        @param reverse Link profile from the second to the first endpoint (Defaults to profile).
+        @param kwargs Extra endpoint constructor arguments.
+        @return First endpoint, second endpoint and both links.
+        """
+        forward_link = SimLink(self, profile)
+        reverse_link = SimLink(self, profile if reverse is None else reverse)
+        kwargs.setdefault("clock", self.clock)
+        first = URPC(send_callback=forward_link.send, **kwargs)
+        second = URPC(send_callback=reverse_link.send, **kwargs)
+        forward_link.receiver = second.recv_callback
+        reverse_link.receiver = first.recv_callback
+        if kwargs.get("reliable"):
+            self.watch(first)
+            self.watch(second)
+        return first, second, (forward_link, reverse_link)
+
+def measure(sim, endpoint, handle, sig_args, args, n_calls, window=1, timeout=None):
+    """!
+    @brief Measure call throughput and latency in virtual time.
+
+    Keeps up to window calls in flight until n_calls calls completed.
+
+    @param sim Simulator.
+    @param endpoint Calling endpoint.
+    @param handle Remote function handle.
+    @param sig_args Signature of arguments.
+    @param args Arguments.
+    @param n_calls Number of calls.
+    @param window Maximum number of calls in flight.
+    @param timeout Maximum virtual time to run in seconds.
+    @return Measurement results in a dictionary (Latencies in microseconds).
+    """
+    latency = LatencyHistogram()
+    state = {"sent": 0, "completed": 0, "errors": 0}
+    start = sim.now
+    def issue():
+        state["sent"] += 1
+        sent_at = sim.now
+        def done(e, result):
+            state["completed"] += 1
+            if e:
+                state["errors"] += 1
+            else:
+                latency.record(sim.now-sent_at)
+            if state["sent"]<n_calls:
+                issue()
+        endpoint.call(handle, list(sig_args), list(args), done)
+    for _ in range(min(window, n_calls)):
+        issue()
+    sim.run_until(lambda: state["completed"]>=n_calls, timeout)
+    elapsed = sim.now-start
+    return {
+        "calls": state["completed"],
+        "errors": state["errors"],
+        "elapsed": elapsed,
+        "throughput": state["completed"]/elapsed if elapsed else None,
+        "latency": latency.snapshot()
+    }
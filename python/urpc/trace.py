@@ -0,0 +1,141 @@
+from __future__ import absolute_import, unicode_literals
+import time, logging, binascii
+from collections import deque, namedtuple
+
+## Sampled frame record class
+FrameRecord = namedtuple("FrameRecord", ["timestamp", "direction", "data"])
+
+class URPCHook(object):
+    """!
+    @brief u-RPC endpoint tracing hook.
+
+    Subclasses override the events they are interested in; the default
+    implementations do nothing. Hooks are only invoked when installed on
+    an endpoint with URPC.add_hook().
+    """
+    def on_send(self, data):
+        """!
+        @brief Called before a message is sent.
+
+        @param data u-RPC message data.
+        """
+        pass
+    def on_recv(self, data):
+        """!
+        @brief Called when a message is received, before it is handled.
+
+        @param data u-RPC message data.
+        """
+        pass
+    def on_dispatch_start(self, handle, msg_id):
+        """!
+        @brief Called before a local function is invoked.
+
+        @param handle Function handle.
+        @param msg_id Call message ID.
+        """
+        pass
+    def on_dispatch_end(self, handle, msg_id, error):
+        """!
+        @brief Called after a local function returns.
+
+        @param handle Function handle.
+        @param msg_id Call message ID.
+        @param error u-RPC error code, or None if the call succeeded.
+        """
+        pass
+
+class LoggingHook(URPCHook):
+    """!
+    @brief Tracing hook that logs every message.
+    """
+    def __init__(self, logger=None, level=logging.DEBUG):
+        """!
+        @brief Logging hook constructor.
+
+        @param logger Logger to write to.
+        @param level Logging level of messages.
+        """
+        ## Logger
+        self.logger = logger or logging.getLogger("urpc.endpoint")
+        ## Logging level
+        self.level = level
+    def on_send(self, data):
+        """!
+        @brief Log sent message.
+
+        @param data u-RPC message data.
+        """
+        self.logger.log(self.level, "Send u-RPC message: %s", data)
+    def on_recv(self, data):
+        """!
+        @brief Log received message.
+
+        @param data u-RPC message data.
+        """
+        self.logger.log(self.level, "Received u-RPC message: %s", data)
+
+class FrameSampler(URPCHook):
+    """!
+    @brief Tracing hook that samples 1-in-N messages into a ring buffer.
+    """
+    def __init__(self, every=100, capacity=1024):
+        """!
+        @brief Frame sampler constructor.
+
+        @param every Sample one message out of every such number of messages.
+        @param capacity Maximum number of records kept in the ring buffer.
+        """
+        ## Sampling interval
+        self.every = every
+        ## Ring buffer of sampled records
+        self._records = deque(maxlen=capacity)
+        ## Messages until next sample
+        self._countdown = 1
+    def _sample(self, direction, data):
+        """!
+        @brief Record message if it is selected by the sampler.
+
+        @param direction Message direction ("send" or "recv").
+        @param data u-RPC message data.
+        """
+        self._countdown -= 1
+        if self._countdown>0:
+            return
+        self._countdown = self.every
+        self._records.append(FrameRecord(time.time(), direction, bytes(data)))
+    def on_send(self, data):
+        """!
+        @brief Sample sent message.
+
+        @param data u-RPC message data.
+        """
+        self._sample("send", data)
+    def on_recv(self, data):
+        """!
+        @brief Sample received message.
+
+        @param data u-RPC message data.
+        """
+        self._sample("recv", data)
+    def dump(self, stream=None):
+        """!
+        @brief Dump sampled records.
+
+        @param stream Text stream to write records to in human-readable form.
+        @return Sampled records, from oldest to newest.
+        """
+        records = list(self._records)
+        if stream is not None:
+            for record in records:
+                stream.write("%.6f %s %s\n" % (
+                    record.timestamp,
+                    record.direction,
+                    binascii.hexlify(record.data).decode("ascii")
+                ))
+        return records
+    def clear(self):
+        """!
+        @brief Remove all sampled records.
+        """
+        self._records.clear()
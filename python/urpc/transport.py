@@ -0,0 +1,326 @@
+from __future__ import absolute_import, unicode_literals
+import os, socket, select, struct
+
+from urpc.fileregion import PROMPT_ERR_REGION_TRUNCATED
+
+## Stream transport frame length prefix
+_STREAM_PREFIX = struct.Struct("!I")
+## Maximum datagram size
+MAX_DATAGRAM_SIZE = 65535
+## Receive buffer size of stream transport
+_RECV_SIZE = 65536
+## Default maximum size of a stream transport message
+MAX_FRAME_SIZE = 1<<24
+
+class SocketTransport(object):
+    """!
+    @brief Socket transport for u-RPC endpoints.
+
+    Datagram sockets carry one u-RPC message per datagram, while stream
+    sockets carry messages prefixed with a 4-byte big-endian length.
+    """
+    def __init__(self, sock, endpoint=None, peer=None, max_frame_size=MAX_FRAME_SIZE):
+        """!
+        @brief Socket transport constructor.
+
+        @param sock Connected stream socket, or datagram socket.
+        @param endpoint u-RPC endpoint fed with received messages.
+        @param peer Destination address of unconnected datagram socket.
+        @param max_frame_size Maximum size of a received stream message.
+        """
+        ## Socket
+        self.sock = sock
+        ## u-RPC endpoint
+        self.endpoint = endpoint
+        ## Datagram socket or not
+        self.datagram = sock.type==socket.SOCK_DGRAM
+        ## Datagram peer address (Updated to the sender of each received datagram)
+        self.peer = peer
+        ## Stream receive buffer
+        self._buf = bytearray()
+        ## Maximum size of a received stream message
+        self.max_frame_size = max_frame_size
+    def fileno(self):
+        """!
+        @brief Get file descriptor of the socket.
+
+        @return File descriptor.
+        """
+        return self.sock.fileno()
+    def _dest(self):
+        """!
+        @brief Get destination address of an outgoing datagram.
+
+        (Responses go to the caller recorded by the endpoint, which may differ
+        from the sender of the last datagram when calls are dispatched later)
+
+        @return Peer address, or None for connected sockets.
+        """
+        peer = getattr(self.endpoint, "response_peer", None)
+        return self.peer if peer is None else peer
+    def send(self, data):
+        """!
+        @brief Send a u-RPC message (Usable as endpoint send callback).
+
+        @param data u-RPC message data.
+        """
+        if not self.datagram:
+            self.sock.sendall(_STREAM_PREFIX.pack(len(data))+data)
+            return
+        peer = self._dest()
+        if peer is None:
+            self.sock.send(data)
+        else:
+            self.sock.sendto(data, peer)
+    def send_frame(self, parts):
+        """!
+        @brief Send a u-RPC message made of parts (Usable as endpoint send frame callback).
+
+        Stream sockets send file regions with sendfile, and datagram sockets
+        gather memory-mapped file regions into one datagram with sendmsg.
+
+        @param parts Message parts (Byte strings and file regions).
+        """
+        sock = self.sock
+        # Datagram socket
+        if self.datagram:
+            if not hasattr(sock, "sendmsg"):
+                self.send(b"".join(
+                    part if isinstance(part, bytes) else part.read() for part in parts
+                ))
+                return
+            buffers = [part if isinstance(part, bytes) else part.view() for part in parts]
+            peer = self._dest()
+            if peer is None:
+                sock.sendmsg(buffers)
+            else:
+                sock.sendmsg(buffers, [], 0, peer)
+            return
+        # Stream socket
+        prefix = _STREAM_PREFIX.pack(sum(len(part) for part in parts))
+        for part in parts:
+            if isinstance(part, bytes):
+                sock.sendall(prefix+part)
+            else:
+                if prefix:
+                    sock.sendall(prefix)
+                _sendfile(sock, part)
+            prefix = b""
+    def _max_size(self):
+        """!
+        @brief Get maximum size of a received stream message.
+
+        @return Maximum message size in bytes.
+        """
+        budget = getattr(self.endpoint, "budget", None)
+        max_bytes = budget.max_bytes if budget is not None else None
+        if max_bytes is None:
+            return self.max_frame_size
+        return min(self.max_frame_size, max_bytes)
+    def on_readable(self):
+        """!
+        @brief Receive available messages and feed them into the endpoint.
+
+        (Stream messages larger than the maximum message size, or than the
+        memory budget of the endpoint, are refused before being buffered)
+
+        @return False if the connection is closed or sent an oversized message, otherwise True.
+        """
+        # Datagram socket
+        if self.datagram:
+            data, self.peer = self.sock.recvfrom(MAX_DATAGRAM_SIZE)
+            self.endpoint.recv_callback(data, self.peer)
+            return True
+        # Stream socket
+        chunk = self.sock.recv(_RECV_SIZE)
+        if not chunk:
+            return False
+        buf = self._buf
+        buf += chunk
+        prefix_size = _STREAM_PREFIX.size
+        max_size = self._max_size()
+        offset = 0
+        while len(buf)-offset>=prefix_size:
+            size = _STREAM_PREFIX.unpack_from(buf, offset)[0]
+            if size>max_size:
+                del buf[:]
+                return False
+            if len(buf)-offset-prefix_size<size:
+                break
+            offset += prefix_size
+            self.endpoint.recv_callback(bytes(buf[offset:offset+size]))
+            offset += size
+        del buf[:offset]
+        return True
+    def close(self):
+        """!
+        @brief Close the socket.
+        """
+        self.sock.close()
+
+def _sendfile(sock, region):
+    """!
+    @brief Send a file region over a stream socket.
+
+    (Falls back to sending a memory map of the region without sendfile)
+
+    @param sock Connected stream socket.
+    @param region File region.
+    """
+    if not hasattr(os, "sendfile"):
+        sock.sendall(region.view())
+        return
+    fd = region.fileno()
+    offset = region.offset
+    remaining = region.length
+    while remaining:
+        sent = os.sendfile(sock.fileno(), fd, offset, remaining)
+        if not sent:
+            raise ValueError(PROMPT_ERR_REGION_TRUNCATED)
+        offset += sent
+        remaining -= sent
+
+def _reading(transports):
+    """!
+    @brief Get transports whose endpoints accept incoming messages.
+
+    @param transports List of transports.
+    @return Transports to read from.
+    """
+    return [t for t in transports if not getattr(t.endpoint, "reading_paused", False)]
+
+def _flush(transports, max_bytes=None):
+    """!
+    @brief Send queued outgoing messages of multiplexed transports.
+
+    (Transports whose endpoint is a channel multiplexer send in deficit
+    round robin order; other transports are skipped)
+
+    @param transports List of transports.
+    @param max_bytes Maximum number of bytes sent per transport (None to send all queued messages).
+    @return Whether messages are still queued.
+    """
+    backlog = False
+    for transport in transports:
+        endpoint = transport.endpoint
+        flush = getattr(endpoint, "flush", None)
+        if flush is not None:
+            flush(max_bytes)
+            if endpoint.pending_bytes:
+                backlog = True
+    return backlog
+
+def _tick(transports):
+    """!
+    @brief Retransmit unanswered requests of reliable endpoints.
+
+    @param transports List of transports.
+    @return Seconds until the next retransmission, or None if nothing is pending.
+    """
+    next_delay = None
+    for transport in transports:
+        tick = getattr(transport.endpoint, "tick", None)
+        delay = tick() if tick is not None else None
+        if delay is not None and (next_delay is None or delay<next_delay):
+            next_delay = delay
+    return next_delay
+
+def _wait_time(timeout, delay):
+    """!
+    @brief Shorten polling timeout to the next retransmission.
+
+    @param timeout Polling timeout in seconds (None to wait forever).
+    @param delay Seconds until the next retransmission (None if nothing is pending).
+    @return Polling timeout.
+    """
+    if delay is None:
+        return timeout
+    return delay if timeout is None else min(timeout, delay)
+
+def poll_transports(transports, timeout=None, flush_bytes=None):
+    """!
+    @brief Wait for and handle incoming messages on transports.
+
+    (Closed transports are removed from the list, and transports whose
+    endpoint paused reading are not read from; unanswered requests of
+    reliable endpoints are retransmitted, and the wait ends in time for
+    the next retransmission)
+
+    @param transports List of transports.
+    @param timeout Maximum time to wait in seconds.
+    @param flush_bytes Maximum number of queued bytes sent per multiplexed transport before and after polling.
+    @return Whether any transport was readable.
+    """
+    # Retransmit unanswered requests
+    timeout = _wait_time(timeout, _tick(transports))
+    # Send queued messages; do not block while some are left
+    if _flush(transports, flush_bytes):
+        timeout = 0
+    waitables = _reading(transports)
+    if not waitables:
+        return False
+    readable, _, _ = select.select(waitables, [], [], timeout)
+    for transport in readable:
+        if not transport.on_readable():
+            transport.close()
+            transports.remove(transport)
+    # Send responses to received messages
+    _flush(transports, flush_bytes)
+    return bool(readable)
+
+def serve(sock, make_endpoint, stop=None, timeout=0.1, dispatch_batch=64, flush_bytes=65536):
+    """!
+    @brief Serve u-RPC endpoints on a bound socket.
+
+    A listening stream socket gets a new endpoint for each accepted
+    connection; a datagram socket is served by a single endpoint.
+    Unanswered requests of reliable endpoints are retransmitted while
+    serving.
+
+    @param sock Listening stream socket or bound datagram socket.
+    @param make_endpoint Function that creates an endpoint from a send callback.
+    @param stop Event that stops serving when set.
+    @param timeout Polling interval for checking the stop event.
+    @param dispatch_batch Maximum number of queued calls dispatched per endpoint between polls.
+    @param flush_bytes Maximum number of queued bytes sent per multiplexed endpoint between polls.
+    """
+    transports = []
+    # Endpoints still have queued calls
+    backlog = False
+    listener = None
+    # Datagram socket
+    if sock.type==socket.SOCK_DGRAM:
+        transport = SocketTransport(sock)
+        transport.endpoint = make_endpoint(transport.send)
+        transports.append(transport)
+    else:
+        listener = sock
+    while stop is None or not stop.is_set():
+        waitables = _reading(transports)
+        if listener:
+            waitables.append(listener)
+        wait_time = 0 if backlog else _wait_time(timeout, _tick(transports))
+        readable, _, _ = select.select(waitables, [], [], wait_time)
+        for waitable in readable:
+            # Accept new connection
+            if waitable is listener:
+                conn, _ = listener.accept()
+                transport = SocketTransport(conn)
+                transport.endpoint = make_endpoint(transport.send)
+                transports.append(transport)
+            # Connection closed
+            elif not waitable.on_readable():
+                waitable.close()
+                transports.remove(waitable)
+        # Dispatch queued calls; keep polling without blocking until drained
+        backlog = False
+        for transport in transports:
+            if transport.endpoint.dispatch(dispatch_batch)>=dispatch_batch:
+                backlog = True
+        # Send queued messages of multiplexed endpoints
+        if _flush(transports, flush_bytes):
+            backlog = True
+    # Close accepted connections
+    if listener:
+        for transport in transports:
+            transport.close()
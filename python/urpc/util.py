@@ -1,15 +1,36 @@
 from __future__ import absolute_import, unicode_literals
-import struct
-from collections import Iterator, Sequence, namedtuple
+import struct, time, importlib
+from collections import namedtuple
 from six.moves import range
+from six.moves.collections_abc import Sequence
 
-from urpc.constants import urpc_type_repr, urpc_type_size
+from urpc.constants import *
+from urpc.misc import URPCError
 
 ## Spare table item error prompt
 PROMPT_ERR_SPARE_TABLE_ITEM = "Index does not correspond to any value."
 ## Full allocation table prompt
 PROMPT_ERR_TABLE_FULL = "The table is full."
 
+## Number of values with one or two byte varint encodings
+_VARINT_TABLE_SIZE = 1<<14
+## Varint encodings of one and two byte values
+_VARINT_BYTES = [struct.pack("B", i) for i in range(0x80)]+[
+    struct.pack("BB", (i&0x7f)|0x80, i>>7) for i in range(0x80, _VARINT_TABLE_SIZE)
+]
+## Maximum size of a varint (64-bit values)
+_VARINT_MAX_SIZE = 10
+## Signature decoding a single unsigned varint
+_VARINT_SIG = bytearray([URPC_TYPE_U64])
+## Value ranges of integer types
+_INT_RANGES = [
+    (-2**(size*8-1), 2**(size*8-1)-1) if urpc_type%2==0 else (0, 2**(size*8)-1)
+    for urpc_type, size in enumerate(urpc_type_size[:URPC_TYPE_VARY])
+]
+
+## High resolution clock for timing measurements (In seconds)
+clock = getattr(time, "perf_counter", time.time)
+
 ## Allocation table item class
 _AllocTableItem = namedtuple("_AllocTableItem", ["spare", "next", "data"])
 
@@ -134,6 +155,16 @@ def seq_get(seq, index, default=None):
     else:
         return default
 
+def import_spec(spec):
+    """!
+    @brief Import an object from "module:name" specification.
+
+    @param spec Object specification.
+    @return Imported object.
+    """
+    module_name, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), name)
+
 def read_data(stream, urpc_type):
     """!
     @brief Read data of given type from stream.
@@ -190,3 +221,141 @@ def write_vary(stream, data, data_size_type="B"):
     # Write to stream
     stream.write(struct.pack(data_size_type, data_size))
     stream.write(bytearray(data))
+
+def _encode_varint_loop(value):
+    """!
+    @brief Encode a varint of three or more bytes.
+
+    @param value Non-negative integer.
+    @return Encoded varint.
+    """
+    data = bytearray()
+    while value>=0x80:
+        data.append((value&0x7f)|0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+def encode_varint(value):
+    """!
+    @brief Encode a non-negative integer as LEB128 varint.
+
+    @param value Non-negative integer.
+    @return Encoded varint.
+    """
+    # One and two byte varints from table
+    if value<_VARINT_TABLE_SIZE:
+        return _VARINT_BYTES[value]
+    return _encode_varint_loop(value)
+
+def decode_varint(buf, pos):
+    """!
+    @brief Decode a LEB128 varint from buffer.
+
+    @param buf Data buffer (Bytes on Python 3, or a bytearray).
+    @param pos Position of the varint.
+    @return Decoded value and position after the varint.
+    @throws URPCError If the buffer ends in the middle of the varint.
+    """
+    objects, pos = unpack_varints(buf, pos, _VARINT_SIG)
+    return objects[0], pos
+
+def pack_varints(sig, objects):
+    """!
+    @brief Encode objects with varint integers and lengths.
+
+    Unsigned integers are encoded as LEB128 varints, signed integers are
+    zigzag encoded first, and variable length data is prefixed with its
+    varint length. Varints below 2**14 come from a precomputed table.
+
+    @param sig Signature of objects.
+    @param objects Objects to encode.
+    @return Encoded data (A bytearray).
+    @throws URPCError If an integer is out of range of its type, or data is too long.
+    """
+    data = bytearray()
+    int_ranges = _INT_RANGES
+    varint_bytes = _VARINT_BYTES
+    for obj, obj_type in zip(objects, sig):
+        # Variable length data
+        if obj_type==URPC_TYPE_VARY:
+            size = len(obj)
+            if size>=2**16:
+                raise URPCError(URPC_ERR_TOO_LONG)
+            data += varint_bytes[size] if size<_VARINT_TABLE_SIZE else _encode_varint_loop(size)
+            data += obj
+            continue
+        # Range check
+        low, high = int_ranges[obj_type]
+        if obj<low or obj>high:
+            raise URPCError(URPC_ERR_SIG_INCORRECT)
+        # Zigzag encode signed integer (Signed types have negative lower bounds)
+        if low:
+            obj = obj<<1 if obj>=0 else ((-obj)<<1)-1
+        data += varint_bytes[obj] if obj<_VARINT_TABLE_SIZE else _encode_varint_loop(obj)
+    return data
+
+def unpack_varints(buf, pos, sig):
+    """!
+    @brief Decode objects with varint integers and lengths.
+
+    All objects are decoded in a single pass over the buffer without
+    per-object function calls; one and two byte varints are decoded
+    without looping, and longer varints are limited to 10 bytes.
+
+    @param buf Data buffer (Bytes on Python 3, or a bytearray; not copied).
+    @param pos Position of the first object.
+    @param sig Signature of objects.
+    @return Decoded objects and position after the last object.
+    @throws URPCError If the data is truncated or an integer is out of range of its type.
+    """
+    objects = []
+    size = len(buf)
+    int_ranges = _INT_RANGES
+    try:
+        for obj_type in sig:
+            value = buf[pos]
+            # Single byte varint
+            if value<0x80:
+                pos += 1
+            else:
+                byte = buf[pos+1]
+                # Two byte varint
+                if byte<0x80:
+                    value = (value&0x7f)|(byte<<7)
+                    pos += 2
+                # Longer varint
+                else:
+                    value = (value&0x7f)|((byte&0x7f)<<7)
+                    end = min(pos+_VARINT_MAX_SIZE, size)
+                    pos += 2
+                    shift = 14
+                    while True:
+                        if pos>=end:
+                            raise URPCError(URPC_ERR_BROKEN_MSG)
+                        byte = buf[pos]
+                        pos += 1
+                        value |= (byte&0x7f)<<shift
+                        if byte<0x80:
+                            break
+                        shift += 7
+            # Variable length data
+            if obj_type==URPC_TYPE_VARY:
+                end = pos+value
+                if end>size:
+                    raise URPCError(URPC_ERR_BROKEN_MSG)
+                objects.append(bytearray(buf[pos:end]))
+                pos = end
+                continue
+            # Zigzag decode signed integer (Signed types have negative lower bounds)
+            low, high = int_ranges[obj_type]
+            if low:
+                value = (value>>1)^-(value&1)
+            # Range check
+            if value<low or value>high:
+                raise URPCError(URPC_ERR_BROKEN_MSG)
+            objects.append(value)
+    # Buffer ends in the middle of a varint
+    except IndexError:
+        raise URPCError(URPC_ERR_BROKEN_MSG)
+    return objects, pos
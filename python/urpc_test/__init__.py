@@ -2,8 +2,42 @@ from __future__ import absolute_import, unicode_literals
 from unittest import TestSuite, makeSuite
 
 from urpc_test.py_test import Py2PyTest
+from urpc_test.metrics_test import MetricsTest
+from urpc_test.trace_test import TraceTest
+from urpc_test.capture_test import CaptureTest
+from urpc_test.loadgen_test import LoadGenTest
+from urpc_test.c_test import C2PyTest
+from urpc_test.cache_test import FuncCacheTest
+from urpc_test.reliable_test import ReliableTest
+from urpc_test.dispatch_test import DispatchTest
+from urpc_test.cancel_test import CancelTest
+from urpc_test.varint_test import VarintTest
+from urpc_test.shm_test import ShmTest
+from urpc_test.thread_test import ThreadSafeTest
+from urpc_test.budget_test import BudgetTest
+from urpc_test.mux_test import MuxTest
+from urpc_test.remote_cache_test import RemoteCacheTest
+from urpc_test.sim_test import SimTest
+from urpc_test.fileregion_test import FileRegionTest
 
 # Test suite
 test_suite = TestSuite()
 # Collect test cases
 test_suite.addTest(makeSuite(Py2PyTest))
+test_suite.addTest(makeSuite(MetricsTest))
+test_suite.addTest(makeSuite(TraceTest))
+test_suite.addTest(makeSuite(CaptureTest))
+test_suite.addTest(makeSuite(LoadGenTest))
+test_suite.addTest(makeSuite(C2PyTest))
+test_suite.addTest(makeSuite(FuncCacheTest))
+test_suite.addTest(makeSuite(ReliableTest))
+test_suite.addTest(makeSuite(DispatchTest))
+test_suite.addTest(makeSuite(CancelTest))
+test_suite.addTest(makeSuite(VarintTest))
+test_suite.addTest(makeSuite(ShmTest))
+test_suite.addTest(makeSuite(ThreadSafeTest))
+test_suite.addTest(makeSuite(BudgetTest))
+test_suite.addTest(makeSuite(MuxTest))
+test_suite.addTest(makeSuite(RemoteCacheTest))
+test_suite.addTest(makeSuite(SimTest))
+test_suite.addTest(makeSuite(FileRegionTest))
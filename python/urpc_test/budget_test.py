@@ -0,0 +1,117 @@
+from __future__ import absolute_import, unicode_literals
+import socket, struct, threading
+from unittest import TestCase
+
+from urpc import URPC, URPCError, U8, URPC_ERR_NO_MEMORY
+from urpc.budget import MemoryBudget
+from urpc.dispatch import DispatchQueue
+from urpc.transport import SocketTransport, poll_transports
+
+class BudgetTest(TestCase):
+    """!
+    @brief u-RPC memory budget and backpressure test.
+    """
+    def test_pending_requests(self):
+        """!
+        @brief Test failing fast when pending requests exhaust the budget.
+        """
+        caller = URPC(send_callback=lambda data: None, budget=MemoryBudget(max_count=2))
+        msg_id = caller.call(0, [U8], [1], lambda e, r: None)
+        caller.call(0, [U8], [2], lambda e, r: None)
+        with self.assertRaises(URPCError) as ctx:
+            caller.call(0, [U8], [3], lambda e, r: None)
+        self.assertEqual(ctx.exception.reason, URPC_ERR_NO_MEMORY)
+        # Cancelled request frees its budget
+        caller.cancel(msg_id)
+        caller.call(0, [U8], [3], lambda e, r: None)
+        usage = caller.budget_usage()
+        self.assertEqual(usage["count"], 2)
+        self.assertEqual(usage["accounts"]["pending"]["count"], 2)
+        self.assertEqual(usage["rejected"], 1)
+        self.assertGreater(usage["bytes"], 0)
+    def test_pending_limit_reading(self):
+        """!
+        @brief Test caller at its pending request limit still reading responses.
+        """
+        transports = [SocketTransport(sock) for sock in socket.socketpair()]
+        caller_transport, callee_transport = transports
+        caller = caller_transport.endpoint = URPC(
+            send_callback=caller_transport.send,
+            budget=MemoryBudget(max_count=2)
+        )
+        callee = callee_transport.endpoint = URPC(send_callback=callee_transport.send)
+        handle = callee.add_func(func=lambda x: x, arg_types=[U8], ret_types=[U8])
+        results = []
+        try:
+            for x in range(2):
+                caller.call(handle, [U8], [x], lambda e, r: results.append(r[0]))
+            self.assertFalse(caller.reading_paused)
+            for _ in range(10):
+                if len(results)==2:
+                    break
+                poll_transports(transports, 0.1)
+        finally:
+            for transport in transports:
+                transport.close()
+        self.assertEqual(results, [0, 1])
+        self.assertEqual(caller.budget_usage()["count"], 0)
+    def test_blocking_request(self):
+        """!
+        @brief Test new request waiting for budget released by another thread.
+        """
+        caller = URPC(
+            send_callback=lambda data: None,
+            thread_safe=True,
+            budget=MemoryBudget(max_count=1, wait_timeout=5)
+        )
+        msg_id = caller.call(0, [U8], [1], lambda e, r: None)
+        timer = threading.Timer(0.05, caller.cancel, (msg_id,))
+        timer.start()
+        caller.call(0, [U8], [2], lambda e, r: None)
+        timer.join()
+        self.assertEqual(caller.budget_usage()["count"], 1)
+    def test_pause_reading(self):
+        """!
+        @brief Test pausing and resuming reading on queued calls.
+        """
+        events = []
+        budget = MemoryBudget(max_count=4, low_water=0.5)
+        budget.add_listener(lambda: events.append("pause"), lambda: events.append("resume"))
+        caller = URPC(send_callback=lambda data: callee.recv_callback(data))
+        callee = URPC(
+            send_callback=caller.recv_callback,
+            dispatch_queue=DispatchQueue(),
+            budget=budget
+        )
+        handle = callee.add_func(func=lambda x: x, arg_types=[U8], ret_types=[U8])
+        for x in range(4):
+            caller.call(handle, [U8], [x], lambda e, r: None)
+        self.assertTrue(callee.reading_paused)
+        self.assertEqual(callee.budget_usage()["accounts"]["inbound"]["count"], 4)
+        # Still above low-water mark
+        callee.dispatch(1)
+        self.assertTrue(callee.reading_paused)
+        callee.dispatch(1)
+        self.assertFalse(callee.reading_paused)
+        callee.dispatch()
+        self.assertEqual(events, ["pause", "resume"])
+        usage = callee.budget_usage()
+        self.assertEqual((usage["bytes"], usage["count"], usage["peak_count"]), (0, 0, 4))
+    def test_oversized_frame(self):
+        """!
+        @brief Test stream messages larger than the budget being refused before buffering.
+        """
+        sock, peer_sock = socket.socketpair()
+        transport = SocketTransport(sock)
+        transport.endpoint = URPC(send_callback=transport.send, budget=MemoryBudget(max_bytes=1024))
+        transports = [transport]
+        try:
+            # Length prefix near 2**32 followed by a partial message
+            peer_sock.sendall(struct.pack("!I", 2**32-1)+b"x"*100)
+            poll_transports(transports, 1)
+        finally:
+            peer_sock.close()
+            transport.close()
+        # Connection is dropped without buffering the message
+        self.assertEqual(transports, [])
+        self.assertEqual(len(transport._buf), 0)
@@ -0,0 +1,91 @@
+from __future__ import absolute_import, unicode_literals
+import shutil, tempfile
+from unittest import TestCase, SkipTest
+
+from urpc import URPC_ERR_NONEXIST, URPC_ERR_SIG_INCORRECT, U8, U16, U32, VARY
+from urpc_test.interop import build_library, header_divergences, make_pair, resolve, benchmark
+
+class C2PyTest(TestCase):
+    """!
+    @brief u-RPC C caller to Python callee end-to-end test.
+    """
+    @classmethod
+    def setUpClass(cls):
+        """!
+        @brief Build the C library.
+        """
+        ## Build directory
+        cls._build_dir = tempfile.mkdtemp()
+        try:
+            ## C library
+            cls._lib = build_library(cls._build_dir)
+        except RuntimeError as e:
+            shutil.rmtree(cls._build_dir)
+            raise SkipTest(str(e))
+    @classmethod
+    def tearDownClass(cls):
+        """!
+        @brief Remove the C library.
+        """
+        shutil.rmtree(cls._build_dir)
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        self._link, self._caller, self._callee = make_pair("c", "py", self._lib)
+    def _call(self, name, sig_args, args):
+        """!
+        @brief Call a function on the callee and return its error and result.
+
+        @param name Function name.
+        @param sig_args Signature of arguments.
+        @param args Arguments.
+        @return Error and result.
+        """
+        handle = resolve(self._link, self._caller, name)
+        results = []
+        self._caller.call(handle, sig_args, args, lambda e, r: results.append((e, r)))
+        self._link.pump()
+        return results[0]
+    def test_func_query(self):
+        """!
+        @brief Test function query from C caller.
+        """
+        self.assertEqual(
+            resolve(self._link, self._caller, "func_1"),
+            self._callee._func_name_lookup["func_1"]
+        )
+        with self.assertRaises(Exception) as context:
+            resolve(self._link, self._caller, "func_nonexist")
+        self.assertEqual(context.exception.reason, URPC_ERR_NONEXIST)
+    def test_func_call(self):
+        """!
+        @brief Test fixed and variable signature calls from C caller.
+        """
+        self.assertEqual(self._call("func_1", [U8, U8], [2, 3]), (None, [5]))
+        error, _ = self._call("func_1", [U8], [2])
+        self.assertEqual(error.reason, URPC_ERR_SIG_INCORRECT)
+        self.assertEqual(self._call("func_2", [VARY], [b"ab"]), (None, [b"ababab"]))
+        test_args = [1, 500, 100000, b"abcd"]
+        self.assertEqual(self._call("func_5", [U8, U16, U32, VARY], test_args), (None, test_args))
+    def test_python_callee_only(self):
+        """!
+        @brief Test that the C implementation is rejected as callee.
+        """
+        with self.assertRaises(NotImplementedError):
+            make_pair("py", "c", self._lib)
+    def test_wire_constants(self):
+        """!
+        @brief Test that constants agree, apart from known error code divergences.
+        """
+        # C header lacks URPC_ERR_NO_MEMORY, shifting the following error codes
+        self.assertEqual(sorted(header_divergences()), [
+            ("URPC_ERR_BROKEN_MSG", 0x23, 0x24),
+            ("URPC_ERR_EXCEPTION", 0x24, 0x25)
+        ])
+    def test_benchmark(self):
+        """!
+        @brief Test throughput measurement.
+        """
+        handle = resolve(self._link, self._caller, "func_1")
+        self.assertGreater(benchmark(self._link, self._caller, handle, [U8, U8], [1, 2], 100), 0)
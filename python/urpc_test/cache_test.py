@@ -0,0 +1,91 @@
+from __future__ import absolute_import, unicode_literals
+import time
+from unittest import TestCase
+
+from urpc import URPC, U8, U16
+from urpc.cache import LRUCache
+
+class FuncCacheTest(TestCase):
+    """!
+    @brief u-RPC callee-side result cache test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Caller endpoint
+        caller = self._caller = URPC(
+            send_callback=None
+        )
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=caller.recv_callback,
+            n_funcs=16
+        )
+        # Caller send callback
+        caller._send_callback = callee.recv_callback
+        ## Arguments of actual function invocations
+        self._invocations = []
+        def square(x):
+            self._invocations.append(x)
+            return x*x
+        ## Handle of cached function
+        self._handle = callee.add_func(
+            func=square,
+            arg_types=[U8],
+            ret_types=[U16],
+            cache=LRUCache(size=2, ttl=0.05)
+        )
+    def _call(self, x):
+        """!
+        @brief Call cached function.
+
+        @param x Argument.
+        @return Call result.
+        """
+        results = []
+        self._caller.call(self._handle, [U8], [x], lambda e, r: results.append((e, r)))
+        self.assertIsNone(results[0][0])
+        return results[0][1]
+    def test_hit_and_miss(self):
+        """!
+        @brief Test cache hits skip function invocation.
+        """
+        self.assertEqual(self._call(3), [9])
+        self.assertEqual(self._call(3), [9])
+        self.assertEqual(self._call(4), [16])
+        self.assertEqual(self._invocations, [3, 4])
+        stats = self._callee.cache_stats(self._handle)
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+    def test_eviction_and_expiry(self):
+        """!
+        @brief Test LRU eviction and entry expiry.
+        """
+        for x in (1, 2, 1, 3, 1, 2):
+            self._call(x)
+        # 2 is evicted by 3 since 1 is used more recently
+        self.assertEqual(self._invocations, [1, 2, 3, 2])
+        self.assertEqual(self._callee.cache_stats(self._handle)["evictions"], 2)
+        # Entries expire after TTL
+        time.sleep(0.06)
+        self._call(1)
+        self.assertEqual(self._invocations[-1], 1)
+    def test_invalidate(self):
+        """!
+        @brief Test explicit invalidation by handle.
+        """
+        self._call(5)
+        self._callee.invalidate_cache(self._handle)
+        self._call(5)
+        self.assertEqual(self._invocations, [5, 5])
+        # Uncached function has no statistics
+        self._callee.remove_func(self._handle)
+        self.assertIsNone(self._callee.cache_stats(self._handle))
+    def test_signature_mismatch(self):
+        """!
+        @brief Test cached function still checks signature.
+        """
+        results = []
+        for _ in range(2):
+            self._caller.call(self._handle, [U16], [3], lambda e, r: results.append(e))
+        self.assertEqual([e is not None for e in results], [True, True])
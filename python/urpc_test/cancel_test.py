@@ -0,0 +1,87 @@
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+
+from urpc import URPC, URPCError, U8, URPC_ERR_CANCELLED
+from urpc.dispatch import DispatchQueue
+from urpc.cancel import CancelToken
+
+class CancelTest(TestCase):
+    """!
+    @brief u-RPC call cancellation test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Caller endpoint
+        caller = self._caller = URPC(
+            send_callback=lambda data: self._callee.recv_callback(data)
+        )
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=lambda data: caller.recv_callback(data),
+            dispatch_queue=DispatchQueue(capacity=4)
+        )
+        ## Function invocations
+        self._invocations = []
+        ## Message ID of the call to cancel from inside the function
+        self._cancel_id = [None]
+        def increase(x):
+            self._invocations.append(x)
+            if self._cancel_id[0] is not None:
+                caller.cancel(self._cancel_id[0])
+                callee.cancel_token.raise_if_cancelled()
+            return x+1
+        ## Handle of test function
+        self._handle = callee.add_func(func=increase, arg_types=[U8], ret_types=[U8])
+        ## Call results
+        self._results = []
+    def _call(self, x):
+        """!
+        @brief Call test function.
+
+        @param x Argument.
+        @return Request message ID.
+        """
+        return self._caller.call(
+            self._handle, [U8], [x], lambda e, r: self._results.append((e, r))
+        )
+    def test_cancel_queued(self):
+        """!
+        @brief Test cancelling a queued call.
+        """
+        msg_id = self._call(1)
+        self._call(2)
+        self.assertTrue(self._caller.cancel(msg_id))
+        self.assertNotIn(msg_id, self._caller._oper_callbacks)
+        self.assertEqual(self._callee.queue_stats()["removed"], 1)
+        self._callee.dispatch()
+        self.assertEqual(self._invocations, [2])
+        self.assertEqual(self._results, [(None, [3])])
+        # Answered request can't be cancelled
+        self.assertFalse(self._caller.cancel(msg_id))
+    def test_cancel_running(self):
+        """!
+        @brief Test cancelling a running call through its cancellation token.
+        """
+        self._cancel_id[0] = self._call(1)
+        self._callee.dispatch()
+        self.assertEqual(self._invocations, [1])
+        # No response for cancelled call
+        self.assertEqual(self._results, [])
+        self.assertEqual(self._callee._running_calls, {})
+        self.assertIsNone(self._callee.cancel_token)
+    def test_cancel_callbacks(self):
+        """!
+        @brief Test cancellation callbacks of cancellation token.
+        """
+        token = CancelToken()
+        cancelled = []
+        token.add_callback(lambda: cancelled.append(1))
+        token.cancel()
+        token.cancel()
+        token.add_callback(lambda: cancelled.append(2))
+        self.assertEqual(cancelled, [1, 2])
+        with self.assertRaises(URPCError) as ctx:
+            token.raise_if_cancelled()
+        self.assertEqual(ctx.exception.reason, URPC_ERR_CANCELLED)
@@ -0,0 +1,85 @@
+from __future__ import absolute_import, unicode_literals
+import os, shutil, struct, tempfile
+from unittest import TestCase
+
+from urpc import URPC, VARY
+from urpc.capture import CAPTURE_MAGIC, WireRecorder, WireCapture
+from urpc.replay import replay
+from urpc_test.callee import set_up_test_functions
+
+class CaptureTest(TestCase):
+    """!
+    @brief u-RPC wire capture and replay test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Temporary directory
+        self._tmp_dir = tempfile.mkdtemp()
+        ## Capture file path
+        self._path = os.path.join(self._tmp_dir, "capture.bin")
+    def tearDown(self):
+        """!
+        @brief Remove temporary files.
+        """
+        shutil.rmtree(self._tmp_dir)
+    def _record_traffic(self):
+        """!
+        @brief Record callee traffic of a few calls.
+        """
+        caller = URPC(send_callback=None)
+        callee = URPC(send_callback=caller.recv_callback, n_funcs=16)
+        caller._send_callback = callee.recv_callback
+        set_up_test_functions(self, callee)
+        # Record callee traffic
+        with WireRecorder(self._path) as recorder:
+            callee.add_hook(recorder)
+            @caller.query("func_2")
+            def cb(_, handle):
+                for i in range(3):
+                    caller.call(handle, [VARY], [b"ab"*i], lambda e, r: None)
+    def test_capture(self):
+        """!
+        @brief Test reading back recorded frames.
+        """
+        self._record_traffic()
+        with WireCapture(self._path) as capture:
+            records = list(capture)
+        # 4 requests and 4 responses
+        self.assertEqual(len(records), 8)
+        self.assertEqual(
+            [r.direction for r in records],
+            ["recv", "send"]*4
+        )
+        # Timestamps are ordered
+        timestamps = [r.timestamp for r in records]
+        self.assertEqual(timestamps, sorted(timestamps))
+    def test_bad_capture(self):
+        """!
+        @brief Test opening a file that is not a capture, and reading a corrupt capture.
+        """
+        with open(self._path, "wb") as f:
+            f.write(b"not a capture")
+        with self.assertRaises(ValueError):
+            WireCapture(self._path)
+        # Frame of unknown direction
+        with open(self._path, "wb") as f:
+            f.write(CAPTURE_MAGIC+struct.pack("<dBI", 0.0, 2, 0))
+        with WireCapture(self._path) as capture:
+            with self.assertRaises(ValueError):
+                list(capture)
+    def test_replay(self):
+        """!
+        @brief Test replaying recorded requests into a fresh endpoint.
+        """
+        self._record_traffic()
+        responses = []
+        endpoint = URPC(send_callback=responses.append, n_funcs=16)
+        set_up_test_functions(self, endpoint)
+        with WireCapture(self._path) as capture:
+            stats = replay(capture, endpoint)
+            recorded = [r.data for r in capture.frames("send")]
+        self.assertEqual(stats["frames"], 4)
+        # Fresh endpoint produces the recorded responses
+        self.assertEqual(responses, recorded)
@@ -0,0 +1,133 @@
+from __future__ import absolute_import, unicode_literals
+import socket
+from unittest import TestCase
+
+from urpc import URPC, U8, URPC_ERR_BUSY, URPC_PRIO_CRITICAL, URPC_PRIO_HIGH, \
+    URPC_PRIO_LOW
+from urpc.dispatch import DispatchQueue
+from urpc.transport import SocketTransport
+
+class DispatchTest(TestCase):
+    """!
+    @brief u-RPC prioritized dispatch and load shedding test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Callee dispatch queue
+        self._queue = DispatchQueue(capacity=4)
+        ## Caller endpoint
+        caller = self._caller = URPC(
+            send_callback=lambda data: self._callee.recv_callback(data)
+        )
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=lambda data: caller.recv_callback(data),
+            dispatch_queue=self._queue
+        )
+        ## Order of function invocations
+        self._invocations = []
+        def make_func(name):
+            def func(x):
+                self._invocations.append((name, x))
+                return x
+            return func
+        ## Handle of normal priority function
+        self._normal = callee.add_func(func=make_func("normal"), arg_types=[U8], ret_types=[U8])
+        ## Handle of low priority function
+        self._low = callee.add_func(
+            func=make_func("low"),
+            arg_types=[U8],
+            ret_types=[U8],
+            priority=URPC_PRIO_LOW
+        )
+        ## Call results
+        self._results = []
+    def _call(self, handle, x, priority=None):
+        """!
+        @brief Call a test function and collect its result.
+
+        @param handle Function handle.
+        @param x Argument.
+        @param priority Priority class of the call.
+        """
+        self._caller.call(handle, [U8], [x], lambda e, r: self._results.append(
+            (x, e.reason if e else None)
+        ), priority)
+    def test_priority_order(self):
+        """!
+        @brief Test queued calls being dispatched in priority order.
+        """
+        self._call(self._low, 1)
+        self._call(self._normal, 2)
+        self._call(self._normal, 3, URPC_PRIO_HIGH)
+        self.assertEqual(self._invocations, [])
+        self.assertEqual(self._callee.dispatch(), 3)
+        self.assertEqual(self._invocations, [("normal", 3), ("normal", 2), ("low", 1)])
+        self.assertEqual(self._results, [(3, None), (2, None), (1, None)])
+    def test_load_shedding(self):
+        """!
+        @brief Test less important calls being shed first under load.
+        """
+        # Low priority calls are admitted up to half of the capacity
+        for x in range(3):
+            self._call(self._low, x)
+        self.assertEqual(self._results, [(2, URPC_ERR_BUSY)])
+        # Normal priority calls are admitted up to 3/4 of the capacity
+        self._call(self._normal, 3)
+        self._call(self._normal, 4)
+        self.assertEqual(self._results[-1], (4, URPC_ERR_BUSY))
+        # Critical call evicts the newest low priority call from a full queue
+        self._call(self._normal, 5, URPC_PRIO_CRITICAL)
+        self._call(self._normal, 6, URPC_PRIO_CRITICAL)
+        self.assertEqual(self._results[-1], (1, URPC_ERR_BUSY))
+        self._callee.dispatch()
+        self.assertEqual(
+            self._invocations,
+            [("normal", 5), ("normal", 6), ("normal", 3), ("low", 0)]
+        )
+        stats = self._callee.queue_stats()
+        self.assertEqual(stats["depth"], 0)
+        self.assertEqual(stats["max_depth"], 4)
+        self.assertEqual(stats["shed"], [0, 0, 1, 1])
+        self.assertEqual(stats["evicted"], [0, 0, 0, 1])
+    def test_dispatch_limit(self):
+        """!
+        @brief Test dispatching a limited number of queued calls.
+        """
+        self._call(self._normal, 1)
+        self._call(self._normal, 2)
+        self.assertEqual(self._callee.dispatch(1), 1)
+        self.assertEqual(self._results, [(1, None)])
+        self.assertEqual(self._callee.dispatch(), 1)
+        self.assertEqual(self._callee.dispatch(), 0)
+    def test_datagram_peers(self):
+        """!
+        @brief Test queued calls of two datagram clients answered to their own callers.
+        """
+        server = SocketTransport(socket.socket(socket.AF_INET, socket.SOCK_DGRAM))
+        server.sock.bind(("127.0.0.1", 0))
+        server.endpoint = URPC(send_callback=server.send, dispatch_queue=True)
+        handle = server.endpoint.add_func(func=lambda x: x, arg_types=[U8], ret_types=[U8])
+        clients = []
+        try:
+            for x in (1, 2):
+                client = SocketTransport(
+                    socket.socket(socket.AF_INET, socket.SOCK_DGRAM),
+                    peer=server.sock.getsockname()
+                )
+                client.sock.settimeout(1)
+                client.endpoint = URPC(send_callback=client.send)
+                clients.append(client)
+                client.endpoint.call(handle, [U8], [x], lambda e, r, x=x: self._results.append((x, r[0])))
+                server.on_readable()
+            # Both calls are queued before dispatch
+            self.assertEqual(server.endpoint.dispatch(), 2)
+            for client in clients:
+                client.on_readable()
+        finally:
+            server.close()
+            for client in clients:
+                client.close()
+        self.assertEqual(sorted(self._results), [(1, 1), (2, 2)])
@@ -0,0 +1,152 @@
+from __future__ import absolute_import, unicode_literals
+import os, socket, shutil, tempfile
+from unittest import TestCase
+
+from urpc import URPC, URPCError, URPC_ERR_TOO_LONG, URPC_VERSION_VARINT, U32, VARY
+from urpc.fileregion import MAX_REGION_SIZE, FileRegion, FileType
+from urpc.transport import SocketTransport, poll_transports
+
+class FileRegionTest(TestCase):
+    """!
+    @brief u-RPC file region argument test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Temporary directory
+        self._tmp_dir = tempfile.mkdtemp()
+        ## Source file contents
+        self._data = os.urandom(3*MAX_REGION_SIZE//2)
+        with open(os.path.join(self._tmp_dir, "src.bin"), "wb") as f:
+            f.write(self._data)
+        ## Source file descriptor
+        self._src = os.open(os.path.join(self._tmp_dir, "src.bin"), os.O_RDONLY)
+        ## Destination file descriptor
+        self._dest = os.open(os.path.join(self._tmp_dir, "dest.bin"), os.O_RDWR|os.O_CREAT)
+        ## Regions received by the callee
+        self._received = []
+    def tearDown(self):
+        """!
+        @brief Close and remove temporary files.
+        """
+        os.close(self._src)
+        os.close(self._dest)
+        shutil.rmtree(self._tmp_dir)
+    def _add_sink(self, callee):
+        """!
+        @brief Add a function storing received chunks into the destination file.
+
+        @param callee Callee endpoint.
+        @return Function handle.
+        """
+        def store(offset, region):
+            self._received.append((offset, region))
+            return len(region)
+        return callee.add_func(func=store, arg_types=[U32, FileType(self._dest)], ret_types=[U32])
+    def _send_file(self, caller, handle, poll=lambda: None):
+        """!
+        @brief Send the source file in chunks and check the destination file.
+
+        @param caller Caller endpoint.
+        @param handle Remote function handle.
+        @param poll Function handling pending messages.
+        """
+        results = []
+        for i, region in enumerate(FileRegion(self._src).chunks()):
+            caller.call(handle, [U32, FileType], [region.offset, region], lambda e, r: results.append(r[0]))
+            while len(results)<=i:
+                poll()
+        self.assertEqual(sum(results), len(self._data))
+        self.assertEqual(FileRegion(self._dest).read(), self._data)
+        # Received chunks map onto the destination file
+        offset, region = self._received[-1]
+        self.assertEqual(region.view().tobytes(), self._data[offset:])
+    def _socket_pair(self, sock_type):
+        """!
+        @brief Create endpoints connected by a socket pair.
+
+        @param sock_type Socket type.
+        @return Caller endpoint, callee endpoint and transports.
+        """
+        transports = [SocketTransport(sock) for sock in socket.socketpair(socket.AF_UNIX, sock_type)]
+        for transport in transports:
+            transport.endpoint = URPC(
+                send_callback=transport.send,
+                send_frame_callback=transport.send_frame
+            )
+        return transports[0].endpoint, transports[1].endpoint, transports
+    def test_loopback(self):
+        """!
+        @brief Test file regions flattened for plain send callbacks.
+        """
+        caller = URPC(send_callback=lambda data: callee.recv_callback(data))
+        callee = URPC(send_callback=caller.recv_callback)
+        self._send_file(caller, self._add_sink(callee))
+    def test_stream(self):
+        """!
+        @brief Test file regions sent with sendfile over a stream socket.
+        """
+        caller, callee, transports = self._socket_pair(socket.SOCK_STREAM)
+        handle = self._add_sink(callee)
+        try:
+            for version in (caller.version, URPC_VERSION_VARINT):
+                caller.version = version
+                self._received = []
+                os.ftruncate(self._dest, 0)
+                self._send_file(caller, handle, lambda: poll_transports(transports, 0.1))
+        finally:
+            for transport in transports:
+                transport.close()
+    def test_datagram(self):
+        """!
+        @brief Test memory-mapped file regions gathered into datagrams.
+        """
+        caller, callee, transports = self._socket_pair(socket.SOCK_DGRAM)
+        handle = self._add_sink(callee)
+        results = []
+        region = FileRegion(self._src, 4097, 1000)
+        try:
+            caller.call(handle, [U32, VARY], [region.offset, region], lambda e, r: results.append(r[0]))
+            poll_transports(transports, 0.1)
+            poll_transports(transports, 0.1)
+        finally:
+            for transport in transports:
+                transport.close()
+        self.assertEqual(results, [1000])
+        self.assertEqual(self._received[0][1].read(), self._data[4097:5097])
+    def test_datagram_response_peer(self):
+        """!
+        @brief Test message frames sent to the response peer instead of the last sender.
+        """
+        socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(3)]
+        try:
+            for sock in socks:
+                sock.bind(("127.0.0.1", 0))
+                sock.settimeout(1)
+            last_sender, caller = socks[1].getsockname(), socks[2].getsockname()
+            transport = SocketTransport(socks[0], peer=last_sender)
+            transport.endpoint = URPC(send_callback=transport.send)
+            transport.endpoint.response_peer = caller
+            transport.send_frame([b"ab", FileRegion(self._src, 0, 10)])
+            self.assertEqual(socks[2].recv(1024), b"ab"+self._data[:10])
+        finally:
+            for sock in socks:
+                sock.close()
+    def test_bad_region(self):
+        """!
+        @brief Test regions out of file bounds.
+        """
+        size = len(self._data)
+        for offset, length in ((-1, 1), (0, -1), (size, 1), (1, size)):
+            with self.assertRaises(ValueError):
+                FileRegion(self._src, offset, length)
+        self.assertEqual(len(FileRegion(self._src, size)), 0)
+    def test_too_long(self):
+        """!
+        @brief Test regions larger than a variable length argument.
+        """
+        caller = URPC(send_callback=lambda data: None)
+        with self.assertRaises(URPCError) as ctx:
+            caller.call(0, [U32, VARY], [0, FileRegion(self._src)], lambda e, r: None)
+        self.assertEqual(ctx.exception.reason, URPC_ERR_TOO_LONG)
@@ -0,0 +1,434 @@
+from __future__ import absolute_import, unicode_literals
+import os, re, ctypes, subprocess
+from collections import deque
+from unittest import TestCase
+
+from urpc import URPC, URPCError
+from urpc.constants import *
+from urpc.util import clock
+from urpc_test.callee import set_up_test_functions
+
+## C implementation source directory
+C_SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "c")
+## C implementation source files
+C_SOURCES = ("urpc.c", "wio-shim.c")
+## C compile flags (Same as the Makefile)
+C_FLAGS = ["-std=c99", "-O2", "-fPIC", "-shared"]
+
+## Compiler not found error prompt
+PROMPT_ERR_NO_COMPILER = "C compiler \"%s\" not found."
+## C endpoint callee not supported error prompt
+PROMPT_ERR_NO_CALLEE = "The C implementation does not handle incoming queries and calls."
+
+## u-RPC type to ctypes type mapping
+_CTYPES = [
+    ctypes.c_int8, # URPC_TYPE_I8
+    ctypes.c_uint8, # URPC_TYPE_U8
+    ctypes.c_int16, # URPC_TYPE_I16
+    ctypes.c_uint16, # URPC_TYPE_U16
+    ctypes.c_int32, # URPC_TYPE_I32
+    ctypes.c_uint32, # URPC_TYPE_U32
+    ctypes.c_int64, # URPC_TYPE_I64
+    ctypes.c_uint64, # URPC_TYPE_U64
+]
+
+class WioBuf(ctypes.Structure):
+    """!
+    @brief WIO buffer structure ("wio_buf_t").
+    """
+    _fields_ = [
+        ("buffer", ctypes.POINTER(ctypes.c_uint8)),
+        ("size", ctypes.c_uint16),
+        ("pos_a", ctypes.c_uint16),
+        ("pos_b", ctypes.c_uint16)
+    ]
+
+class URPCVary(ctypes.Structure):
+    """!
+    @brief u-RPC variable length data structure ("urpc_vary_t").
+    """
+    _fields_ = [
+        ("data", ctypes.c_void_p),
+        ("size", ctypes.c_uint16)
+    ]
+
+## WIO callback function type
+WIO_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_uint8, ctypes.c_void_p, ctypes.c_uint8, ctypes.c_void_p)
+## u-RPC send function type
+URPC_SEND_FUNC = ctypes.CFUNCTYPE(
+    ctypes.c_uint8,
+    ctypes.c_void_p,
+    ctypes.POINTER(ctypes.c_uint8),
+    ctypes.c_uint16,
+    ctypes.c_void_p,
+    WIO_CALLBACK
+)
+
+class URPCStruct(ctypes.Structure):
+    """!
+    @brief u-RPC instance structure ("urpc_t").
+    """
+    _fields_ = [
+        ("_send_counter", ctypes.c_uint16),
+        ("_recv_counter", ctypes.c_uint16),
+        ("_funcs_begin", ctypes.c_uint16),
+        ("_funcs_size", ctypes.c_uint16),
+        ("_funcs_store", ctypes.c_void_p),
+        ("_send_stream", WioBuf),
+        ("_tmp_stream", WioBuf),
+        ("_send_func_data", ctypes.c_void_p),
+        ("_send_func", URPC_SEND_FUNC),
+        ("_cb_list", ctypes.c_void_p),
+        ("_cb_size", ctypes.c_uint16)
+    ]
+
+def build_library(output_dir, cc=None):
+    """!
+    @brief Build the C implementation as a shared library.
+
+    @param output_dir Directory to put the shared library in.
+    @param cc C compiler (Defaults to $CC or "cc").
+    @return Loaded library.
+    @throws RuntimeError If the compiler is not found.
+    @throws subprocess.CalledProcessError If compilation fails.
+    """
+    cc = cc or os.environ.get("CC", "cc")
+    if not _which(cc):
+        raise RuntimeError(PROMPT_ERR_NO_COMPILER % cc)
+    path = os.path.join(output_dir, "liburpc.so")
+    sources = [os.path.join(C_SOURCE_DIR, source) for source in C_SOURCES]
+    subprocess.check_call([cc]+C_FLAGS+["-o", path]+sources)
+    # Load library and declare function signatures
+    lib = ctypes.CDLL(path)
+    lib.urpc_init.argtypes = [
+        ctypes.POINTER(URPCStruct),
+        ctypes.c_uint16,
+        ctypes.c_uint16,
+        ctypes.c_uint16,
+        ctypes.c_void_p,
+        URPC_SEND_FUNC,
+        ctypes.c_uint16
+    ]
+    lib.urpc_init.restype = ctypes.c_uint8
+    lib.urpc_on_recv.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_void_p]
+    lib.urpc_on_recv.restype = ctypes.c_uint8
+    lib.urpc_get_func.argtypes = [
+        ctypes.POINTER(URPCStruct),
+        ctypes.c_char_p,
+        ctypes.c_void_p,
+        WIO_CALLBACK
+    ]
+    lib.urpc_get_func.restype = ctypes.c_uint8
+    lib.urpc_call.argtypes = [
+        ctypes.POINTER(URPCStruct),
+        ctypes.c_uint16,
+        ctypes.POINTER(ctypes.c_uint8),
+        ctypes.POINTER(ctypes.c_void_p),
+        ctypes.c_void_p,
+        WIO_CALLBACK
+    ]
+    lib.urpc_call.restype = ctypes.c_uint8
+    return lib
+
+def _which(program):
+    """!
+    @brief Check whether a program is available in PATH.
+
+    @param program Program name or path.
+    @return Whether the program is available.
+    """
+    if os.path.dirname(program):
+        return os.access(program, os.X_OK)
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        if os.access(os.path.join(directory, program), os.X_OK):
+            return True
+    return False
+
+def header_divergences():
+    """!
+    @brief Compare constants of the C header with the Python implementation.
+
+    @return List of (name, C value, Python value) tuples for differing constants.
+    """
+    with open(os.path.join(C_SOURCE_DIR, "urpc.h")) as f:
+        header = f.read()
+    divergences = []
+    for name, value in re.findall(r"\b(URPC_(?:TYPE|ERR|MSG)_\w+) = (0x[0-9a-fA-F]+|\d+);", header):
+        c_value = int(value, 0)
+        py_value = globals().get(name)
+        if py_value!=c_value:
+            divergences.append((name, c_value, py_value))
+    return divergences
+
+class CURPC(object):
+    """!
+    @brief Python wrapper of a C u-RPC endpoint.
+
+    Mirrors the caller-side interface of the URPC class. The C implementation
+    does not handle incoming queries and calls, so it can only act as caller.
+    """
+    ## C endpoint can act as callee
+    has_callee = False
+    def __init__(self, lib, send_callback, send_buf_size=1024, tmp_buf_size=256, cb_size=64):
+        """!
+        @brief C endpoint wrapper constructor.
+
+        @param lib Loaded C library.
+        @param send_callback Function for sending data.
+        @param send_buf_size Size of the C sending buffer.
+        @param tmp_buf_size Size of the C temporary buffer.
+        @param cb_size Capacity of the C callback table.
+        """
+        ## C library
+        self._lib = lib
+        ## Send data callback
+        self._send_callback = send_callback
+        ## C endpoint instance
+        self._inst = URPCStruct()
+        ## Pending callbacks (Key to callback mapping)
+        self._callbacks = {}
+        ## Next callback key
+        self._next_key = 1
+        # Keep ctypes callbacks alive
+        self._c_send = URPC_SEND_FUNC(self._on_send)
+        self._c_query_cb = WIO_CALLBACK(self._on_query_result)
+        self._c_call_cb = WIO_CALLBACK(self._on_call_result)
+        status = lib.urpc_init(
+            ctypes.byref(self._inst),
+            16,
+            send_buf_size,
+            tmp_buf_size,
+            None,
+            self._c_send,
+            cb_size
+        )
+        if status:
+            raise URPCError(status)
+    def _on_send(self, _, data, size, cb_data, cb):
+        """!
+        @brief C send function.
+        """
+        send_data = ctypes.string_at(data, size)
+        # Release send buffer before delivering message
+        cb(cb_data, 0, None)
+        self._send_callback(send_data)
+        return 0
+    def _add_callback(self, callback):
+        """!
+        @brief Store callback and return its key.
+
+        @param callback Callback function.
+        @return Callback key.
+        """
+        key = self._next_key
+        self._next_key += 1
+        self._callbacks[key] = callback
+        return key
+    def _on_query_result(self, key, status, result):
+        """!
+        @brief C function query callback.
+        """
+        callback = self._callbacks.pop(key)
+        if status:
+            callback(URPCError(status), None)
+        else:
+            callback(None, ctypes.cast(result, ctypes.POINTER(ctypes.c_uint16))[0])
+        return 0
+    def _on_call_result(self, key, status, result):
+        """!
+        @brief C function call callback.
+        """
+        callback = self._callbacks.pop(key)
+        if status:
+            callback(URPCError(status), None)
+            return 0
+        # Pointer table with signature as first item
+        ptrs = ctypes.cast(result, ctypes.POINTER(ctypes.c_void_p))
+        sig = ctypes.cast(ptrs[0], ctypes.POINTER(ctypes.c_uint8))
+        results = []
+        for i in range(1, sig[0]+1):
+            if sig[i]==URPC_TYPE_VARY:
+                vary = ctypes.cast(ptrs[i], ctypes.POINTER(URPCVary)).contents
+                results.append(bytearray(ctypes.string_at(vary.data, vary.size)))
+            else:
+                results.append(ctypes.cast(ptrs[i], ctypes.POINTER(_CTYPES[sig[i]]))[0])
+        callback(None, results)
+        return 0
+    def recv_callback(self, data):
+        """!
+        @brief Callback function for incoming u-RPC messages.
+
+        @param data u-RPC message data.
+        @throws URPCError If the C endpoint fails to handle the message.
+        """
+        buf = (ctypes.c_uint8*len(data)).from_buffer_copy(data)
+        stream = WioBuf(buf, len(data), 0, len(data))
+        status = self._lib.urpc_on_recv(ctypes.addressof(self._inst), 0, ctypes.addressof(stream))
+        if status:
+            raise URPCError(status)
+    def query(self, func_name, callback):
+        """!
+        @brief Query u-RPC function handle.
+
+        @param func_name Function name.
+        @param callback Called when query completed.
+        """
+        key = self._add_callback(callback)
+        status = self._lib.urpc_get_func(
+            ctypes.byref(self._inst),
+            func_name.encode("utf-8"),
+            key,
+            self._c_query_cb
+        )
+        if status:
+            del self._callbacks[key]
+            raise URPCError(status)
+    def call(self, handle, sig_args, args, callback):
+        """!
+        @brief Do u-RPC call.
+
+        @param handle Remote function handle.
+        @param sig_args Signature of arguments (Basic types only).
+        @param args Arguments.
+        @param callback Called when u-RPC call completed.
+        """
+        sig = (ctypes.c_uint8*(len(sig_args)+1))(len(sig_args), *sig_args)
+        values = []
+        for t, arg in zip(sig_args, args):
+            if t==URPC_TYPE_VARY:
+                data = ctypes.create_string_buffer(bytes(arg), len(arg))
+                values.append(data)
+                values.append(URPCVary(ctypes.cast(data, ctypes.c_void_p), len(arg)))
+            else:
+                values.append(_CTYPES[t](arg))
+        c_args = (ctypes.c_void_p*len(sig_args))(*[
+            ctypes.addressof(value) for value in values
+            if not isinstance(value, ctypes.Array)
+        ])
+        key = self._add_callback(callback)
+        status = self._lib.urpc_call(
+            ctypes.byref(self._inst),
+            handle,
+            sig,
+            c_args,
+            key,
+            self._c_call_cb
+        )
+        if status:
+            del self._callbacks[key]
+            raise URPCError(status)
+
+class Link(object):
+    """!
+    @brief In-memory queued link between two endpoints.
+
+    Messages are delivered by pump() instead of recursively from the send
+    callback, so C endpoints are never re-entered.
+    """
+    def __init__(self):
+        ## Queued messages (Target endpoint and data)
+        self._queue = deque()
+    def sender(self, target):
+        """!
+        @brief Get send callback delivering to given endpoint.
+
+        @param target Function returning target endpoint.
+        @return Send callback.
+        """
+        return lambda data: self._queue.append((target(), data))
+    def pump(self):
+        """!
+        @brief Deliver queued messages until the link is idle.
+
+        @return Number of delivered messages.
+        """
+        queue = self._queue
+        n_msgs = 0
+        while queue:
+            target, data = queue.popleft()
+            target.recv_callback(data)
+            n_msgs += 1
+        return n_msgs
+
+class _FuncChecks(TestCase):
+    """!
+    @brief Assertion helpers for test functions served outside of a test run.
+    """
+    def runTest(self):
+        """!
+        @brief No-op test method (Test cases need a valid method name).
+        """
+
+def make_pair(caller_impl, callee_impl, lib=None):
+    """!
+    @brief Create a linked caller and callee with the test functions on the callee.
+
+    @param caller_impl Caller implementation ("py" or "c").
+    @param callee_impl Callee implementation ("py" or "c").
+    @param lib Loaded C library.
+    @return Link, caller and callee.
+    @throws NotImplementedError If the C implementation is asked to act as callee.
+    """
+    if callee_impl=="c":
+        raise NotImplementedError(PROMPT_ERR_NO_CALLEE)
+    link = Link()
+    endpoints = {}
+    callee = endpoints["callee"] = URPC(
+        send_callback=link.sender(lambda: endpoints["caller"]),
+        n_funcs=16
+    )
+    set_up_test_functions(_FuncChecks(), callee)
+    caller_send = link.sender(lambda: endpoints["callee"])
+    if caller_impl=="c":
+        caller = CURPC(lib, caller_send)
+    else:
+        caller = URPC(send_callback=caller_send)
+    endpoints["caller"] = caller
+    return link, caller, callee
+
+def resolve(link, caller, name):
+    """!
+    @brief Resolve remote function handle.
+
+    @param link Link between the endpoints.
+    @param caller Caller endpoint.
+    @param name Function name.
+    @return Function handle.
+    @throws URPCError If the query fails.
+    """
+    results = []
+    caller.query(name, lambda error, handle: results.append((error, handle)))
+    link.pump()
+    error, handle = results[0]
+    if error:
+        raise error
+    return handle
+
+def benchmark(link, caller, handle, sig_args, args, n_calls, batch=32):
+    """!
+    @brief Measure call throughput.
+
+    @param link Link between the endpoints.
+    @param caller Caller endpoint.
+    @param handle Remote function handle.
+    @param sig_args Signature of arguments.
+    @param args Arguments.
+    @param n_calls Number of calls.
+    @param batch Number of calls in flight between pumps.
+    @return Calls per second.
+    """
+    errors = []
+    def callback(error, _):
+        if error:
+            errors.append(error)
+    start = clock()
+    done = 0
+    while done<n_calls:
+        for _ in range(min(batch, n_calls-done)):
+            caller.call(handle, bytearray(sig_args), list(args), callback)
+            done += 1
+        link.pump()
+    elapsed = clock()-start
+    if errors:
+        raise errors[0]
+    return n_calls/elapsed
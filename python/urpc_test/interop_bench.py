@@ -0,0 +1,49 @@
+from __future__ import absolute_import, unicode_literals, print_function
+import shutil, tempfile, argparse
+
+from urpc import U8, VARY
+from urpc_test.interop import build_library, header_divergences, make_pair, resolve, benchmark
+
+## Benchmarked calls (Function name, signature of arguments and arguments)
+BENCH_CALLS = [
+    ("func_1", [U8, U8], [1, 2]),
+    ("func_2", [VARY], [b"x"*64])
+]
+
+def main(argv=None):
+    """!
+    @brief Interoperability benchmark command entry.
+
+    @param argv Command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m urpc_test.interop_bench",
+        description="Benchmark u-RPC calls across Python and C endpoint pairings."
+    )
+    parser.add_argument("--calls", type=int, default=20000, help="Calls per benchmark")
+    parser.add_argument("--cc", help="C compiler")
+    args = parser.parse_args(argv)
+    build_dir = tempfile.mkdtemp()
+    try:
+        lib = build_library(build_dir, args.cc)
+        # Header divergences
+        for name, c_value, py_value in header_divergences():
+            print("Divergence: %s is %s in C and %s in Python" % (name, c_value, py_value))
+        # Benchmark each pairing
+        for caller_impl in ("py", "c"):
+            for callee_impl in ("py", "c"):
+                pairing = "%s -> %s" % (caller_impl, callee_impl)
+                try:
+                    link, caller, _ = make_pair(caller_impl, callee_impl, lib)
+                except NotImplementedError as e:
+                    print("%-8s  unsupported: %s" % (pairing, e))
+                    continue
+                for name, sig_args, call_args in BENCH_CALLS:
+                    handle = resolve(link, caller, name)
+                    rate = benchmark(link, caller, handle, sig_args, call_args, args.calls)
+                    print("%-8s  %-8s  %10.0f calls/s" % (pairing, name, rate))
+    finally:
+        shutil.rmtree(build_dir)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,87 @@
+from __future__ import absolute_import, unicode_literals
+import socket, threading
+from unittest import TestCase
+
+from urpc import URPC, U8, U16, VARY
+from urpc.loadgen import LoadGenerator, parse_call_spec
+from urpc.transport import SocketTransport, poll_transports
+from urpc_test.callee import set_up_test_functions
+
+class LoadGenTest(TestCase):
+    """!
+    @brief u-RPC load generator test.
+    """
+    def test_call_spec(self):
+        """!
+        @brief Test call specification parsing.
+        """
+        spec = parse_call_spec("func_1:U8,U16@3")
+        self.assertEqual(spec.name, "func_1")
+        self.assertEqual(spec.sig, bytearray([U8, U16]))
+        self.assertEqual(spec.args, [1, 1])
+        self.assertEqual(spec.weight, 3.0)
+        spec = parse_call_spec("func_2:VARY64")
+        self.assertEqual(spec.sig, bytearray([VARY]))
+        self.assertEqual(len(spec.args[0]), 64)
+        self.assertEqual(parse_call_spec("func_4").sig, bytearray())
+        with self.assertRaises(ValueError):
+            parse_call_spec("func_1:U9")
+    def test_loopback(self):
+        """!
+        @brief Test load generator against a loopback endpoint.
+        """
+        caller = URPC(send_callback=None)
+        callee = URPC(send_callback=caller.recv_callback, n_funcs=16)
+        caller._send_callback = callee.recv_callback
+        set_up_test_functions(self, callee)
+        generator = LoadGenerator(
+            endpoint=caller,
+            poll=lambda timeout: None,
+            calls=[parse_call_spec("func_1:U8,U8@3"), parse_call_spec("func_1:U8")],
+            rate=2000,
+            seed=0
+        )
+        generator.resolve()
+        summary = generator.run(0.1, interval=0.05)
+        self.assertGreater(summary["sent"], 0)
+        self.assertEqual(summary["completed"], summary["sent"])
+        self.assertEqual(summary["timeouts"], 0)
+        # Calls with incorrect signature are reported by error code
+        self.assertGreater(summary["errors"]["URPC_ERR_SIG_INCORRECT"], 0)
+        self.assertEqual(summary["latency"]["count"], summary["completed"])
+    def test_socketpair(self):
+        """!
+        @brief Test load generator over a socket pair transport.
+        """
+        sock, target_sock = socket.socketpair()
+        # Target endpoint in background thread
+        target = SocketTransport(target_sock)
+        target.endpoint = URPC(send_callback=target.send, n_funcs=16)
+        set_up_test_functions(self, target.endpoint)
+        stop = threading.Event()
+        def serve_target():
+            transports = [target]
+            while transports and not stop.is_set():
+                poll_transports(transports, 0.05)
+        thread = threading.Thread(target=serve_target)
+        thread.start()
+        # Caller endpoint
+        transport = SocketTransport(sock)
+        transport.endpoint = URPC(send_callback=transport.send)
+        transports = [transport]
+        try:
+            generator = LoadGenerator(
+                endpoint=transport.endpoint,
+                poll=lambda timeout: poll_transports(transports, timeout),
+                calls=[parse_call_spec("func_2:VARY8")],
+                rate=500
+            )
+            generator.resolve()
+            summary = generator.run(0.1, drain=2.0)
+        finally:
+            stop.set()
+            thread.join()
+            transport.close()
+            target.close()
+        self.assertEqual(summary["completed"], summary["sent"])
+        self.assertEqual(summary["errors"], {})
@@ -0,0 +1,101 @@
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+
+from urpc import URPC, URPC_ERR_CANCELLED, U8
+from urpc.metrics import LatencyHistogram
+from urpc_test.callee import set_up_test_functions
+
+class MetricsTest(TestCase):
+    """!
+    @brief u-RPC endpoint metrics test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Caller endpoint
+        caller = self._caller = URPC(
+            send_callback=None,
+            metrics=True
+        )
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=caller.recv_callback,
+            n_funcs=16,
+            metrics=True
+        )
+        # Caller send callback
+        caller._send_callback = callee.recv_callback
+        # Set up test functions
+        set_up_test_functions(self, callee)
+    def test_histogram(self):
+        """!
+        @brief Test latency histogram percentiles.
+        """
+        hist = LatencyHistogram()
+        # Record 1us to 1000us
+        for i in range(1, 1001):
+            hist.record(i/1000000.0)
+        summary = hist.snapshot()
+        self.assertEqual(summary["count"], 1000)
+        self.assertEqual(summary["min"], 1)
+        self.assertEqual(summary["max"], 1000)
+        # Percentiles within bucket precision
+        self.assertAlmostEqual(summary["p50"], 500, delta=500*0.125)
+        self.assertAlmostEqual(summary["p99"], 990, delta=990*0.125)
+    def test_call_metrics(self):
+        """!
+        @brief Test callee-side and caller-side call metrics.
+        """
+        handles = []
+        self._caller.query("func_1", lambda _, handle: handles.append(handle))
+        handle = handles[0]
+        # Two successful calls and one failed call
+        for _ in range(2):
+            self._caller.call(handle, [U8, U8], [1, 2], lambda e, r: None)
+        self._caller.call(handle, [U8], [1], lambda e, r: None)
+        # Callee-side metrics
+        callee_stats = self._callee.metrics_snapshot()["callee"][handle]
+        self.assertEqual(callee_stats["name"], "func_1")
+        self.assertEqual(callee_stats["calls"], 3)
+        self.assertEqual(callee_stats["errors"], {"URPC_ERR_SIG_INCORRECT": 1})
+        self.assertEqual(callee_stats["latency"]["count"], 3)
+        self.assertEqual(callee_stats["phases"]["dispatch"]["count"], 2)
+        self.assertEqual(callee_stats["phases"]["send"]["count"], 3)
+        self.assertGreater(callee_stats["bytes_in"], 0)
+        self.assertGreater(callee_stats["bytes_out"], 0)
+        # Caller-side metrics
+        caller_stats = self._caller.metrics_snapshot()["caller"][handle]
+        self.assertEqual(caller_stats["calls"], 3)
+        self.assertEqual(caller_stats["errors"], {"URPC_ERR_SIG_INCORRECT": 1})
+        self.assertEqual(caller_stats["bytes_out"], callee_stats["bytes_in"])
+        self.assertEqual(caller_stats["bytes_in"], callee_stats["bytes_out"])
+    def test_pending_requests(self):
+        """!
+        @brief Test in-flight call metrics being dropped when calls end without a result.
+        """
+        caller = URPC(send_callback=lambda data: None, metrics=True)
+        metrics = caller.metrics
+        # Cancelled call
+        msg_id = caller.call(0, [U8], [1], lambda e, r: None)
+        caller.cancel(msg_id)
+        self.assertEqual(metrics._pending, {})
+        self.assertEqual(metrics.caller[0].errors, {URPC_ERR_CANCELLED: 1})
+        # Call failing to send
+        def fail_send(data):
+            raise IOError()
+        caller._send_callback = fail_send
+        with self.assertRaises(IOError):
+            caller.call(0, [U8], [1], lambda e, r: None)
+        self.assertEqual(metrics._pending, {})
+        # Unanswered call
+        caller._send_callback = lambda data: None
+        caller.call(0, [U8], [1], lambda e, r: None)
+        metrics.reset()
+        self.assertEqual(metrics._pending, {})
+    def test_metrics_disabled(self):
+        """!
+        @brief Test endpoint without metrics.
+        """
+        endpoint = URPC(send_callback=None)
+        self.assertIsNone(endpoint.metrics_snapshot())
@@ -0,0 +1,120 @@
+from __future__ import absolute_import, unicode_literals
+import socket
+from unittest import TestCase
+
+from urpc import URPC, U8, U16, VARY
+from urpc.mux import ChannelMux
+from urpc.transport import SocketTransport, poll_transports
+
+class MuxTest(TestCase):
+    """!
+    @brief u-RPC channel multiplexing test.
+    """
+    def _make_pair(self, **kwargs):
+        """!
+        @brief Create connected multiplexers.
+
+        @param kwargs Extra arguments of the caller multiplexer (Flushing automatically by default).
+        """
+        ## Frames sent by the caller multiplexer
+        self._frames = []
+        def send(data):
+            self._frames.append(data)
+            self._callee.recv_callback(data)
+        ## Caller multiplexer
+        kwargs.setdefault("auto_flush", True)
+        caller = self._caller = ChannelMux(send, **kwargs)
+        ## Callee multiplexer
+        self._callee = ChannelMux(caller.recv_callback, auto_flush=True)
+    def test_channels(self):
+        """!
+        @brief Test independent registries of channels sharing one link.
+        """
+        self._make_pair()
+        results = []
+        for channel_id, delta in ((0, 1), (7, 100)):
+            callee = self._callee.channel(channel_id)
+            handle = callee.add_func(
+                func=lambda x, delta=delta: x+delta,
+                arg_types=[U8],
+                ret_types=[U8]
+            )
+            caller = self._caller.channel(channel_id)
+            caller.call(handle, [U8], [1], lambda e, r: results.append(r[0]))
+        # Same handle and message ID on both channels
+        self.assertEqual(results, [2, 101])
+        # Channel 0 messages have no channel header
+        self.assertEqual(self._frames[0][0:1], b"\xa1")
+        # Unknown channel
+        self._callee.recv_callback(self._frames[1][:1]+b"\x09\x00"+self._frames[1][3:])
+        self.assertEqual(self._callee.unknown, 1)
+    def test_plain_peer(self):
+        """!
+        @brief Test channel 0 talking to an endpoint without multiplexing.
+        """
+        mux = ChannelMux(lambda data: callee.recv_callback(data), auto_flush=True)
+        callee = URPC(send_callback=mux.recv_callback)
+        handle = callee.add_func(func=lambda x: x*2, arg_types=[U8], ret_types=[U8])
+        results = []
+        mux.channel(0).call(handle, [U8], [4], lambda e, r: results.append(r[0]))
+        self.assertEqual(results, [8])
+    def test_fair_scheduling(self):
+        """!
+        @brief Test small messages not waiting behind bulk messages.
+        """
+        self._make_pair(auto_flush=False)
+        bulk_callee = self._callee.channel(1)
+        bulk_handle = bulk_callee.add_func(func=lambda data: len(data), arg_types=[VARY], ret_types=[U16])
+        fast_callee = self._callee.channel(2)
+        fast_handle = fast_callee.add_func(func=lambda x: x, arg_types=[U8], ret_types=[U8])
+        bulk = self._caller.channel(1)
+        fast = self._caller.channel(2)
+        for _ in range(10):
+            bulk.call(bulk_handle, [VARY], [b"x"*1000], lambda e, r: None)
+        fast.call(fast_handle, [U8], [1], lambda e, r: None)
+        self.assertEqual(self._frames, [])
+        self._caller.flush()
+        # Fast channel message is sent after the first bulk message
+        self.assertEqual(len(self._frames), 11)
+        self.assertLess(len(self._frames[1]), 100)
+        stats = self._caller.stats()
+        self.assertEqual(stats[1]["frames"], 10)
+        self.assertEqual(stats[2]["frames"], 1)
+        self.assertEqual(self._caller.pending_bytes, 0)
+    def test_transport_flush(self):
+        """!
+        @brief Test socket transport polling sending queued messages fairly.
+        """
+        transports = [SocketTransport(sock) for sock in socket.socketpair()]
+        caller, callee = [ChannelMux(t.send) for t in transports]
+        for transport, mux in zip(transports, (caller, callee)):
+            transport.endpoint = mux
+        # Order of calls on the callee side
+        order = []
+        bulk_handle = callee.channel(1).add_func(
+            func=lambda data: order.append("bulk") or len(data),
+            arg_types=[VARY],
+            ret_types=[U16]
+        )
+        fast_handle = callee.channel(2).add_func(
+            func=lambda x: order.append("fast") or x,
+            arg_types=[U8],
+            ret_types=[U8]
+        )
+        results = []
+        bulk = caller.channel(1)
+        for _ in range(10):
+            bulk.call(bulk_handle, [VARY], [b"x"*1000], lambda e, r: results.append(r[0]))
+        caller.channel(2).call(fast_handle, [U8], [1], lambda e, r: results.append(r[0]))
+        try:
+            for _ in range(20):
+                if len(results)==11:
+                    break
+                poll_transports(transports, 0.1)
+        finally:
+            for transport in transports:
+                transport.close()
+        self.assertEqual(len(results), 11)
+        self.assertEqual(order.index("fast"), 1)
+        self.assertEqual(caller.pending_bytes, 0)
+        self.assertEqual(callee.pending_bytes, 0)
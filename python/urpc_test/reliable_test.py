@@ -0,0 +1,125 @@
+from __future__ import absolute_import, unicode_literals
+import time, socket
+from unittest import TestCase
+
+from urpc import URPC, URPC_ERR_TIMEOUT, U8
+from urpc.reliable import ReliabilityPolicy
+from urpc.transport import SocketTransport, poll_transports
+
+class ReliableTest(TestCase):
+    """!
+    @brief u-RPC reliable datagram mode test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        policy = ReliabilityPolicy(initial_timeout=0.01, max_timeout=0.02, max_attempts=3)
+        ## Messages to drop (Direction to list of booleans mapping)
+        self._drops = {"request": [], "response": []}
+        ## Caller endpoint
+        caller = self._caller = URPC(
+            send_callback=lambda data: self._deliver("request", self._callee, data),
+            reliable=policy
+        )
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=lambda data: self._deliver("response", caller, data),
+            reliable=policy
+        )
+        ## Number of function invocations
+        self._invocations = [0]
+        def increase(x):
+            self._invocations[0] += 1
+            return x+1
+        ## Handle of test function
+        self._handle = callee.add_func(func=increase, arg_types=[U8], ret_types=[U8])
+        ## Call results
+        self._results = []
+    def _deliver(self, direction, target, data):
+        """!
+        @brief Deliver message unless it is scheduled to be dropped.
+
+        @param direction Message direction.
+        @param target Target endpoint.
+        @param data Message data.
+        """
+        drops = self._drops[direction]
+        if drops and drops.pop(0):
+            return
+        target.recv_callback(data, "peer")
+    def _call(self):
+        """!
+        @brief Call test function and retransmit until it completes.
+        """
+        self._caller.call(self._handle, [U8], [1], lambda e, r: self._results.append((e, r)))
+        while True:
+            delay = self._caller.tick()
+            if delay is None:
+                break
+            time.sleep(delay)
+    def test_lost_request(self):
+        """!
+        @brief Test retransmission of lost request.
+        """
+        self._drops["request"] = [True, True]
+        self._call()
+        self.assertEqual(self._results, [(None, [2])])
+        self.assertEqual(self._invocations[0], 1)
+    def test_lost_response(self):
+        """!
+        @brief Test duplicate suppression of retransmitted request.
+        """
+        self._drops["response"] = [True, True]
+        self._call()
+        self.assertEqual(self._results, [(None, [2])])
+        # Function is only executed once
+        self.assertEqual(self._invocations[0], 1)
+    def test_timeout(self):
+        """!
+        @brief Test request failing after all attempts.
+        """
+        self._drops["request"] = [True, True, True]
+        self._call()
+        self.assertEqual(len(self._results), 1)
+        self.assertEqual(self._results[0][0].reason, URPC_ERR_TIMEOUT)
+        self.assertEqual(self._invocations[0], 0)
+        self.assertEqual(self._caller._oper_callbacks, {})
+    def test_restarted_caller(self):
+        """!
+        @brief Test cached responses only being replayed for identical requests.
+        """
+        self._call()
+        # Restarted caller reuses message IDs from the same peer address
+        caller = URPC(send_callback=lambda data: self._deliver("request", self._callee, data))
+        self._callee._send_callback = lambda data: self._deliver("response", caller, data)
+        caller.call(self._handle, [U8], [5], lambda e, r: self._results.append((e, r)))
+        self.assertEqual(self._results, [(None, [2]), (None, [6])])
+        self.assertEqual(self._invocations[0], 2)
+    def test_poll_transports(self):
+        """!
+        @brief Test transport polling retransmitting lost requests.
+        """
+        transports = [
+            SocketTransport(sock)
+            for sock in socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        ]
+        caller_transport, callee_transport = transports
+        policy = ReliabilityPolicy(initial_timeout=0.01)
+        caller_transport.endpoint = URPC(send_callback=caller_transport.send, reliable=policy)
+        callee_transport.endpoint = URPC(send_callback=callee_transport.send, reliable=policy)
+        handle = callee_transport.endpoint.add_func(func=lambda x: x+1, arg_types=[U8], ret_types=[U8])
+        try:
+            caller_transport.endpoint.call(
+                handle, [U8], [1], lambda e, r: self._results.append((e, r))
+            )
+            # Lose the first request
+            callee_transport.sock.recv(1024)
+            for _ in range(100):
+                if self._results:
+                    break
+                poll_transports(transports, 1)
+        finally:
+            for transport in transports:
+                transport.close()
+        self.assertEqual(self._results, [(None, [2])])
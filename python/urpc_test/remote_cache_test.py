@@ -0,0 +1,146 @@
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+
+from urpc import URPC, URPCError, U8, VARY, URPC_ERR_CANCELLED, URPC_ERR_TIMEOUT
+from urpc.cache import LRUCache
+
+class RemoteCacheTest(TestCase):
+    """!
+    @brief u-RPC caller-side result cache test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Sent requests
+        self._requests = []
+        ## Hold requests instead of delivering them
+        self._hold = False
+        def send_request(data):
+            self._requests.append(data)
+            if not self._hold:
+                callee.recv_callback(data)
+        ## Caller endpoint
+        caller = self._caller = URPC(send_callback=send_request)
+        ## Callee endpoint
+        callee = self._callee = URPC(send_callback=caller.recv_callback)
+        ## Number of function invocations
+        self._invocations = [0]
+        def lookup(x):
+            self._invocations[0] += 1
+            return x*2
+        callee.add_func(func=lookup, arg_types=[U8], ret_types=[U8], name="user.lookup")
+        ## Call results
+        self._results = []
+    def _call(self, handle, x):
+        """!
+        @brief Call remote function.
+
+        @param handle Remote function handle.
+        @param x Argument.
+        @return Request message ID.
+        """
+        return self._caller.call(handle, [U8], [x], lambda e, r: self._results.append((e, r)))
+    def test_cache_by_name(self):
+        """!
+        @brief Test cache hits not touching the transport.
+        """
+        caller = self._caller
+        caller.cache_remote(name="user.lookup", cache=LRUCache(size=8, ttl=60))
+        handles = []
+        caller.query("user.lookup", lambda e, h: handles.append(h))
+        handle = handles[0]
+        self._call(handle, 1)
+        n_requests = len(self._requests)
+        self.assertIsNone(self._call(handle, 1))
+        self.assertEqual(len(self._requests), n_requests)
+        self._call(handle, 2)
+        self.assertEqual(self._results, [(None, [2]), (None, [2]), (None, [4])])
+        self.assertEqual(self._invocations[0], 2)
+        self.assertEqual(caller.remote_cache_stats(handle)["hits"], 1)
+        # Explicit invalidation
+        self.assertTrue(caller.invalidate_remote(handle, [U8], [1]))
+        self._call(handle, 1)
+        self.assertEqual(self._invocations[0], 3)
+        # Pattern-based invalidation
+        self.assertEqual(caller.invalidate_remote_pattern("user.*"), ["user.lookup"])
+        self._call(handle, 2)
+        self.assertEqual(self._invocations[0], 4)
+    def test_merge_inflight(self):
+        """!
+        @brief Test merging identical concurrent calls.
+        """
+        caller = self._caller
+        caller.cache_remote(0)
+        self._hold = True
+        self._call(0, 3)
+        self.assertIsNone(self._call(0, 3))
+        self.assertEqual(len(self._requests), 1)
+        # Deliver held request
+        self._callee.recv_callback(self._requests[0])
+        self.assertEqual(self._results, [(None, [6]), (None, [6])])
+        self.assertEqual(self._invocations[0], 1)
+        # Cancelling the request fails merged calls
+        self._results = []
+        msg_id = self._call(0, 5)
+        self._call(0, 5)
+        caller.cancel(msg_id)
+        self.assertEqual(len(self._results), 1)
+        self.assertEqual(self._results[0][0].reason, URPC_ERR_CANCELLED)
+        self.assertEqual(caller._inflight, {})
+    def test_merged_call_sync(self):
+        """!
+        @brief Test synchronous call merged into an unanswered call timing out.
+        """
+        for thread_safe in (False, True):
+            caller = URPC(send_callback=lambda data: None, thread_safe=thread_safe)
+            caller.cache_remote(handle=0)
+            self.assertIsNotNone(caller.call(0, [U8], [1], lambda e, r: None))
+            with self.assertRaises(URPCError) as ctx:
+                caller.call_sync(0, [U8], [1], timeout=0.05)
+            self.assertEqual(ctx.exception.reason, URPC_ERR_TIMEOUT)
+            # Only the unanswered call is left in flight
+            self.assertEqual([len(callbacks) for callbacks in caller._inflight.values()], [1])
+    def test_pattern_by_handle(self):
+        """!
+        @brief Test pattern invalidation of a cache enabled by handle and name.
+        """
+        caller = self._caller
+        caller.cache_remote(handle=0, name="user.lookup")
+        self._call(0, 1)
+        self._call(0, 1)
+        self.assertEqual(self._invocations[0], 1)
+        self.assertEqual(caller.invalidate_remote_pattern("user.*"), ["user.lookup"])
+        self._call(0, 1)
+        self.assertEqual(self._invocations[0], 2)
+    def test_result_copies(self):
+        """!
+        @brief Test callbacks modifying results not corrupting cached results.
+        """
+        caller = self._caller
+        handle = self._callee.add_func(func=lambda data: data, arg_types=[VARY], ret_types=[VARY])
+        caller.cache_remote(handle)
+        results = []
+        def modify(error, result):
+            results.append(bytes(result[0]))
+            result[0][0] = ord("x")
+        for _ in range(3):
+            caller.call(handle, [VARY], [b"abc"], modify)
+        self.assertEqual(results, [b"abc"]*3)
+    def test_invalidate_inflight(self):
+        """!
+        @brief Test results of calls in flight during invalidation not being cached.
+        """
+        caller = self._caller
+        caller.cache_remote(0)
+        self._hold = True
+        self._call(0, 3)
+        caller.invalidate_remote(0)
+        # Identical call after invalidation is not merged into the stale call
+        self._call(0, 3)
+        self.assertEqual(len(self._requests), 2)
+        self._callee.recv_callback(self._requests[0])
+        self.assertEqual(caller.remote_cache_stats(0)["size"], 0)
+        self._callee.recv_callback(self._requests[1])
+        self.assertEqual(caller.remote_cache_stats(0)["size"], 1)
+        self.assertEqual(self._results, [(None, [6]), (None, [6])])
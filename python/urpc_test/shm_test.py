@@ -0,0 +1,98 @@
+from __future__ import absolute_import, unicode_literals
+import os, mmap, errno, shutil, tempfile, threading
+from unittest import TestCase
+
+from urpc import URPC, U8
+from urpc.shm import ShmRing, ShmTransport
+from urpc.transport import poll_transports
+
+class ShmTest(TestCase):
+    """!
+    @brief u-RPC shared memory transport test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Temporary directory of shared memory files
+        self._dir = tempfile.mkdtemp()
+    def tearDown(self):
+        """!
+        @brief Clean up test case.
+        """
+        shutil.rmtree(self._dir)
+    def test_ring_wrap_around(self):
+        """!
+        @brief Test ring buffer frames wrapping around the end of the ring.
+        """
+        buf = mmap.mmap(-1, 4096)
+        ring = ShmRing(buf, 0, 64)
+        for i in range(20):
+            data = bytes(bytearray([i]*(i%13)))
+            self.assertTrue(ring.write(data))
+            self.assertEqual(ring.read(), data)
+        self.assertIsNone(ring.read())
+        # Full ring
+        self.assertTrue(ring.write(b"x"*28))
+        self.assertTrue(ring.write(b"y"*28))
+        self.assertFalse(ring.write(b"z"))
+        self.assertEqual(ring.read(), b"x"*28)
+        self.assertTrue(ring.write(b"z"))
+        with self.assertRaises(ValueError):
+            ring.write(b"x"*61)
+    def test_call(self):
+        """!
+        @brief Test calls between endpoints in different threads.
+        """
+        path = os.path.join(self._dir, "urpc")
+        server = ShmTransport(path, create=True, capacity=256)
+        client = ShmTransport(path)
+        server.endpoint = URPC(send_callback=server.send)
+        handle = server.endpoint.add_func(func=lambda x: x+1, arg_types=[U8], ret_types=[U8])
+        client.endpoint = URPC(send_callback=client.send)
+        # Serve calls in background thread
+        def serve():
+            transports = [server]
+            while transports:
+                poll_transports(transports, 1)
+        thread = threading.Thread(target=serve)
+        thread.start()
+        results = []
+        # Wait for results with wake ups
+        for x in range(50):
+            client.endpoint.call(handle, [U8], [x], lambda e, r: results.append(r[0]))
+            while len(results)<=x:
+                poll_transports([client], 1)
+        # Wait for results by busy-polling
+        for x in range(50, 100):
+            client.endpoint.call(handle, [U8], [x], lambda e, r: results.append(r[0]))
+            while len(results)<=x:
+                client.spin(1)
+        self.assertEqual(results, list(range(1, 101)))
+        client.close()
+        thread.join()
+        server.close()
+        self.assertEqual(os.listdir(self._dir), [])
+    def test_full_ring(self):
+        """!
+        @brief Test sending into a ring the peer stopped draining.
+        """
+        path = os.path.join(self._dir, "urpc")
+        server = ShmTransport(path, create=True, capacity=64)
+        client = ShmTransport(path, send_timeout=0.01)
+        try:
+            client.send(b"x"*28)
+            client.send(b"y"*28)
+            # Peer never drains the ring
+            with self.assertRaises(OSError) as ctx:
+                client.send(b"z")
+            self.assertEqual(ctx.exception.errno, errno.ETIMEDOUT)
+            # Peer closed
+            client.send_timeout = None
+            server.close()
+            with self.assertRaises(OSError) as ctx:
+                client.send(b"z")
+            self.assertEqual(ctx.exception.errno, errno.EPIPE)
+        finally:
+            client.close()
+            server.close()
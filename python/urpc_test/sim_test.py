@@ -0,0 +1,89 @@
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+
+from urpc import U16, VARY
+from urpc.reliable import ReliabilityPolicy
+from urpc.sim import LinkProfile, SimLink, Simulator, measure
+
+class SimTest(TestCase):
+    """!
+    @brief u-RPC link simulator test.
+    """
+    def _run(self, profile, seed=0, n_calls=50, window=1, size=0, **kwargs):
+        """!
+        @brief Measure echo calls over a simulated link.
+
+        @param profile Link profile.
+        @param seed Random seed.
+        @param n_calls Number of calls.
+        @param window Maximum number of calls in flight.
+        @param size Size of the variable length argument.
+        @param kwargs Extra endpoint constructor arguments.
+        @return Simulator, links and measurement results.
+        """
+        sim = Simulator(seed)
+        caller, callee, links = sim.pair(profile, **kwargs)
+        handle = callee.add_func(func=lambda x, data: x, arg_types=[U16, VARY], ret_types=[U16])
+        results = measure(sim, caller, handle, [U16, VARY], [1, b"x"*size], n_calls, window)
+        return sim, links, results
+    def test_latency(self):
+        """!
+        @brief Test call latency being two propagation delays plus transmission time.
+        """
+        sim, links, results = self._run(LinkProfile(latency=0.01, bandwidth=10000), n_calls=3)
+        self.assertEqual(results["calls"], 3)
+        # Request and response transmission time
+        tx_time = float(links[0].bytes+links[1].bytes)/3/10000
+        self.assertAlmostEqual(results["elapsed"], 3*(0.02+tx_time))
+        self.assertAlmostEqual(results["latency"]["max"]/1e6, 0.02+tx_time, places=5)
+    def test_bandwidth(self):
+        """!
+        @brief Test pipelined throughput being bounded by the link rate.
+        """
+        profile = LinkProfile(latency=0.05, bandwidth=100000)
+        _, links, serial = self._run(profile, size=1000, window=1)
+        _, _, pipelined = self._run(profile, size=1000, window=8)
+        # Pipelining hides the round trip until the link saturates
+        self.assertGreater(pipelined["throughput"], 4*serial["throughput"])
+        frame_size = float(links[0].bytes)/links[0].sent
+        self.assertLessEqual(pipelined["throughput"], 100000/frame_size+1e-6)
+    def test_deterministic(self):
+        """!
+        @brief Test identical results with the same seed.
+        """
+        policy = ReliabilityPolicy(initial_timeout=0.2, max_attempts=8)
+        runs = [
+            self._run("wan", seed=seed, n_calls=200, window=4, size=2000, reliable=policy)
+            for seed in (1, 1, 2)
+        ]
+        first, second, other = [(results, links[0].stats(), sim.events) for sim, links, results in runs]
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+    def test_loss(self):
+        """!
+        @brief Test retransmission on virtual time over a lossy link.
+        """
+        policy = ReliabilityPolicy(initial_timeout=0.05, max_attempts=10)
+        profile = LinkProfile(latency=0.01, mtu=100, loss=0.1)
+        sim, links, results = self._run(profile, size=150, reliable=policy)
+        # Every call completes despite lost fragments
+        self.assertEqual(results["calls"], 50)
+        self.assertEqual(results["errors"], 0)
+        self.assertGreater(links[0].lost+links[1].lost, 0)
+        # Retransmissions wait for the virtual timeout
+        self.assertGreaterEqual(results["latency"]["max"]/1e6, 0.05)
+    def test_reorder(self):
+        """!
+        @brief Test later frames overtaking held back frames.
+        """
+        sim = Simulator(3)
+        received = []
+        profile = LinkProfile(latency=0.01, reorder=0.3, reorder_delay=0.05)
+        link = SimLink(sim, profile, received.append)
+        frames = [bytes(bytearray([i])) for i in range(20)]
+        for frame in frames:
+            link.send(frame)
+        sim.run()
+        self.assertGreater(link.reordered, 0)
+        self.assertEqual(sorted(received), frames)
+        self.assertNotEqual(received, frames)
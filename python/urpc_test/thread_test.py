@@ -0,0 +1,71 @@
+from __future__ import absolute_import, unicode_literals
+import socket, threading
+from unittest import TestCase
+
+from urpc import URPC, URPCError, U8, U16, URPC_ERR_TIMEOUT
+from urpc.transport import SocketTransport, poll_transports
+
+class ThreadSafeTest(TestCase):
+    """!
+    @brief u-RPC thread-safe endpoint mode test.
+    """
+    def test_concurrent_calls(self):
+        """!
+        @brief Test synchronous calls from several threads over one endpoint.
+        """
+        sock, target_sock = socket.socketpair()
+        # Callee endpoint
+        target = SocketTransport(target_sock)
+        target.endpoint = URPC(send_callback=target.send)
+        handle = target.endpoint.add_func(func=lambda x: x*2, arg_types=[U16], ret_types=[U16])
+        # Caller endpoint
+        caller = SocketTransport(sock)
+        caller.endpoint = URPC(send_callback=caller.send, thread_safe=True)
+        # Receive in background threads
+        stop = threading.Event()
+        def pump(transport):
+            transports = [transport]
+            while not stop.is_set() and transports:
+                poll_transports(transports, 0.05)
+        pumps = [threading.Thread(target=pump, args=(t,)) for t in (target, caller)]
+        for thread in pumps:
+            thread.start()
+        # Concurrent callers
+        failures = []
+        def work(base):
+            for x in range(base, base+100):
+                try:
+                    result = caller.endpoint.call_sync(handle, [U16], [x], timeout=5)
+                    if result!=[x*2]:
+                        failures.append((x, result))
+                except URPCError as e:
+                    failures.append((x, e.reason))
+        workers = [threading.Thread(target=work, args=(i*100,)) for i in range(8)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        stop.set()
+        for thread in pumps:
+            thread.join()
+        caller.close()
+        target.close()
+        self.assertEqual(failures, [])
+        self.assertEqual(caller.endpoint._oper_callbacks, {})
+    def test_call_sync_timeout(self):
+        """!
+        @brief Test synchronous call timing out on a lost request.
+        """
+        caller = URPC(send_callback=lambda data: None, thread_safe=True)
+        with self.assertRaises(URPCError) as ctx:
+            caller.call_sync(0, [U8], [1], timeout=0.01)
+        self.assertEqual(ctx.exception.reason, URPC_ERR_TIMEOUT)
+        self.assertEqual(caller._oper_callbacks, {})
+    def test_call_sync_loopback(self):
+        """!
+        @brief Test synchronous call over a synchronous loopback link.
+        """
+        caller = URPC(send_callback=lambda data: callee.recv_callback(data), thread_safe=True)
+        callee = URPC(send_callback=caller.recv_callback)
+        handle = callee.add_func(func=lambda x: x+1, arg_types=[U8], ret_types=[U8])
+        self.assertEqual(caller.call_sync(handle, [U8], [1]), [2])
@@ -0,0 +1,90 @@
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+from six import StringIO
+
+from urpc import URPC, URPC_ERR_SIG_INCORRECT, U8
+from urpc.trace import URPCHook, FrameSampler
+from urpc_test.callee import set_up_test_functions
+
+class _RecordingHook(URPCHook):
+    """!
+    @brief Tracing hook that records all events.
+    """
+    def __init__(self):
+        """!
+        @brief Recording hook constructor.
+        """
+        ## Recorded events
+        self.events = []
+    def on_send(self, data):
+        self.events.append(("send", bytes(data)))
+    def on_recv(self, data):
+        self.events.append(("recv", bytes(data)))
+    def on_dispatch_start(self, handle, msg_id):
+        self.events.append(("dispatch_start", handle))
+    def on_dispatch_end(self, handle, msg_id, error):
+        self.events.append(("dispatch_end", handle, error))
+
+class TraceTest(TestCase):
+    """!
+    @brief u-RPC tracing hooks test.
+    """
+    def setUp(self):
+        """!
+        @brief Set up test case.
+        """
+        ## Caller endpoint
+        caller = self._caller = URPC(
+            send_callback=None
+        )
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=caller.recv_callback,
+            n_funcs=16
+        )
+        # Caller send callback
+        caller._send_callback = callee.recv_callback
+        # Set up test functions
+        set_up_test_functions(self, callee)
+        ## Handle of function 1
+        self._handle = callee._func_name_lookup["func_1"]
+    def test_hooks(self):
+        """!
+        @brief Test hook invocation order.
+        """
+        hook = _RecordingHook()
+        self._callee.add_hook(hook)
+        # Successful call
+        self._caller.call(self._handle, [U8, U8], [1, 2], lambda e, r: None)
+        events = [event[0] for event in hook.events]
+        self.assertEqual(events, ["recv", "dispatch_start", "dispatch_end", "send"])
+        self.assertEqual(hook.events[2], ("dispatch_end", self._handle, None))
+        # Failed call
+        del hook.events[:]
+        self._caller.call(self._handle, [U8], [1], lambda e, r: None)
+        self.assertEqual(hook.events[2], ("dispatch_end", self._handle, URPC_ERR_SIG_INCORRECT))
+        # Removed hook is no longer invoked
+        self._callee.remove_hook(hook)
+        del hook.events[:]
+        self._caller.call(self._handle, [U8, U8], [1, 2], lambda e, r: None)
+        self.assertEqual(hook.events, [])
+    def test_sampler(self):
+        """!
+        @brief Test 1-in-N frame sampler ring buffer.
+        """
+        sampler = FrameSampler(every=2, capacity=3)
+        self._caller.add_hook(sampler)
+        # 5 calls produce 10 frames on the caller
+        for _ in range(5):
+            self._caller.call(self._handle, [U8, U8], [1, 2], lambda e, r: None)
+        records = sampler.dump()
+        # Only the last 3 of 5 sampled frames are kept
+        self.assertEqual(len(records), 3)
+        self.assertEqual([r.direction for r in records], ["send", "send", "send"])
+        # Human-readable dump
+        stream = StringIO()
+        sampler.dump(stream)
+        self.assertEqual(len(stream.getvalue().splitlines()), 3)
+        # Clear sampled records
+        sampler.clear()
+        self.assertEqual(sampler.dump(), [])
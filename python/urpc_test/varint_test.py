@@ -0,0 +1,139 @@
+from __future__ import absolute_import, unicode_literals
+from unittest import TestCase
+
+from urpc import URPC, URPCError, U8, I8, I32, U64, I64, VARY, URPC_VERSION, \
+    URPC_VERSION_VARINT, URPC_ERR_NO_SUPPORT, URPC_MSG_HELLO
+from urpc.util import decode_varint, pack_varints, unpack_varints, write_data
+
+class VarintTest(TestCase):
+    """!
+    @brief u-RPC varint protocol version test.
+    """
+    def _make_pair(self, callee_max_version=URPC_VERSION_VARINT):
+        """!
+        @brief Create connected caller and callee endpoints.
+
+        @param callee_max_version Highest protocol version of the callee.
+        """
+        ## Sent request sizes
+        self._sizes = []
+        def send_request(data):
+            self._sizes.append(len(data))
+            self._callee.recv_callback(data)
+        ## Caller endpoint
+        caller = self._caller = URPC(send_callback=send_request)
+        ## Callee endpoint
+        callee = self._callee = URPC(
+            send_callback=lambda data: caller.recv_callback(data),
+            max_version=callee_max_version
+        )
+        ## Handle of test function
+        self._handle = callee.add_func(
+            func=lambda a, b, c: (a+1, b-1, c[::-1]),
+            arg_types=[U64, I64, VARY],
+            ret_types=[U64, I64, VARY]
+        )
+        ## Call results
+        self._results = []
+    def _call(self):
+        """!
+        @brief Call test function.
+        """
+        self._caller.call(
+            self._handle,
+            [U64, I64, VARY],
+            [1, -1, b"abc"],
+            lambda e, r: self._results.append((e, r))
+        )
+    def test_negotiate(self):
+        """!
+        @brief Test negotiating varint protocol version.
+        """
+        self._make_pair()
+        versions = []
+        self._caller.negotiate(lambda e, v: versions.append(v))
+        self.assertEqual(versions, [URPC_VERSION_VARINT])
+        self.assertEqual(self._callee.version, URPC_VERSION_VARINT)
+        # Fixed width call
+        self._caller.version = URPC_VERSION
+        self._call()
+        # Varint call
+        self._caller.version = URPC_VERSION_VARINT
+        self._call()
+        self.assertEqual(self._results[0], self._results[1])
+        self.assertEqual(self._results[1][1], [2, -2, bytearray(b"cba")])
+        # 8+8+2 bytes of values and length shrink to 1+1+1 bytes
+        self.assertEqual(self._sizes[1]-self._sizes[2], 15)
+    def test_negotiate_fallback(self):
+        """!
+        @brief Test negotiation with a peer that only supports version 1.
+        """
+        self._make_pair(URPC_VERSION)
+        versions = []
+        self._caller.negotiate(lambda e, v: versions.append(v))
+        self.assertEqual(versions, [URPC_VERSION])
+        self._call()
+        self.assertEqual(self._results[0][1], [2, -2, bytearray(b"cba")])
+        # Unsupported version is rejected
+        self._caller.version = URPC_VERSION_VARINT
+        self._call()
+        self.assertEqual(self._results[1][0].reason, URPC_ERR_NO_SUPPORT)
+    def test_negotiate_invalid(self):
+        """!
+        @brief Test negotiation with a peer advertising no valid version.
+        """
+        self._make_pair()
+        versions = []
+        # HELLO message carrying version 0
+        caller = self._caller
+        msg_id = caller._next_msg_id("send")
+        req = caller._build_header(URPC_MSG_HELLO, "send", URPC_VERSION, msg_id)
+        write_data(req, 0, U8)
+        caller._add_request(msg_id, req.getvalue(), lambda e, v: versions.append(e))
+        self.assertEqual(versions[0].reason, URPC_ERR_NO_SUPPORT)
+        self.assertEqual(self._callee.version, URPC_VERSION)
+    def test_negotiate_peer(self):
+        """!
+        @brief Test versions negotiated by addressed peers of a shared endpoint.
+        """
+        responses = []
+        callee = URPC(send_callback=responses.append)
+        # Capture HELLO message of a caller
+        hellos = []
+        URPC(send_callback=hellos.append).negotiate(lambda e, v: None)
+        callee.recv_callback(hellos[0], "a")
+        # Version of other peers is unchanged
+        self.assertEqual(callee.version, URPC_VERSION)
+        self.assertEqual(callee.peer_version("a"), URPC_VERSION_VARINT)
+        self.assertEqual(callee.peer_version("b"), URPC_VERSION)
+        # Caller gets the negotiated version
+        caller = URPC(send_callback=lambda data: None)
+        versions = []
+        caller.negotiate(lambda e, v: versions.append(v))
+        caller.recv_callback(responses[0], "callee")
+        self.assertEqual(versions, [URPC_VERSION_VARINT])
+        self.assertEqual(caller.peer_version("callee"), URPC_VERSION_VARINT)
+    def test_codec(self):
+        """!
+        @brief Test varint codec boundaries.
+        """
+        sig = [U8, I8, I32, U64, I64]
+        objects = [255, -128, -2**31, 2**64-1, -2**63]
+        data = pack_varints(sig, objects)
+        self.assertEqual(unpack_varints(bytearray(data), 0, sig), (objects, len(data)))
+        # Out of range values
+        with self.assertRaises(URPCError):
+            pack_varints([U8], [256])
+        with self.assertRaises(URPCError):
+            unpack_varints(bytearray(pack_varints([U64], [256])), 0, [U8])
+        # Truncated data
+        with self.assertRaises(URPCError):
+            unpack_varints(bytearray(data[:-1]), 0, sig)
+        # One, two and longer varints decoded from a shared bytes buffer
+        values = [0, 127, 128, 2**14-1, 2**14, 2**35+3, 2**64-1]
+        data = bytes(pack_varints([U64]*len(values), values))
+        self.assertEqual(unpack_varints(data, 0, [U64]*len(values)), (values, len(data)))
+        self.assertEqual(decode_varint(data, 1), (127, 2))
+        # Varints longer than 10 bytes
+        with self.assertRaises(URPCError):
+            decode_varint(bytearray(b"\xff"*10+b"\x01"), 0)